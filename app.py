@@ -1,11 +1,13 @@
 import os
 
 from dotenv import load_dotenv
-from flask import Flask
+from flask import Flask, jsonify, request
 from flask_login import LoginManager
 from flask_migrate import Migrate
+from sqlalchemy.exc import OperationalError, ProgrammingError
 
-from db import db
+from counters import counters
+from db import configure_engine, db, engine_options
 
 # Load environment variables
 load_dotenv()
@@ -22,10 +24,38 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///smart_cv.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['GEMINI_API_KEY'] = os.getenv('GEMINI_API_KEY')
+    app.config['SEED_TEMPLATES_ON_STARTUP'] = os.getenv('SEED_TEMPLATES_ON_STARTUP', '1') not in ('0', 'false', 'False')
+    app.config['COUNTER_FLUSH_INTERVAL'] = int(os.getenv('COUNTER_FLUSH_INTERVAL', '5'))  # Giây giữa hai lần ghi views/downloads
+    app.config['COUNTER_FLUSH_ATTEMPTS'] = int(os.getenv('COUNTER_FLUSH_ATTEMPTS', '5'))  # Số lần ghi lỗi trước khi bỏ một lô
+    
+    # Engine: PRAGMA cho SQLite (WAL...), pool cho PostgreSQL
+    app.config['SQLITE_BUSY_TIMEOUT'] = int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000'))  # ms
+    app.config['SQLITE_CACHE_SIZE'] = int(os.getenv('SQLITE_CACHE_SIZE', '20000'))  # KiB
+    app.config['SQLITE_MMAP_SIZE'] = int(os.getenv('SQLITE_MMAP_SIZE', str(128 * 1024 * 1024)))  # bytes
+    app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', '5'))
+    app.config['DB_MAX_OVERFLOW'] = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+    app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', '1800'))  # Giây
+    app.config['DB_POOL_TIMEOUT'] = int(os.getenv('DB_POOL_TIMEOUT', '30'))  # Giây
+    app.config['DB_POOL_PRE_PING'] = os.getenv('DB_POOL_PRE_PING', '1') not in ('0', 'false', 'False')
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    
+    # Giới hạn payload: toàn bộ request (413 từ Werkzeug) và JSON của canvas/API AI (kiểm tra trong lúc parse)
+    app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', str(16 * 1024 * 1024)))  # bytes
+    app.config['CANVAS_JSON_MAX_BYTES'] = int(os.getenv('CANVAS_JSON_MAX_BYTES', str(2 * 1024 * 1024)))
+    app.config['CANVAS_JSON_MAX_NODES'] = int(os.getenv('CANVAS_JSON_MAX_NODES', '50000'))
+    app.config['CANVAS_JSON_MAX_DEPTH'] = int(os.getenv('CANVAS_JSON_MAX_DEPTH', '64'))
+    app.config['CANVAS_JSON_MAX_TEXT'] = int(os.getenv('CANVAS_JSON_MAX_TEXT', '20000'))  # Ký tự mỗi chuỗi
+    app.config['KONVA_GEOMETRY_PRECISION'] = int(os.getenv('KONVA_GEOMETRY_PRECISION', '2'))  # Chữ số thập phân của toạ độ khi lưu canvas
+    app.config['AI_JSON_MAX_BYTES'] = int(os.getenv('AI_JSON_MAX_BYTES', str(64 * 1024)))
+    app.config['AI_JSON_MAX_NODES'] = int(os.getenv('AI_JSON_MAX_NODES', '1000'))
+    app.config['AI_JSON_MAX_DEPTH'] = int(os.getenv('AI_JSON_MAX_DEPTH', '16'))
+    app.config['AI_JSON_MAX_TEXT'] = int(os.getenv('AI_JSON_MAX_TEXT', '10000'))
     
     # Initialize extensions with app
     db.init_app(app)
+    configure_engine(app)
     migrate.init_app(app, db)
+    counters.init_app(app)
     
     # Configure Flask-Login
     login_manager.init_app(app)
@@ -35,8 +65,9 @@ def create_app():
     
     @login_manager.user_loader
     def load_user(user_id):
-        from models.user import User
-        return User.query.get(int(user_id))
+        # Bản chụp user trong cache của process (không đọc database ở phần lớn request)
+        from models.user_cache import load_user_snapshot
+        return load_user_snapshot(int(user_id))
     
     # Register blueprints
     from views.cv import cv_bp
@@ -47,25 +78,47 @@ def create_app():
     app.register_blueprint(user_bp)
     app.register_blueprint(cv_bp)
     
+    @app.errorhandler(413)
+    def request_too_large(error):
+        """Request vượt MAX_CONTENT_LENGTH: trả JSON cho API/AJAX, text cho form thường"""
+        if request.is_json or request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return jsonify({'success': False, 'error': 'Dữ liệu gửi lên quá lớn.'}), 413
+        return 'Dữ liệu gửi lên quá lớn.', 413
+    
+    # Register CLI commands
+    from commands import cv_cli
+    app.cli.add_command(cv_cli)
+    
     # Create database tables
     with app.app_context():
         # Import models để tạo tables
+        from models.analytics import CVEvent, CVEventRollup
+        from models.app_state import AppState
         from models.cv import CV
+        from models.cv_blob import CVBlob
+        from models.cv_revision import CVRevision
+        from models.cv_search import create_search_index
         from models.cv_template import CVTemplate
         from models.user import User
         
         db.create_all()
         
-        # Tạo user admin mẫu nếu chưa có
-        admin_user = User.query.filter_by(email='admin@smartcv.com').first()
+        # Tạo user admin mẫu nếu chưa có (chỉ đọc id để chạy được cả khi schema chưa nâng cấp)
+        admin_user = db.session.query(User.id).filter_by(email='admin@smartcv.com').first()
         if not admin_user:
             admin = User(username='admin', email='admin@smartcv.com')
             admin.set_password('admin123')
             db.session.add(admin)
             db.session.commit()
         
-        # Seed default templates
-        CVTemplate.seed_default_templates()
+        # Kiểm tra template đi kèm: chỉ ghi khi nội dung đổi (tắt bằng SEED_TEMPLATES_ON_STARTUP=0 và
+        # chạy 'flask cv seed-templates' khi deploy); bỏ qua nếu schema chưa nâng cấp
+        if app.config['SEED_TEMPLATES_ON_STARTUP']:
+            try:
+                CVTemplate.seed_default_templates()
+            except (OperationalError, ProgrammingError):
+                db.session.rollback()
+                app.logger.warning("Chưa seed được template: schema cũ, hãy chạy 'flask db upgrade'")
     
     return app
 
@@ -0,0 +1,163 @@
+import click
+from flask.cli import AppGroup
+
+from db import db
+
+cv_cli = AppGroup('cv', help='Các lệnh quản trị dữ liệu CV')
+
+
+@cv_cli.command('backfill-summaries')
+@click.option('--batch-size', default=500, show_default=True, help='Số CV xử lý trong mỗi lô')
+def backfill_summaries_command(batch_size):
+    """Tính lại các cột tóm tắt (tên, vị trí, hash, kích thước...) cho CV cũ"""
+    from models.cv import backfill_summaries
+    
+    with db.engine.connect() as connection:
+        updated = backfill_summaries(connection, batch_size=batch_size, commit_each_batch=True)
+    
+    click.echo(f'Đã cập nhật cột tóm tắt cho {updated} CV.')
+
+
+@cv_cli.command('migrate-storage')
+@click.option('--batch-size', default=500, show_default=True, help='Số CV xử lý trong mỗi lô')
+@click.option('--include-blobs', is_flag=True, help='Thử chuyển cả CV đang lưu blob sang overlay')
+def migrate_storage_command(batch_size, include_blobs):
+    """Chuyển content của các CV cũ sang overlay/blob (template_data) và cột form_json"""
+    from models.cv import migrate_storage_layout
+    
+    with db.engine.connect() as connection:
+        converted = migrate_storage_layout(
+            connection, batch_size=batch_size, commit_each_batch=True, include_blobs=include_blobs
+        )
+    
+    click.echo(f'Đã chuyển cách lưu content cho {converted} CV.')
+
+
+@cv_cli.command('upgrade-content')
+@click.option('--batch-size', default=200, show_default=True, help='Số CV xử lý trong mỗi lô')
+def upgrade_content_command(batch_size):
+    """Ghi lại content của các CV cũ theo schema hiện tại (CV được sửa cũng tự nâng cấp khi ghi)"""
+    from models.cv import upgrade_content_schema
+    
+    upgraded = upgrade_content_schema(batch_size=batch_size)
+    click.echo(f'Đã nâng cấp content cho {upgraded} CV.')
+
+
+@cv_cli.command('gc-blobs')
+@click.option('--reconcile', is_flag=True, help='Tính lại refcount từ bảng cv trước khi dọn')
+@click.option('--grace-minutes', default=60, show_default=True, help='Chỉ xoá blob tạo trước khoảng thời gian này')
+@click.option('--batch-size', default=500, show_default=True, help='Số blob xoá trong mỗi lô')
+def gc_blobs_command(reconcile, grace_minutes, batch_size):
+    """Xoá các blob content không còn CV nào tham chiếu"""
+    from datetime import timedelta
+    from models.cv import CV
+    from models.cv_blob import collect_garbage, reconcile_refcounts
+    
+    with db.engine.connect() as connection:
+        if reconcile:
+            reconcile_refcounts(connection, [CV.__table__.c.template_blob_hash])
+            connection.commit()
+        deleted = collect_garbage(connection, timedelta(minutes=grace_minutes), batch_size)
+        connection.commit()
+    
+    click.echo(f'Đã xoá {deleted} blob không còn được tham chiếu.')
+
+
+@cv_cli.command('recompress')
+@click.option('--batch-size', default=200, show_default=True, help='Số hàng xử lý trong mỗi lô')
+def recompress_command(batch_size):
+    """Nén lại các cột JSON lớn (CV, template) theo cấu hình nén hiện tại"""
+    from models.types import compressed_columns, preferred_codec, recompress_column
+    
+    click.echo(f'Codec: {preferred_codec()}')
+    with db.engine.connect() as connection:
+        for table, column in compressed_columns(db.metadata):
+            scanned, rewritten = recompress_column(
+                connection, table, column, batch_size=batch_size, commit_each_batch=True
+            )
+            connection.commit()
+            click.echo(f'{table.name}.{column.name}: đã quét {scanned}, ghi lại {rewritten}')
+
+
+@cv_cli.command('compression-stats')
+def compression_stats_command():
+    """Thống kê dung lượng lưu trữ và tỉ lệ nén của các cột JSON lớn"""
+    from models.types import column_compression_stats, compressed_columns
+    
+    with db.engine.connect() as connection:
+        for table, column in compressed_columns(db.metadata):
+            stats = column_compression_stats(connection, table, column)
+            codecs = ', '.join(f'{codec}={count}' for codec, count in sorted(stats['codecs'].items()))
+            click.echo(
+                f"{table.name}.{column.name}: {stats['rows']} hàng, "
+                f"{stats['raw_bytes']} B gốc -> {stats['stored_bytes']} B lưu trữ "
+                f"(tỉ lệ {stats['ratio'] or '-'}x) [{codecs}]"
+            )
+
+
+@cv_cli.command('prune-revisions')
+@click.option('--keep', default=None, type=int, help='Số phiên bản tối thiểu giữ lại cho mỗi CV')
+def prune_revisions_command(keep):
+    """Xoá lịch sử phiên bản cũ theo chính sách lưu giữ"""
+    from models.cv_revision import REVISION_RETENTION, prune_all_revisions
+    
+    with db.engine.connect() as connection:
+        deleted = prune_all_revisions(connection, retention=keep or REVISION_RETENTION)
+        connection.commit()
+    
+    click.echo(f'Đã xoá {deleted} phiên bản cũ.')
+
+
+@cv_cli.command('reindex-search')
+@click.option('--batch-size', default=200, show_default=True, help='Số CV index trong mỗi lô')
+def reindex_search_command(batch_size):
+    """Dựng lại index tìm kiếm full-text cho toàn bộ CV"""
+    from models.cv_search import create_search_index, rebuild_search_index
+    
+    with db.engine.begin() as connection:
+        if not create_search_index(connection):
+            click.echo('Database không hỗ trợ index full-text, tìm kiếm dùng ilike.')
+            return
+    
+    indexed = rebuild_search_index(batch_size=batch_size)
+    click.echo(f'Đã index {indexed} CV.')
+
+
+@cv_cli.command('rollup-events')
+@click.option('--batch-size', default=5000, show_default=True, help='Số sự kiện xử lý trong mỗi lô')
+@click.option('--prune-days', default=None, type=int, help='Xoá sự kiện đã gom và cũ hơn số ngày này')
+def rollup_events_command(batch_size, prune_days):
+    """Gom nhật ký sự kiện (xem, tải, chọn template) vào thống kê theo giờ/ngày"""
+    from datetime import timedelta
+    from models.analytics import prune_events, rollup_events
+    
+    with db.engine.connect() as connection:
+        processed = rollup_events(connection, batch_size=batch_size, commit_each_batch=True)
+        connection.commit()
+        click.echo(f'Đã gom {processed} sự kiện.')
+        
+        if prune_days is not None:
+            deleted = prune_events(connection, timedelta(days=prune_days))
+            connection.commit()
+            click.echo(f'Đã xoá {deleted} sự kiện cũ.')
+
+
+@cv_cli.command('seed-templates')
+@click.option('--force', is_flag=True, help='Ghi lại mọi template kể cả khi nội dung không đổi')
+def seed_templates_command(force):
+    """Tạo/cập nhật các template đi kèm ứng dụng (chỉ ghi template có nội dung đổi)"""
+    from models.cv_template import CVTemplate
+    
+    written = CVTemplate.seed_default_templates(force=force)
+    click.echo(f'Đã ghi {written} template.')
+
+
+@cv_cli.command('build-template-manifest')
+def build_template_manifest_command():
+    """Tạo lại data/templates/manifest.json sau khi sửa file template (tăng version của template đã đổi)"""
+    from models.cv_template import seed_hash
+    from models.template_bundle import build_manifest
+    
+    entries = build_manifest(seed_hash)
+    for entry in entries:
+        click.echo(f"{entry['id']}: v{entry['version']} {entry['hash'][:12]}")
@@ -0,0 +1,147 @@
+import atexit
+import logging
+import threading
+import time
+
+from sqlalchemy import bindparam
+
+from db import db
+
+logger = logging.getLogger(__name__)
+
+# Số giây giữa hai lần ghi bộ đếm xuống database
+DEFAULT_FLUSH_INTERVAL = 5
+# Số lần ghi thất bại liên tiếp trước khi bỏ một lô (database hỏng lâu, schema lệch khi deploy...)
+DEFAULT_FLUSH_ATTEMPTS = 5
+
+
+class CounterBuffer:
+    """Gom các lượt tăng bộ đếm (views, downloads, usage_count...) trong process và ghi theo lô.
+    
+    Mỗi lần ghi là một UPDATE nguyên tử 'cột = cột + n' cho từng hàng nên không mất lượt đếm khi
+    nhiều request/process cùng tăng. Giá trị hiển thị lấy qua value() để thấy ngay các lượt chưa ghi.
+    """
+    
+    def __init__(self, app=None):
+        self.app = None
+        self.interval = DEFAULT_FLUSH_INTERVAL
+        self.max_attempts = DEFAULT_FLUSH_ATTEMPTS
+        self._pending = {}  # (model, cột, id) -> số lượt chưa ghi
+        self._rows = []  # (model, giá trị) các hàng chờ insert (nhật ký sự kiện)
+        self._failed = []  # [số lần đã thử, lượt, hàng] các lô ghi lỗi, thử lại ở lần flush sau
+        self._lock = threading.Lock()
+        self._thread = None
+        self._atexit_registered = False
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        if self.app is not None and self.app is not app:
+            self.flush()
+        self.app = app
+        self.interval = app.config.get('COUNTER_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+        self.max_attempts = app.config.get('COUNTER_FLUSH_ATTEMPTS', DEFAULT_FLUSH_ATTEMPTS)
+        app.extensions['counter_buffer'] = self
+        if not self._atexit_registered:
+            atexit.register(self.flush)
+            self._atexit_registered = True
+    
+    def increment(self, model, row_id, column, amount=1):
+        """Tăng bộ đếm column của hàng row_id (chưa ghi xuống database)"""
+        if row_id is None:
+            return
+        key = (model, column, row_id)
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + amount
+        self._ensure_worker()
+    
+    def append(self, model, values):
+        """Thêm một hàng vào bảng của model ở lần flush tới (dùng cho bảng chỉ thêm như nhật ký sự kiện)"""
+        with self._lock:
+            self._rows.append((model, values))
+        self._ensure_worker()
+    
+    def pending(self, model, row_id, column):
+        """Số lượt đã tăng nhưng chưa ghi của một bộ đếm (kể cả các lô đang chờ ghi lại)"""
+        key = (model, column, row_id)
+        return self._pending.get(key, 0) + sum(batch[1].get(key, 0) for batch in self._failed)
+    
+    def value(self, instance, column):
+        """Giá trị bộ đếm để hiển thị: giá trị đã lưu + các lượt chưa ghi"""
+        return (getattr(instance, column) or 0) + self.pending(type(instance), instance.id, column)
+    
+    def flush(self):
+        """Ghi mọi lượt và hàng đang chờ xuống database (một transaction), trả về số lượt + số hàng đã ghi"""
+        with self._lock:
+            batches = self._failed
+            if self._pending or self._rows:
+                batches = batches + [[0, self._pending, self._rows]]
+            self._failed, self._pending, self._rows = [], {}, []
+        if not batches or self.app is None:
+            return 0
+        
+        pending = {}
+        rows = []
+        for _, batch_pending, batch_rows in batches:
+            for key, amount in batch_pending.items():
+                pending[key] = pending.get(key, 0) + amount
+            rows.extend(batch_rows)
+        
+        grouped = {}
+        for (model, column, row_id), amount in pending.items():
+            if amount:
+                grouped.setdefault((model, column), []).append({'_id': row_id, '_amount': amount})
+        inserts = {}
+        for model, values in rows:
+            inserts.setdefault(model, []).append(values)
+        
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as connection:
+                    for model, params in inserts.items():
+                        connection.execute(model.__table__.insert(), params)
+                    for (model, column), params in grouped.items():
+                        table = model.__table__
+                        values = {column: table.c[column] + bindparam('_amount')}
+                        # Giữ nguyên các cột onupdate (updated_at): tăng bộ đếm không phải là sửa nội dung
+                        values.update({c.name: c for c in table.columns if c.onupdate is not None})
+                        connection.execute(
+                            table.update().where(table.c.id == bindparam('_id')).values(values),
+                            params
+                        )
+        except Exception:
+            logger.exception('Không ghi được bộ đếm xuống database')
+            # Giữ lại các lô để lần sau ghi tiếp; lô đã thử đủ số lần thì bỏ để bộ nhớ không tăng mãi
+            retry = []
+            for batch in batches:
+                batch[0] += 1
+                if batch[0] < self.max_attempts:
+                    retry.append(batch)
+                else:
+                    logger.error(
+                        'Bỏ lô bộ đếm sau %d lần ghi lỗi: mất %d lượt tăng (%d bộ đếm) và %d hàng',
+                        batch[0], sum(batch[1].values()), len(batch[1]), len(batch[2])
+                    )
+            with self._lock:
+                self._failed[:0] = retry
+            return 0
+        
+        return sum(pending.values()) + len(rows)
+    
+    def _ensure_worker(self):
+        """Khởi động thread ghi định kỳ (lần tăng đầu tiên trong process)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='counter-buffer', daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+
+counters = CounterBuffer()
@@ -1,3 +1,53 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy()
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS theo loại database của SQLALCHEMY_DATABASE_URI"""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        # Timeout của driver (giây), PRAGMA busy_timeout trong connect event đặt lại cùng giá trị
+        return {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT'] / 1000}}
+    
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+
+
+def sqlite_pragmas(config, url):
+    """Các PRAGMA chạy trên mỗi connection SQLite mới"""
+    pragmas = [
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT']),
+        ('cache_size', -config['SQLITE_CACHE_SIZE']),  # Số âm: đơn vị KiB
+    ]
+    if url.database and url.database != ':memory:':
+        # WAL: người đọc không bị chặn bởi người ghi và ngược lại; NORMAL đủ an toàn với WAL
+        pragmas = [('journal_mode', 'WAL'), ('synchronous', 'NORMAL')] + pragmas
+        pragmas.append(('mmap_size', config['SQLITE_MMAP_SIZE']))
+    return pragmas
+
+
+def configure_engine(app):
+    """Thiết lập engine theo config (gọi sau db.init_app): PRAGMA cho SQLite"""
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+    
+    pragmas = sqlite_pragmas(app.config, engine.url)
+    
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name} = {value}')
+        finally:
+            cursor.close()
@@ -0,0 +1,120 @@
+"""Add denormalised summary columns to cv
+
+Revision ID: a1c3e5f70026
+Revises: 
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import hashlib
+import json
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c3e5f70026'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+SUMMARY_COLUMNS = [
+    ('full_name', sa.String(length=200)),
+    ('position', sa.String(length=200)),
+    ('content_hash', sa.String(length=64)),
+    ('content_size', sa.Integer()),
+    ('experience_count', sa.Integer()),
+    ('education_count', sa.Integer()),
+    ('skill_count', sa.Integer()),
+    ('language_count', sa.Integer()),
+]
+INDEXED_COLUMNS = ['full_name', 'position', 'content_hash']
+
+
+def upgrade():
+    # Bảng có thể đã có cột mới nếu được tạo bằng db.create_all()
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('cv')}
+    existing_indexes = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('cv')}
+    
+    with op.batch_alter_table('cv', schema=None) as batch_op:
+        for name, column_type in SUMMARY_COLUMNS:
+            if name not in existing:
+                batch_op.add_column(sa.Column(name, column_type, nullable=True))
+    
+    with op.batch_alter_table('cv', schema=None) as batch_op:
+        for name in INDEXED_COLUMNS:
+            if f'ix_cv_{name}' not in existing_indexes:
+                batch_op.create_index(f'ix_cv_{name}', [name], unique=False)
+    
+    # Backfill theo lô để không giữ toàn bộ content trong bộ nhớ
+    backfill(op.get_bind(), batch_size=500)
+
+
+def _find_text_by_id(template_data, element_id):
+    stack = [template_data] if isinstance(template_data, dict) else []
+    while stack:
+        node = stack.pop()
+        attrs = node.get('attrs') or {}
+        if attrs.get('id') == element_id and isinstance(attrs.get('text'), str):
+            return attrs['text']
+        stack.extend(child for child in node.get('children') or [] if isinstance(child, dict))
+    return ''
+
+
+def summarize(raw_content):
+    """Giá trị các cột tóm tắt từ cột content (content và cách tính tại revision này)"""
+    try:
+        content_dict = json.loads(raw_content) if raw_content else {}
+    except json.JSONDecodeError:
+        content_dict = {}
+    content_dict = content_dict if isinstance(content_dict, dict) else {}
+    form_data = content_dict.get('form_data') or {}
+    template_data = content_dict.get('template_data') or {}
+    raw_bytes = (raw_content or '').encode('utf-8')
+    
+    full_name = form_data.get('full_name') or _find_text_by_id(template_data, 'full_name')
+    position = form_data.get('position') or _find_text_by_id(template_data, 'position')
+    
+    return {
+        'full_name': (full_name or '')[:200],
+        'position': (position or '')[:200],
+        'content_hash': hashlib.sha256(raw_bytes).hexdigest() if raw_bytes else None,
+        'content_size': len(raw_bytes),
+        'experience_count': len(form_data.get('experience') or []),
+        'education_count': len(form_data.get('education') or []),
+        'skill_count': len(form_data.get('technical_skills') or []) + len(form_data.get('soft_skills') or []),
+        'language_count': len(form_data.get('languages') or []),
+    }
+
+
+def backfill(connection, batch_size):
+    """Tính cột tóm tắt từ cột content.
+    
+    Không import models.cv: model luôn theo schema mới nhất, còn migration phải chạy được
+    với schema tại revision này (cột content chưa bị tách/nén).
+    """
+    names = [name for name, _ in SUMMARY_COLUMNS]
+    cv = sa.table('cv', sa.column('id', sa.Integer), sa.column('content', sa.Text),
+                  *[sa.column(name, column_type) for name, column_type in SUMMARY_COLUMNS])
+    last_id = 0
+    
+    while True:
+        rows = connection.execute(
+            sa.select(cv.c.id, cv.c.content).where(cv.c.id > last_id).order_by(cv.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        
+        params = [{'_id': row.id, **summarize(row.content)} for row in rows]
+        connection.execute(
+            cv.update().where(cv.c.id == sa.bindparam('_id')).values({name: sa.bindparam(name) for name in names}),
+            params
+        )
+        last_id = rows[-1].id
+
+
+def downgrade():
+    with op.batch_alter_table('cv', schema=None) as batch_op:
+        for name in INDEXED_COLUMNS:
+            batch_op.drop_index(f'ix_cv_{name}')
+        for name, _ in reversed(SUMMARY_COLUMNS):
+            batch_op.drop_column(name)
@@ -0,0 +1,237 @@
+"""Immutable template version snapshots and per-version artifacts
+
+Revision ID: a3c5e7f90048
+Revises: f2b4d6e80044
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+from datetime import datetime
+import hashlib
+import json
+import os
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c5e7f90048'
+down_revision = 'f2b4d6e80044'
+branch_labels = None
+depends_on = None
+
+
+# Cách lưu overlay tại revision này, chép vào đây thay vì import models.cv / models.konva:
+# migration phải cho cùng kết quả dù code model sau này đổi.
+LAYOUT_SPLIT = 1
+LAYOUT_OVERLAY = 3
+
+GEOMETRY_ATTRS = frozenset({
+    'x', 'y', 'width', 'height', 'rotation', 'scaleX', 'scaleY', 'skewX', 'skewY',
+    'offsetX', 'offsetY', 'radius', 'innerRadius', 'outerRadius', 'cornerRadius',
+    'strokeWidth', 'fontSize', 'lineHeight', 'letterSpacing', 'padding', 'opacity', 'points'
+})
+NODE_DEFAULTS = {
+    'x': 0, 'y': 0, 'rotation': 0, 'scaleX': 1, 'scaleY': 1, 'skewX': 0, 'skewY': 0,
+    'offsetX': 0, 'offsetY': 0, 'opacity': 1, 'visible': True, 'listening': True, 'draggable': False,
+}
+CLASS_DEFAULTS = {
+    'Text': {
+        'fontFamily': 'Arial', 'fontStyle': 'normal', 'fontVariant': 'normal', 'textDecoration': '',
+        'align': 'left', 'verticalAlign': 'top', 'padding': 0, 'letterSpacing': 0, 'wrap': 'word',
+        'ellipsis': False,
+    },
+    'Rect': {'cornerRadius': 0},
+}
+
+
+def _round(value, precision):
+    if isinstance(value, list):
+        return [_round(item, precision) for item in value]
+    if isinstance(value, float):
+        value = round(value, precision)
+        return int(value) if value.is_integer() else value
+    return value
+
+
+def _canonicalize(document):
+    """Template gốc dạng chuẩn hoá: overlay được tính so với bản này chứ không phải JSON thô"""
+    # Cùng nguồn với config KONVA_GEOMETRY_PRECISION của app
+    precision = int(os.getenv('KONVA_GEOMETRY_PRECISION', '2'))
+    root = dict(document)
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        attrs = node.get('attrs')
+        if isinstance(attrs, dict):
+            defaults = {**NODE_DEFAULTS, **CLASS_DEFAULTS.get(node.get('className'), {})}
+            canonical = {}
+            for name, value in attrs.items():
+                if name in GEOMETRY_ATTRS:
+                    value = _round(value, precision)
+                if name in defaults and value == defaults[name] and isinstance(value, bool) == isinstance(defaults[name], bool):
+                    continue
+                canonical[name] = value
+            node['attrs'] = canonical
+        children = node.get('children')
+        if isinstance(children, list):
+            node['children'] = [dict(child) if isinstance(child, dict) else child for child in children]
+            stack.extend(child for child in node['children'] if isinstance(child, dict))
+    return root
+
+
+def _index_nodes(root):
+    """{khoá: node}; khoá là attrs.id hoặc '<khoá cha>/<index>', None nếu có khoá trùng"""
+    nodes = {}
+    stack = [(root, None, 0)]
+    while stack:
+        node, parent, index = stack.pop()
+        node_id = (node.get('attrs') or {}).get('id')
+        if parent is None:
+            key = ''
+        elif isinstance(node_id, str) and node_id:
+            key = node_id
+        else:
+            key = f'{parent}/{index}'
+        if key in nodes:
+            return None
+        nodes[key] = node
+        children = node.get('children') or []
+        for child_index in range(len(children) - 1, -1, -1):
+            if not isinstance(children[child_index], dict):
+                return None
+            stack.append((children[child_index], key, child_index))
+    return nodes
+
+
+def _apply_overlay(base, overlay):
+    """Dựng lại tài liệu đầy đủ từ template gốc (đã chuẩn hoá) và overlay"""
+    nodes = _index_nodes(base)
+    if nodes is None:
+        return base
+    for key, changed in (overlay.get('attrs') or {}).items():
+        if key in nodes:
+            nodes[key].setdefault('attrs', {}).update(changed)
+    for key, names in (overlay.get('unset') or {}).items():
+        if key in nodes:
+            attrs = nodes[key].get('attrs') or {}
+            for name in names:
+                attrs.pop(name, None)
+    removed = {id(nodes[key]) for key in overlay.get('removed') or [] if key in nodes}
+    if removed:
+        for node in nodes.values():
+            if node.get('children'):
+                node['children'] = [child for child in node['children'] if id(child) not in removed]
+    for entry in overlay.get('added') or []:
+        if entry.get('parent') in nodes:
+            parent = nodes[entry['parent']]
+            parent.setdefault('children', []).insert(entry.get('index', 0), entry['node'])
+    return base
+
+
+def _materialize(overlay, base_raw):
+    """template_data đầy đủ của overlay, None nếu không dựng lại được"""
+    base = json.loads(base_raw) if base_raw else None
+    if not isinstance(base, dict):
+        return None
+    return _apply_overlay(_canonicalize(base), overlay)
+
+
+def upgrade():
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    tables = inspector.get_table_names()
+    
+    if 'cv_template_versions' not in tables:
+        op.create_table(
+            'cv_template_versions',
+            sa.Column('template_id', sa.String(length=50), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.Column('content_hash', sa.String(length=64), nullable=False),
+            sa.Column('template', sa.LargeBinary(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('template_id', 'version')
+        )
+        op.create_index('ix_cv_template_versions_content_hash', 'cv_template_versions', ['content_hash'], unique=False)
+    
+    if 'cv_template_artifacts' not in tables:
+        op.create_table(
+            'cv_template_artifacts',
+            sa.Column('template_id', sa.String(length=50), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.Column('kind', sa.String(length=50), nullable=False),
+            sa.Column('data', sa.LargeBinary(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('template_id', 'version', 'kind')
+        )
+    
+    existing = {column['name'] for column in inspector.get_columns('cv')}
+    if 'template_version' not in existing:
+        with op.batch_alter_table('cv', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('template_version', sa.Integer(), nullable=True))
+    
+    # Snapshot version hiện tại của mọi template (các version cũ hơn không còn nội dung để lưu).
+    # template_version của CV cũ để NULL: không biết CV được tạo từ version nào.
+    from models.types import compress_text, decompress_value
+    templates = sa.table('cv_templates', sa.column('id', sa.String), sa.column('version', sa.Integer),
+                         sa.column('template', sa.LargeBinary))
+    versions = sa.table('cv_template_versions', sa.column('template_id', sa.String), sa.column('version', sa.Integer),
+                        sa.column('content_hash', sa.String), sa.column('template', sa.LargeBinary),
+                        sa.column('created_at', sa.DateTime))
+    stored = set(connection.execute(sa.select(versions.c.template_id, versions.c.version)).all())
+    for row in connection.execute(sa.select(templates.c.id, templates.c.version, templates.c.template)).all():
+        if row.template is None or (row.id, row.version) in stored:
+            continue
+        raw = decompress_value(row.template)
+        connection.execute(versions.insert().values(
+            template_id=row.id,
+            version=row.version,
+            content_hash=hashlib.sha256(raw.encode('utf-8')).hexdigest(),
+            template=compress_text(raw),
+            created_at=datetime.utcnow()
+        ))
+
+
+def downgrade():
+    # Overlay tính so với version cũ hơn version hiện tại chỉ dựng lại được từ snapshot:
+    # chuyển thành tài liệu đầy đủ trước khi xoá bảng (overlay còn lại dùng template hiện tại).
+    connection = op.get_bind()
+    from models.types import CompressedText
+    
+    cv = sa.table('cv', sa.column('id', sa.Integer), sa.column('storage_layout', sa.Integer),
+                  sa.column('template_json', CompressedText()), sa.column('template_overlay', CompressedText()))
+    templates = sa.table('cv_templates', sa.column('id', sa.String), sa.column('version', sa.Integer))
+    versions = sa.table('cv_template_versions', sa.column('template_id', sa.String), sa.column('version', sa.Integer),
+                        sa.column('template', CompressedText()))
+    current = dict(connection.execute(sa.select(templates.c.id, templates.c.version)).all())
+    snapshots = {}
+    rows = connection.execute(
+        sa.select(cv.c.id, cv.c.template_overlay).where(cv.c.storage_layout == LAYOUT_OVERLAY)
+    ).all()
+    for row in rows:
+        overlay = json.loads(row.template_overlay) if row.template_overlay else None
+        if not isinstance(overlay, dict):
+            continue
+        key = (overlay.get('base'), overlay.get('version'))
+        if key[1] == current.get(key[0]):
+            continue
+        if key not in snapshots:
+            snapshots[key] = connection.execute(
+                sa.select(versions.c.template)
+                .where(versions.c.template_id == key[0], versions.c.version == key[1])
+            ).scalar()
+        template_data = _materialize(overlay, snapshots[key])
+        if template_data is None:
+            continue
+        connection.execute(
+            cv.update().where(cv.c.id == row.id).values(
+                template_json=json.dumps(template_data, ensure_ascii=False),
+                template_overlay=None,
+                storage_layout=LAYOUT_SPLIT
+            )
+        )
+    
+    with op.batch_alter_table('cv', schema=None) as batch_op:
+        batch_op.drop_column('template_version')
+    op.drop_table('cv_template_artifacts')
+    op.drop_index('ix_cv_template_versions_content_hash', table_name='cv_template_versions')
+    op.drop_table('cv_template_versions')
@@ -0,0 +1,53 @@
+"""Full-text search index for CV content
+
+Revision ID: a7c9e1f30034
+Revises: f6b8d0e20031
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c9e1f30034'
+down_revision = 'f6b8d0e20031'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Chỉ tạo index rỗng: chạy 'flask cv reindex-search' để index các CV đã có
+    # (text được trích từ content đã dựng lại, cần code model nên không làm trong migration).
+    # Tìm kiếm vẫn dùng ilike cho tới khi lệnh đó ghi cờ 'cv_search.index_built' vào app_state.
+    connection = op.get_bind()
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        try:
+            op.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS cv_search_fts "
+                "USING fts5(owner, title, headline, body, tokenize='unicode61 remove_diacritics 2')"
+            )
+        except sa.exc.OperationalError:
+            # SQLite không có FTS5: ứng dụng tự quay về tìm kiếm bằng ilike
+            pass
+    elif dialect == 'postgresql':
+        op.execute(
+            'CREATE TABLE IF NOT EXISTS cv_search ('
+            'cv_id INTEGER PRIMARY KEY REFERENCES cv (id) ON DELETE CASCADE, '
+            'user_id INTEGER NOT NULL, document TSVECTOR NOT NULL)'
+        )
+        op.execute('CREATE INDEX IF NOT EXISTS ix_cv_search_document ON cv_search USING GIN (document)')
+        op.execute('CREATE INDEX IF NOT EXISTS ix_cv_search_user_id ON cv_search (user_id)')
+
+
+def downgrade():
+    connection = op.get_bind()
+    dialect = connection.dialect.name
+    # Index dựng lại sau này lại rỗng: bỏ cờ đã dựng index (app_state có từ migration sau)
+    if 'app_state' in sa.inspect(connection).get_table_names():
+        op.execute("DELETE FROM app_state WHERE key = 'cv_search.index_built'")
+    if dialect == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS cv_search_fts')
+    elif dialect == 'postgresql':
+        op.execute('DROP TABLE IF EXISTS cv_search')
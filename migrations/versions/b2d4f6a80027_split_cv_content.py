@@ -0,0 +1,53 @@
+"""Split cv.content into template_json and form_json columns
+
+Revision ID: b2d4f6a80027
+Revises: a1c3e5f70026
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d4f6a80027'
+down_revision = 'a1c3e5f70026'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Chỉ thêm cột: hàng cũ (storage_layout = 0) vẫn đọc được từ cột content và
+    # được tách khi ghi lần sau, hoặc chạy 'flask cv migrate-storage' để chuyển nền theo lô.
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('cv')}
+    
+    with op.batch_alter_table('cv', schema=None) as batch_op:
+        if 'template_json' not in existing:
+            batch_op.add_column(sa.Column('template_json', sa.Text(), nullable=True))
+        if 'form_json' not in existing:
+            batch_op.add_column(sa.Column('form_json', sa.Text(), nullable=True))
+        if 'storage_layout' not in existing:
+            batch_op.add_column(sa.Column('storage_layout', sa.Integer(), nullable=True, server_default='0'))
+
+
+def downgrade():
+    # Gộp lại vào cột content trước khi xoá các cột tách
+    connection = op.get_bind()
+    cv = sa.table('cv', sa.column('id', sa.Integer), sa.column('content', sa.Text),
+                  sa.column('template_json', sa.Text), sa.column('form_json', sa.Text),
+                  sa.column('storage_layout', sa.Integer))
+    rows = connection.execute(
+        sa.select(cv.c.id, cv.c.template_json, cv.c.form_json).where(cv.c.storage_layout == 1)
+    ).all()
+    for row in rows:
+        parts = []
+        if row.template_json:
+            parts.append(f'"template_data": {row.template_json}')
+        if row.form_json:
+            parts.append(f'"form_data": {row.form_json}')
+        connection.execute(cv.update().where(cv.c.id == row.id).values(content='{' + ', '.join(parts) + '}'))
+    
+    with op.batch_alter_table('cv', schema=None) as batch_op:
+        batch_op.drop_column('storage_layout')
+        batch_op.drop_column('form_json')
+        batch_op.drop_column('template_json')
@@ -0,0 +1,30 @@
+"""Add schema_version to cv for lazily upgraded content
+
+Revision ID: b4d6f8a10050
+Revises: a3c5e7f90048
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d6f8a10050'
+down_revision = 'a3c5e7f90048'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CV cũ để NULL (coi như version 1): content được nâng cấp khi đọc, lưu lại khi ghi
+    # hoặc bằng lệnh 'flask cv upgrade-content'
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('cv')}
+    if 'schema_version' not in existing:
+        with op.batch_alter_table('cv', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('schema_version', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('cv', schema=None) as batch_op:
+        batch_op.drop_column('schema_version')
@@ -0,0 +1,72 @@
+"""Analytics event log, hourly/daily rollups and app_state
+
+Revision ID: b8d0f2a40036
+Revises: a7c9e1f30034
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d0f2a40036'
+down_revision = 'a7c9e1f30034'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+    
+    if 'app_state' not in tables:
+        op.create_table(
+            'app_state',
+            sa.Column('key', sa.String(length=100), nullable=False),
+            sa.Column('value', sa.Text(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('key')
+        )
+    
+    if 'cv_events' not in tables:
+        op.create_table(
+            'cv_events',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('kind', sa.String(length=20), nullable=False),
+            sa.Column('cv_id', sa.Integer(), nullable=True),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('template_id', sa.String(length=50), nullable=True),
+            sa.Column('detail', sa.String(length=20), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+    
+    if 'cv_event_rollups' not in tables:
+        op.create_table(
+            'cv_event_rollups',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('granularity', sa.String(length=10), nullable=False),
+            sa.Column('bucket', sa.DateTime(), nullable=False),
+            sa.Column('kind', sa.String(length=20), nullable=False),
+            sa.Column('cv_id', sa.Integer(), nullable=True),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('template_id', sa.String(length=50), nullable=True),
+            sa.Column('detail', sa.String(length=20), nullable=True),
+            sa.Column('count', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('cv_event_rollups', schema=None) as batch_op:
+            batch_op.create_index('ix_cv_event_rollups_user', ['granularity', 'user_id', 'kind', 'bucket'], unique=False)
+            batch_op.create_index('ix_cv_event_rollups_template', ['granularity', 'kind', 'template_id', 'bucket'], unique=False)
+            batch_op.create_index('ix_cv_event_rollups_cv', ['granularity', 'cv_id', 'bucket'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('cv_event_rollups', schema=None) as batch_op:
+        batch_op.drop_index('ix_cv_event_rollups_cv')
+        batch_op.drop_index('ix_cv_event_rollups_template')
+        batch_op.drop_index('ix_cv_event_rollups_user')
+    
+    op.drop_table('cv_event_rollups')
+    op.drop_table('cv_events')
+    op.drop_table('app_state')
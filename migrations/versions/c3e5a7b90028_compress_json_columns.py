@@ -0,0 +1,57 @@
+"""Store large JSON columns as compressed binary
+
+Revision ID: c3e5a7b90028
+Revises: b2d4f6a80027
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e5a7b90028'
+down_revision = 'b2d4f6a80027'
+branch_labels = None
+depends_on = None
+
+COLUMNS = [('cv', 'content'), ('cv', 'template_json'), ('cv_templates', 'template')]
+
+
+def upgrade():
+    # SQLite lưu được BLOB trong cột TEXT nên không cần đổi kiểu; hàng cũ vẫn đọc được
+    # và được nén khi ghi lại hoặc khi chạy 'flask cv recompress'.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    
+    for table, column in COLUMNS:
+        op.alter_column(
+            table, column,
+            type_=sa.LargeBinary(),
+            postgresql_using=f"convert_to({column}, 'UTF8')"
+        )
+
+
+def downgrade():
+    # Cần giải nén toàn bộ trước khi hạ cấp: dữ liệu nén không chuyển được về TEXT
+    connection = op.get_bind()
+    from models.types import decompress_value
+    postgresql = connection.dialect.name == 'postgresql'
+    
+    for table_name, column_name in COLUMNS:
+        table = sa.table(table_name, sa.column('id'), sa.column(column_name, sa.LargeBinary))
+        column = table.c[column_name]
+        rows = connection.execute(sa.select(table.c.id, column).where(column.isnot(None))).all()
+        for row in rows:
+            text = decompress_value(row[1])
+            # PostgreSQL: cột vẫn là BYTEA cho tới alter_column bên dưới; SQLite: ghi lại dạng TEXT
+            # (ghi bytes sẽ thành BLOB và các migration hạ cấp tiếp theo đọc ra b'...')
+            value = sa.type_coerce(text.encode('utf-8'), sa.LargeBinary) if postgresql else sa.type_coerce(text, sa.Text)
+            connection.execute(table.update().where(table.c.id == row.id).values({column_name: value}))
+        
+        if postgresql:
+            op.alter_column(
+                table_name, column_name,
+                type_=sa.Text(),
+                postgresql_using=f"convert_from({column_name}, 'UTF8')"
+            )
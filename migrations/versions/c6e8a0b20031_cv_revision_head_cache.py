@@ -0,0 +1,32 @@
+"""Cache the latest full revision text on each keyframe
+
+Revision ID: c6e8a0b20031
+Revises: b4d6f8a10050
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6e8a0b20031'
+down_revision = 'b4d6f8a10050'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keyframe cũ để NULL: lần lưu kế tiếp dựng lại chuỗi một lần rồi ghi cache
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('cv_revisions')}
+    with op.batch_alter_table('cv_revisions', schema=None) as batch_op:
+        if 'head_number' not in existing:
+            batch_op.add_column(sa.Column('head_number', sa.Integer(), nullable=True))
+        if 'head_data' not in existing:
+            batch_op.add_column(sa.Column('head_data', sa.LargeBinary(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('cv_revisions', schema=None) as batch_op:
+        batch_op.drop_column('head_data')
+        batch_op.drop_column('head_number')
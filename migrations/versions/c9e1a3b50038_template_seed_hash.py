@@ -0,0 +1,29 @@
+"""Track the content hash of seeded templates
+
+Revision ID: c9e1a3b50038
+Revises: b8d0f2a40036
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9e1a3b50038'
+down_revision = 'b8d0f2a40036'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # seed_hash trống: lần seed đầu tiên sau khi nâng cấp ghi lại các template đi kèm một lần
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('cv_templates')}
+    if 'seed_hash' not in existing:
+        with op.batch_alter_table('cv_templates', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('seed_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('cv_templates', schema=None) as batch_op:
+        batch_op.drop_column('seed_hash')
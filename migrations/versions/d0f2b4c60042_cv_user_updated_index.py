@@ -0,0 +1,28 @@
+"""Index cv by (user_id, updated_at) for per-user recent listings
+
+Revision ID: d0f2b4c60042
+Revises: c9e1a3b50038
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd0f2b4c60042'
+down_revision = 'c9e1a3b50038'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing_indexes = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('cv')}
+    if 'ix_cv_user_updated' not in existing_indexes:
+        with op.batch_alter_table('cv', schema=None) as batch_op:
+            batch_op.create_index('ix_cv_user_updated', ['user_id', 'updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('cv', schema=None) as batch_op:
+        batch_op.drop_index('ix_cv_user_updated')
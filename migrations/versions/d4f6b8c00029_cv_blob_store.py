@@ -0,0 +1,67 @@
+"""Content-addressed blob table for CV template data
+
+Revision ID: d4f6b8c00029
+Revises: c3e5a7b90028
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f6b8c00029'
+down_revision = 'c3e5a7b90028'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Chỉ tạo bảng và cột: CV cũ vẫn đọc được theo storage_layout hiện tại, được chuyển
+    # sang blob khi ghi lần sau hoặc khi chạy 'flask cv migrate-storage'.
+    inspector = sa.inspect(op.get_bind())
+    
+    if 'cv_blobs' not in inspector.get_table_names():
+        op.create_table(
+            'cv_blobs',
+            sa.Column('hash', sa.String(length=64), nullable=False),
+            sa.Column('data', sa.LargeBinary(), nullable=True),
+            sa.Column('size', sa.Integer(), nullable=True),
+            sa.Column('refcount', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('hash')
+        )
+    
+    existing = {column['name'] for column in inspector.get_columns('cv')}
+    indexes = {index['name'] for index in inspector.get_indexes('cv')}
+    foreign_keys = {fk['name'] for fk in inspector.get_foreign_keys('cv')}
+    
+    with op.batch_alter_table('cv', schema=None) as batch_op:
+        if 'template_blob_hash' not in existing:
+            batch_op.add_column(sa.Column('template_blob_hash', sa.String(length=64), nullable=True))
+        if 'ix_cv_template_blob_hash' not in indexes:
+            batch_op.create_index('ix_cv_template_blob_hash', ['template_blob_hash'], unique=False)
+        if 'template_blob_hash' not in existing and 'fk_cv_template_blob_hash' not in foreign_keys:
+            batch_op.create_foreign_key('fk_cv_template_blob_hash', 'cv_blobs', ['template_blob_hash'], ['hash'])
+
+
+def downgrade():
+    # Đưa template_data từ blob về cột template_json (cùng định dạng nén nên sao chép nguyên bytes)
+    cv = sa.table('cv', sa.column('template_json', sa.LargeBinary),
+                  sa.column('template_blob_hash', sa.String), sa.column('storage_layout', sa.Integer))
+    blobs = sa.table('cv_blobs', sa.column('hash', sa.String), sa.column('data', sa.LargeBinary))
+    op.execute(
+        cv.update()
+        .where(cv.c.storage_layout == 2)
+        .values(
+            template_json=sa.select(blobs.c.data).where(blobs.c.hash == cv.c.template_blob_hash).scalar_subquery(),
+            storage_layout=1
+        )
+    )
+    
+    with op.batch_alter_table('cv', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_cv_template_blob_hash', type_='foreignkey')
+        batch_op.drop_index('ix_cv_template_blob_hash')
+        batch_op.drop_column('template_blob_hash')
+    
+    op.drop_table('cv_blobs')
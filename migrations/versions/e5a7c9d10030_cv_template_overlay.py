@@ -0,0 +1,186 @@
+"""Store form-built CVs as overlays on their versioned template
+
+Revision ID: e5a7c9d10030
+Revises: d4f6b8c00029
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import json
+import os
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a7c9d10030'
+down_revision = 'd4f6b8c00029'
+branch_labels = None
+depends_on = None
+
+
+# Cách lưu overlay tại revision này, chép vào đây thay vì import models.cv / models.konva:
+# migration phải cho cùng kết quả dù code model sau này đổi.
+LAYOUT_SPLIT = 1
+LAYOUT_OVERLAY = 3
+
+GEOMETRY_ATTRS = frozenset({
+    'x', 'y', 'width', 'height', 'rotation', 'scaleX', 'scaleY', 'skewX', 'skewY',
+    'offsetX', 'offsetY', 'radius', 'innerRadius', 'outerRadius', 'cornerRadius',
+    'strokeWidth', 'fontSize', 'lineHeight', 'letterSpacing', 'padding', 'opacity', 'points'
+})
+NODE_DEFAULTS = {
+    'x': 0, 'y': 0, 'rotation': 0, 'scaleX': 1, 'scaleY': 1, 'skewX': 0, 'skewY': 0,
+    'offsetX': 0, 'offsetY': 0, 'opacity': 1, 'visible': True, 'listening': True, 'draggable': False,
+}
+CLASS_DEFAULTS = {
+    'Text': {
+        'fontFamily': 'Arial', 'fontStyle': 'normal', 'fontVariant': 'normal', 'textDecoration': '',
+        'align': 'left', 'verticalAlign': 'top', 'padding': 0, 'letterSpacing': 0, 'wrap': 'word',
+        'ellipsis': False,
+    },
+    'Rect': {'cornerRadius': 0},
+}
+
+
+def _round(value, precision):
+    if isinstance(value, list):
+        return [_round(item, precision) for item in value]
+    if isinstance(value, float):
+        value = round(value, precision)
+        return int(value) if value.is_integer() else value
+    return value
+
+
+def _canonicalize(document):
+    """Template gốc dạng chuẩn hoá: overlay được tính so với bản này chứ không phải JSON thô"""
+    # Cùng nguồn với config KONVA_GEOMETRY_PRECISION của app
+    precision = int(os.getenv('KONVA_GEOMETRY_PRECISION', '2'))
+    root = dict(document)
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        attrs = node.get('attrs')
+        if isinstance(attrs, dict):
+            defaults = {**NODE_DEFAULTS, **CLASS_DEFAULTS.get(node.get('className'), {})}
+            canonical = {}
+            for name, value in attrs.items():
+                if name in GEOMETRY_ATTRS:
+                    value = _round(value, precision)
+                if name in defaults and value == defaults[name] and isinstance(value, bool) == isinstance(defaults[name], bool):
+                    continue
+                canonical[name] = value
+            node['attrs'] = canonical
+        children = node.get('children')
+        if isinstance(children, list):
+            node['children'] = [dict(child) if isinstance(child, dict) else child for child in children]
+            stack.extend(child for child in node['children'] if isinstance(child, dict))
+    return root
+
+
+def _index_nodes(root):
+    """{khoá: node}; khoá là attrs.id hoặc '<khoá cha>/<index>', None nếu có khoá trùng"""
+    nodes = {}
+    stack = [(root, None, 0)]
+    while stack:
+        node, parent, index = stack.pop()
+        node_id = (node.get('attrs') or {}).get('id')
+        if parent is None:
+            key = ''
+        elif isinstance(node_id, str) and node_id:
+            key = node_id
+        else:
+            key = f'{parent}/{index}'
+        if key in nodes:
+            return None
+        nodes[key] = node
+        children = node.get('children') or []
+        for child_index in range(len(children) - 1, -1, -1):
+            if not isinstance(children[child_index], dict):
+                return None
+            stack.append((children[child_index], key, child_index))
+    return nodes
+
+
+def _apply_overlay(base, overlay):
+    """Dựng lại tài liệu đầy đủ từ template gốc (đã chuẩn hoá) và overlay"""
+    nodes = _index_nodes(base)
+    if nodes is None:
+        return base
+    for key, changed in (overlay.get('attrs') or {}).items():
+        if key in nodes:
+            nodes[key].setdefault('attrs', {}).update(changed)
+    for key, names in (overlay.get('unset') or {}).items():
+        if key in nodes:
+            attrs = nodes[key].get('attrs') or {}
+            for name in names:
+                attrs.pop(name, None)
+    removed = {id(nodes[key]) for key in overlay.get('removed') or [] if key in nodes}
+    if removed:
+        for node in nodes.values():
+            if node.get('children'):
+                node['children'] = [child for child in node['children'] if id(child) not in removed]
+    for entry in overlay.get('added') or []:
+        if entry.get('parent') in nodes:
+            parent = nodes[entry['parent']]
+            parent.setdefault('children', []).insert(entry.get('index', 0), entry['node'])
+    return base
+
+
+def _materialize(overlay, base_raw):
+    """template_data đầy đủ của overlay, None nếu không dựng lại được"""
+    base = json.loads(base_raw) if base_raw else None
+    if not isinstance(base, dict):
+        return None
+    return _apply_overlay(_canonicalize(base), overlay)
+
+
+def upgrade():
+    # CV hiện có vẫn giữ blob; chạy 'flask cv migrate-storage --include-blobs' để chuyển sang overlay
+    inspector = sa.inspect(op.get_bind())
+    template_columns = {column['name'] for column in inspector.get_columns('cv_templates')}
+    cv_columns = {column['name'] for column in inspector.get_columns('cv')}
+    
+    if 'version' not in template_columns:
+        with op.batch_alter_table('cv_templates', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+    
+    if 'template_overlay' not in cv_columns:
+        with op.batch_alter_table('cv', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('template_overlay', sa.LargeBinary(), nullable=True))
+
+
+def downgrade():
+    # CV dạng overlay cần được dựng lại thành tài liệu đầy đủ trước khi xoá cột.
+    # Version cũ hơn đã được dựng lại khi hạ cấp cv_template_versions: overlay còn lại
+    # đều tính so với version hiện tại của template.
+    connection = op.get_bind()
+    from models.types import CompressedText
+    
+    cv = sa.table('cv', sa.column('id', sa.Integer), sa.column('storage_layout', sa.Integer),
+                  sa.column('template_json', CompressedText()), sa.column('template_overlay', CompressedText()))
+    templates = sa.table('cv_templates', sa.column('id', sa.String), sa.column('template', CompressedText()))
+    bases = {}
+    rows = connection.execute(
+        sa.select(cv.c.id, cv.c.template_overlay).where(cv.c.storage_layout == LAYOUT_OVERLAY)
+    ).all()
+    for row in rows:
+        overlay = json.loads(row.template_overlay) if row.template_overlay else None
+        template_data = None
+        if isinstance(overlay, dict):
+            template_id = overlay.get('base')
+            if template_id not in bases:
+                bases[template_id] = connection.execute(
+                    sa.select(templates.c.template).where(templates.c.id == template_id)
+                ).scalar()
+            template_data = _materialize(overlay, bases[template_id])
+        connection.execute(
+            cv.update().where(cv.c.id == row.id).values(
+                template_json=json.dumps(template_data, ensure_ascii=False) if template_data else None,
+                storage_layout=LAYOUT_SPLIT
+            )
+        )
+    
+    with op.batch_alter_table('cv', schema=None) as batch_op:
+        batch_op.drop_column('template_overlay')
+    with op.batch_alter_table('cv_templates', schema=None) as batch_op:
+        batch_op.drop_column('version')
\ No newline at end of file
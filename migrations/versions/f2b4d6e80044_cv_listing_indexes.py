@@ -0,0 +1,39 @@
+"""Composite indexes for per-user CV listings and sorts
+
+Revision ID: f2b4d6e80044
+Revises: e1a3c5d70043
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b4d6e80044'
+down_revision = 'e1a3c5d70043'
+branch_labels = None
+depends_on = None
+
+# (tên index, cột): WHERE user_id = ? kèm ORDER BY của từng cách sắp xếp, GROUP BY template của thống kê
+LISTING_INDEXES = [
+    ('ix_cv_user_created', ['user_id', 'created_at']),
+    ('ix_cv_user_title', ['user_id', 'title']),
+    ('ix_cv_user_views', ['user_id', 'views']),
+    ('ix_cv_user_downloads', ['user_id', 'downloads']),
+    ('ix_cv_user_template', ['user_id', 'template_id']),
+]
+
+
+def upgrade():
+    existing_indexes = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('cv')}
+    with op.batch_alter_table('cv', schema=None) as batch_op:
+        for name, columns in LISTING_INDEXES:
+            if name not in existing_indexes:
+                batch_op.create_index(name, columns, unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('cv', schema=None) as batch_op:
+        for name, _ in reversed(LISTING_INDEXES):
+            batch_op.drop_index(name)
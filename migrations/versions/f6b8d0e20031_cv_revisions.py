@@ -0,0 +1,47 @@
+"""CV revision history with keyframes and line deltas
+
+Revision ID: f6b8d0e20031
+Revises: e5a7c9d10030
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6b8d0e20031'
+down_revision = 'e5a7c9d10030'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'cv_revisions' in inspector.get_table_names():
+        return
+    
+    op.create_table(
+        'cv_revisions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cv_id', sa.Integer(), nullable=False),
+        sa.Column('number', sa.Integer(), nullable=False),
+        sa.Column('keyframe_number', sa.Integer(), nullable=False),
+        sa.Column('is_keyframe', sa.Boolean(), nullable=True),
+        sa.Column('data', sa.LargeBinary(), nullable=True),
+        sa.Column('size', sa.Integer(), nullable=True),
+        sa.Column('source', sa.String(length=20), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['cv_id'], ['cv.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('cv_id', 'number', name='uq_cv_revision_number')
+    )
+    with op.batch_alter_table('cv_revisions', schema=None) as batch_op:
+        batch_op.create_index('ix_cv_revisions_cv_id', ['cv_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('cv_revisions', schema=None) as batch_op:
+        batch_op.drop_index('ix_cv_revisions_cv_id')
+    
+    op.drop_table('cv_revisions')
@@ -1,3 +1,9 @@
+from models import app_state
+from models import analytics
 from models import user
+from models import cv_blob
 from models import cv
-from models import cv_template
\ No newline at end of file
+from models import cv_revision
+from models import cv_search
+from models import cv_template
+from models import template_version
\ No newline at end of file
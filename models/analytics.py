@@ -0,0 +1,191 @@
+from datetime import datetime, timedelta
+from counters import counters
+from db import db
+from models.app_state import get_state, set_state
+
+# Loại sự kiện
+EVENT_VIEW = 'view'
+EVENT_DOWNLOAD = 'download'  # detail: định dạng xuất (pdf, png...)
+EVENT_TEMPLATE_SELECT = 'template_select'
+EVENT_TEMPLATE_USE = 'template_use'  # Tạo CV từ template
+
+# Độ mịn của rollup
+GRANULARITY_HOUR = 'hour'
+GRANULARITY_DAY = 'day'
+
+# Chỉ rollup sự kiện cũ hơn khoảng này, để các lô sự kiện đang ghi dở (id nhỏ hơn nhưng commit sau) kịp commit
+ROLLUP_LAG = timedelta(minutes=1)
+
+ROLLUP_WATERMARK_KEY = 'analytics.rollup_watermark'
+
+# Độ phổ biến của template tính theo số lượt dùng trong cửa sổ này
+POPULARITY_WINDOW_DAYS = 30
+
+# Rollup chỉ đổi khi job chạy nên kết quả đọc được cache ngắn trong process
+USAGE_CACHE_TTL = timedelta(minutes=5)
+
+_usage_cache = {}
+
+
+class CVEvent(db.Model):
+    """Nhật ký sự kiện (chỉ thêm, ghi theo lô qua counters); được gom vào CVEventRollup rồi có thể xoá"""
+    __tablename__ = 'cv_events'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    cv_id = db.Column(db.Integer)  # Không khoá ngoại: sự kiện vẫn giữ sau khi CV bị xoá
+    user_id = db.Column(db.Integer)
+    template_id = db.Column(db.String(50))
+    detail = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CVEvent {self.kind} cv={self.cv_id}>'
+
+
+class CVEventRollup(db.Model):
+    """Số sự kiện theo khung giờ/ngày cho từng (loại, CV, user, template, detail)"""
+    __tablename__ = 'cv_event_rollups'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(10), nullable=False)  # hour, day
+    bucket = db.Column(db.DateTime, nullable=False)  # Thời điểm bắt đầu khung (UTC)
+    kind = db.Column(db.String(20), nullable=False)
+    cv_id = db.Column(db.Integer)
+    user_id = db.Column(db.Integer)
+    template_id = db.Column(db.String(50))
+    detail = db.Column(db.String(20))
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.Index('ix_cv_event_rollups_user', 'granularity', 'user_id', 'kind', 'bucket'),
+        db.Index('ix_cv_event_rollups_template', 'granularity', 'kind', 'template_id', 'bucket'),
+        db.Index('ix_cv_event_rollups_cv', 'granularity', 'cv_id', 'bucket'),
+    )
+    
+    def __repr__(self):
+        return f'<CVEventRollup {self.granularity} {self.bucket} {self.kind}={self.count}>'
+
+
+def record_event(kind, cv=None, user_id=None, template_id=None, detail=None):
+    """Ghi một sự kiện vào buffer (được insert theo lô cùng lần flush bộ đếm)"""
+    counters.append(CVEvent, {
+        'kind': kind,
+        'cv_id': cv.id if cv is not None else None,
+        'user_id': user_id if user_id is not None else getattr(cv, 'user_id', None),
+        'template_id': template_id if template_id is not None else getattr(cv, 'template_id', None),
+        'detail': detail,
+        'created_at': datetime.utcnow()
+    })
+
+
+def bucket_start(moment, granularity):
+    """Thời điểm bắt đầu khung giờ/ngày chứa moment"""
+    if granularity == GRANULARITY_HOUR:
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def rollup_events(connection, batch_size=5000, commit_each_batch=False):
+    """Gom các sự kiện mới (sau watermark) vào rollup theo giờ và ngày, trả về số sự kiện đã gom.
+    
+    Watermark (id sự kiện cuối đã gom) được ghi cùng transaction với rollup nên chạy lại không đếm trùng.
+    """
+    events = CVEvent.__table__
+    rollups = CVEventRollup.__table__
+    keys = ('kind', 'cv_id', 'user_id', 'template_id', 'detail')
+    cutoff = datetime.utcnow() - ROLLUP_LAG
+    processed = 0
+    
+    while True:
+        watermark = int(get_state(connection, ROLLUP_WATERMARK_KEY, 0))
+        batch = connection.execute(
+            db.select(events)
+            .where(events.c.id > watermark)
+            .order_by(events.c.id)
+            .limit(batch_size)
+        ).all()
+        # Không lọc created_at trong câu truy vấn: các lô từ nhiều worker đến không theo thứ tự nên
+        # sự kiện id nhỏ có thể mới hơn cutoff; watermark chỉ được dừng trước sự kiện mới đầu tiên
+        rows = []
+        for row in batch:
+            if row.created_at >= cutoff:
+                break
+            rows.append(row)
+        if not rows:
+            break
+        
+        totals = {}
+        for row in rows:
+            for granularity in (GRANULARITY_HOUR, GRANULARITY_DAY):
+                group = (granularity, bucket_start(row.created_at, granularity)) + tuple(getattr(row, key) for key in keys)
+                totals[group] = totals.get(group, 0) + 1
+        
+        for group, count in totals.items():
+            match = dict(zip(('granularity', 'bucket') + keys, group))
+            # So khớp cả giá trị NULL (IS NULL) vì cv_id/template_id/detail có thể trống
+            conditions = [rollups.c[name].is_(None) if value is None else rollups.c[name] == value
+                          for name, value in match.items()]
+            result = connection.execute(
+                rollups.update().where(*conditions).values(count=rollups.c.count + count)
+            )
+            if not result.rowcount:
+                connection.execute(rollups.insert().values(count=count, **match))
+        
+        set_state(connection, ROLLUP_WATERMARK_KEY, rows[-1].id)
+        processed += len(rows)
+        if commit_each_batch:
+            connection.commit()
+        if len(rows) < batch_size:
+            break
+    
+    return processed
+
+
+def prune_events(connection, older_than):
+    """Xoá các sự kiện đã được gom vào rollup và cũ hơn older_than, trả về số sự kiện đã xoá"""
+    events = CVEvent.__table__
+    watermark = int(get_state(connection, ROLLUP_WATERMARK_KEY, 0))
+    result = connection.execute(
+        events.delete().where(events.c.id <= watermark, events.c.created_at < datetime.utcnow() - older_than)
+    )
+    return result.rowcount
+
+
+def template_usage(days=POPULARITY_WINDOW_DAYS):
+    """Số CV được tạo từ mỗi template trong days ngày gần nhất {template_id: số lượt} (cache trong USAGE_CACHE_TTL)"""
+    now = datetime.utcnow()
+    cached = _usage_cache.get(days)
+    if cached and now - cached[0] < USAGE_CACHE_TTL:
+        return cached[1]
+    
+    since = bucket_start(now, GRANULARITY_DAY) - timedelta(days=days - 1)
+    rows = (
+        db.session.query(CVEventRollup.template_id, db.func.sum(CVEventRollup.count))
+        .filter(CVEventRollup.granularity == GRANULARITY_DAY,
+                CVEventRollup.kind == EVENT_TEMPLATE_USE,
+                CVEventRollup.bucket >= since)
+        .group_by(CVEventRollup.template_id)
+        .all()
+    )
+    usage = {template_id: int(total) for template_id, total in rows if template_id}
+    _usage_cache[days] = (now, usage)
+    return usage
+
+
+def user_activity(user_id, days=30):
+    """Số lượt xem và tải xuống theo ngày của các CV của user trong days ngày gần nhất"""
+    since = bucket_start(datetime.utcnow(), GRANULARITY_DAY) - timedelta(days=days - 1)
+    rows = (
+        db.session.query(CVEventRollup.bucket, CVEventRollup.kind, db.func.sum(CVEventRollup.count))
+        .filter(CVEventRollup.granularity == GRANULARITY_DAY,
+                CVEventRollup.user_id == user_id,
+                CVEventRollup.kind.in_((EVENT_VIEW, EVENT_DOWNLOAD)),
+                CVEventRollup.bucket >= since)
+        .group_by(CVEventRollup.bucket, CVEventRollup.kind)
+        .all()
+    )
+    activity = {}
+    for bucket, kind, total in rows:
+        activity.setdefault(bucket.date(), {EVENT_VIEW: 0, EVENT_DOWNLOAD: 0})[kind] = int(total)
+    return activity
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+from db import db
+from sqlalchemy.exc import IntegrityError, OperationalError
+import uuid
+
+# Khoá tự hết hạn sau khoảng này (process giữ khoá bị chết giữa chừng)
+LOCK_TTL = timedelta(minutes=10)
+
+
+class AppState(db.Model):
+    """Trạng thái dùng chung của ứng dụng dạng key/value (watermark của job, version cache...)"""
+    __tablename__ = 'app_state'
+    
+    key = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<AppState {self.key}={self.value}>'
+
+
+def get_state(connection, key, default=None):
+    """Đọc giá trị của key, default nếu chưa có"""
+    table = AppState.__table__
+    value = connection.execute(db.select(table.c.value).where(table.c.key == key)).scalar()
+    return default if value is None else value
+
+
+def set_state(connection, key, value):
+    """Ghi giá trị của key (tạo mới nếu chưa có)"""
+    table = AppState.__table__
+    values = {'value': None if value is None else str(value), 'updated_at': datetime.utcnow()}
+    result = connection.execute(table.update().where(table.c.key == key).values(**values))
+    if not result.rowcount:
+        connection.execute(table.insert().values(key=key, **values))
+
+
+def acquire_lock(name, ttl=LOCK_TTL):
+    """Giành khoá name dùng chung giữa các process (một hàng 'lock:<name>' trong app_state).
+    
+    Trả về token để nhả khoá, hoặc None nếu process khác đang giữ khoá chưa hết hạn.
+    """
+    table = AppState.__table__
+    key = f'lock:{name}'
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    value = f'{token} {(now + ttl).isoformat()}'
+    
+    try:
+        with db.engine.begin() as connection:
+            current = get_state(connection, key)
+            if current is None:
+                connection.execute(table.insert().values(key=key, value=value, updated_at=now))
+                return token
+            
+            _, _, expires = current.partition(' ')
+            if expires and datetime.fromisoformat(expires) > now:
+                return None
+            
+            # Khoá đã hết hạn: chiếm lại nếu chưa ai khác chiếm trước
+            result = connection.execute(
+                table.update().where(table.c.key == key, table.c.value == current)
+                .values(value=value, updated_at=now)
+            )
+            return token if result.rowcount else None
+    except (IntegrityError, OperationalError):
+        # Process khác vừa tạo khoá (hoặc đang ghi database)
+        return None
+
+
+def release_lock(name, token):
+    """Nhả khoá đã giành bằng acquire_lock"""
+    table = AppState.__table__
+    with db.engine.begin() as connection:
+        connection.execute(
+            table.delete().where(table.c.key == f'lock:{name}', table.c.value.like(f'{token} %'))
+        )
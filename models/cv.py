@@ -2,46 +2,584 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from counters import counters
 from db import db
+from models.analytics import EVENT_DOWNLOAD, EVENT_VIEW, record_event
+from models.cv_blob import adjust_refcounts, blob_hash, blob_size, load_blob, store_blob
+from models.cv_schema import CONTENT_SCHEMA_VERSION, current_form_data, upgrade_content
+from models.cv_template import load_base_template
+from models.konva import canonical_json, canonicalize
+from models.template_version import template_artifact
+from models.overlay import apply_overlay, build_overlay
+from models.types import CompressedText
+from sqlalchemy import event, inspect
+from sqlalchemy.orm.attributes import flag_modified
+import hashlib
 import json
 
+# Các cột tóm tắt được tính lại mỗi khi set_content, dùng cho trang danh sách
+SUMMARY_COLUMNS = (
+    'full_name', 'position', 'content_hash', 'content_size',
+    'experience_count', 'education_count', 'skill_count', 'language_count'
+)
+SUMMARY_TEXT_LENGTH = 200
+
+# Cách lưu content của CV
+LAYOUT_LEGACY = 0  # Toàn bộ {'template_data', 'form_data'} trong cột content
+LAYOUT_SPLIT = 1  # template_data và form_data nằm ở hai cột riêng
+LAYOUT_BLOB = 2  # template_data nằm trong bảng cv_blobs (theo hash), form_data trong cột form_json
+LAYOUT_OVERLAY = 3  # template_data lưu dạng overlay so với template gốc, form_data trong cột form_json
+
+# Chỉ lưu overlay khi nó nhỏ hơn tỉ lệ này so với tài liệu đầy đủ, ngược lại lưu blob
+OVERLAY_MAX_RATIO = 0.5
+
+# Loại artifact (theo version template) chứa JSON chuẩn hoá của template gốc
+CANONICAL_ARTIFACT = 'canonical.json'
+
+
+def _find_text_by_id(template_data, element_id):
+    """Tìm text của element theo id trong toàn bộ cây Konva"""
+    stack = [template_data] if isinstance(template_data, dict) else []
+    while stack:
+        node = stack.pop()
+        attrs = node.get('attrs') or {}
+        if attrs.get('id') == element_id and isinstance(attrs.get('text'), str):
+            return attrs['text']
+        stack.extend(child for child in node.get('children') or [] if isinstance(child, dict))
+    return ''
+
+
+def summarize_content(content_dict, raw_content):
+    """Tính các giá trị tóm tắt (tên, vị trí, hash, kích thước, số mục) từ content"""
+    content_dict = content_dict if isinstance(content_dict, dict) else {}
+    form_data = content_dict.get('form_data') or {}
+    template_data = content_dict.get('template_data') or {}
+    raw_bytes = (raw_content or '').encode('utf-8')
+    
+    full_name = form_data.get('full_name') or _find_text_by_id(template_data, 'full_name')
+    position = form_data.get('position') or _find_text_by_id(template_data, 'position')
+    
+    return {
+        'full_name': (full_name or '')[:SUMMARY_TEXT_LENGTH],
+        'position': (position or '')[:SUMMARY_TEXT_LENGTH],
+        'content_hash': hashlib.sha256(raw_bytes).hexdigest() if raw_bytes else None,
+        'content_size': len(raw_bytes),
+        'experience_count': len(form_data.get('experience') or []),
+        'education_count': len(form_data.get('education') or []),
+        'skill_count': len(form_data.get('technical_skills') or []) + len(form_data.get('soft_skills') or []),
+        'language_count': len(form_data.get('languages') or []),
+    }
+
+
+def _loads(raw):
+    """Parse JSON, trả về None nếu rỗng hoặc lỗi"""
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        return None
+
+
+def _dumps(value):
+    """Serialize JSON dạng chuẩn (khoá sắp xếp, không khoảng trắng), giữ None là NULL"""
+    return canonical_json(value)
+
+
+def blob_summary(template_hash, template_size, form_json):
+    """Hash và kích thước content của CV lưu dạng blob, tính từ hash của từng phần
+    
+    (không cần đọc lại template khi chỉ form_data thay đổi)
+    """
+    form_bytes = (form_json or '').encode('utf-8')
+    if not template_hash and not form_bytes:
+        return {'content_hash': None, 'content_size': 0}
+    form_hash = hashlib.sha256(form_bytes).hexdigest() if form_bytes else ''
+    return {
+        'content_hash': hashlib.sha256(f'{template_hash or ""}:{form_hash}'.encode('utf-8')).hexdigest(),
+        'content_size': template_size + len(form_bytes)
+    }
+
+
+def _canonical_base(connection, template_id, version, raw=None):
+    """Template gốc dạng chuẩn hoá (như template_data của CV), cache theo version.
+    
+    Dùng snapshot của version; nếu không có snapshot thì dùng raw hoặc version hiện tại của template.
+    """
+    canonical = template_artifact(
+        connection, template_id, version, CANONICAL_ARTIFACT, lambda data: _dumps(canonicalize(data))
+    )
+    if canonical is None:
+        if raw is None:
+            _, raw = load_base_template(connection, template_id)
+        base = _loads(raw)
+        return canonicalize(base) if isinstance(base, dict) else None
+    return _loads(canonical)
+
+
+def materialize_overlay(connection, overlay_raw):
+    """Dựng lại template_data từ overlay và snapshot template gốc (đã cache) của nó"""
+    overlay = _loads(overlay_raw)
+    if not isinstance(overlay, dict):
+        return None
+    # Overlay được tính so với một version cụ thể của template: dùng đúng snapshot của version đó
+    base = _canonical_base(connection, overlay.get('base'), overlay.get('version'))
+    if base is None:
+        return None
+    return apply_overlay(base, overlay)
+
+
+def make_overlay(connection, template_id, template_data, raw, base_template=None):
+    """JSON overlay của template_data so với template gốc, None nếu không đủ nhỏ để đáng lưu
+    
+    base_template: (version, JSON) của template gốc nếu đã đọc sẵn.
+    """
+    if not template_id or not isinstance(template_data, dict) or not raw:
+        return None
+    version, base_raw = base_template or load_base_template(connection, template_id)
+    if base_raw is None:
+        return None
+    base = _canonical_base(connection, template_id, version, base_raw)
+    if not isinstance(base, dict):
+        return None
+    
+    overlay = build_overlay(base, template_data)
+    if overlay is None:
+        return None
+    overlay_raw = _dumps({'base': template_id, 'version': version, **overlay})
+    return overlay_raw if len(overlay_raw) <= len(raw) * OVERLAY_MAX_RATIO else None
+
+
+def _row_summary(row, connection):
+    """Tính các cột tóm tắt của một hàng cv theo cách lưu content của hàng đó"""
+    if row.storage_layout == LAYOUT_OVERLAY:
+        content_dict = {
+            'template_data': materialize_overlay(connection, row.template_overlay) or {},
+            'form_data': _loads(row.form_json) or {}
+        }
+        overlay_size = len(row.template_overlay.encode('utf-8')) if row.template_overlay else 0
+        return {
+            **summarize_content(content_dict, None),
+            **blob_summary(blob_hash(row.template_overlay) if row.template_overlay else None,
+                           overlay_size, row.form_json)
+        }
+    if row.storage_layout == LAYOUT_BLOB:
+        template_raw = load_blob(connection, row.template_blob_hash)
+        content_dict = {
+            'template_data': _loads(template_raw) or {},
+            'form_data': _loads(row.form_json) or {}
+        }
+        template_size = len(template_raw.encode('utf-8')) if template_raw else 0
+        return {
+            **summarize_content(content_dict, None),
+            **blob_summary(row.template_blob_hash, template_size, row.form_json)
+        }
+    if row.storage_layout == LAYOUT_SPLIT:
+        content_dict = {
+            'template_data': _loads(row.template_json) or {},
+            'form_data': _loads(row.form_json) or {}
+        }
+        return summarize_content(content_dict, (row.template_json or '') + (row.form_json or ''))
+    return summarize_content(upgrade_content(_loads(row.content)), row.content)
+
+
+def backfill_summaries(connection, batch_size=500, commit_each_batch=False):
+    """Tính lại cột tóm tắt cho các CV cũ theo từng lô, trả về số CV đã cập nhật"""
+    table = CV.__table__
+    last_id = 0
+    updated = 0
+    
+    while True:
+        rows = connection.execute(
+            db.select(table.c.id, table.c.content, table.c.template_json, table.c.form_json,
+                      table.c.template_blob_hash, table.c.template_overlay, table.c.storage_layout)
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        
+        params = []
+        for row in rows:
+            params.append({'_id': row.id, **_row_summary(row, connection)})
+        
+        connection.execute(
+            table.update()
+            .where(table.c.id == db.bindparam('_id'))
+            .values({name: db.bindparam(name) for name in SUMMARY_COLUMNS}),
+            params
+        )
+        
+        if commit_each_batch:
+            connection.commit()
+        
+        updated += len(rows)
+        last_id = rows[-1].id
+    
+    return updated
+
+
+def migrate_storage_layout(connection, batch_size=500, commit_each_batch=False, include_blobs=False):
+    """Chuyển các CV còn lưu trong cột content/template_json sang overlay hoặc bảng blob, theo từng lô.
+    
+    include_blobs: thử chuyển cả các CV đang lưu blob sang overlay (CV không chuyển được giữ nguyên).
+    """
+    table = CV.__table__
+    layouts = [LAYOUT_BLOB, LAYOUT_OVERLAY] if not include_blobs else [LAYOUT_OVERLAY]
+    last_id = 0
+    converted = 0
+    
+    while True:
+        rows = connection.execute(
+            db.select(table.c.id, table.c.template_id, table.c.content, table.c.template_json,
+                      table.c.template_blob_hash, table.c.form_json, table.c.storage_layout,
+                      table.c.schema_version)
+            .where(table.c.id > last_id)
+            .where(db.or_(table.c.storage_layout.is_(None), table.c.storage_layout.notin_(layouts)))
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        
+        params = []
+        refs = {}
+        for row in rows:
+            # Content được ghi lại theo schema hiện tại
+            if row.storage_layout == LAYOUT_BLOB:
+                template_json = load_blob(connection, row.template_blob_hash)
+                form_data = current_form_data(_loads(row.form_json), row.schema_version)
+            elif row.storage_layout == LAYOUT_SPLIT:
+                template_json = row.template_json
+                form_data = current_form_data(_loads(row.form_json), row.schema_version)
+            else:
+                content_dict = upgrade_content(_loads(row.content), row.schema_version)
+                template_json = _dumps(content_dict['template_data'] or None)
+                form_data = content_dict['form_data']
+            form_json = _dumps(form_data)
+            
+            template_data = _loads(template_json)
+            if isinstance(template_data, dict):
+                template_data = canonicalize(template_data)
+                template_json = _dumps(template_data)
+            overlay_raw = make_overlay(connection, row.template_id, template_data, template_json)
+            if overlay_raw:
+                layout, template_hash = LAYOUT_OVERLAY, None
+                digest = blob_summary(blob_hash(overlay_raw), len(overlay_raw.encode('utf-8')), form_json)
+            elif row.storage_layout == LAYOUT_BLOB:
+                continue
+            else:
+                layout = LAYOUT_BLOB
+                template_hash, template_size = store_blob(connection, template_json) if template_json else (None, 0)
+                digest = blob_summary(template_hash, template_size, form_json)
+            
+            if template_hash:
+                refs[template_hash] = refs.get(template_hash, 0) + 1
+            if row.template_blob_hash and row.storage_layout == LAYOUT_BLOB:
+                refs[row.template_blob_hash] = refs.get(row.template_blob_hash, 0) - 1
+            
+            content_dict = {'template_data': template_data or {}, 'form_data': form_data}
+            params.append({
+                '_id': row.id,
+                '_layout': layout,
+                'template_blob_hash': template_hash,
+                'template_overlay': overlay_raw,
+                'form_json': form_json,
+                **summarize_content(content_dict, None),
+                **digest
+            })
+        
+        if params:
+            connection.execute(
+                table.update()
+                .where(table.c.id == db.bindparam('_id'))
+                .values(
+                    content=None,
+                    template_json=None,
+                    storage_layout=db.bindparam('_layout'),
+                    template_blob_hash=db.bindparam('template_blob_hash'),
+                    template_overlay=db.bindparam('template_overlay'),
+                    form_json=db.bindparam('form_json'),
+                    schema_version=CONTENT_SCHEMA_VERSION,
+                    **{name: db.bindparam(name) for name in SUMMARY_COLUMNS}
+                ),
+                params
+            )
+            adjust_refcounts(connection, refs)
+        
+        if commit_each_batch:
+            connection.commit()
+        
+        converted += len(params)
+        last_id = rows[-1].id
+    
+    return converted
+
+
+def upgrade_content_schema(batch_size=200):
+    """Ghi lại content của các CV có schema_version cũ theo schema hiện tại, theo từng lô (commit sau mỗi lô).
+    
+    Chạy song song với app được: mỗi lô là một transaction ngắn, CV đang được sửa cũng tự nâng cấp khi ghi.
+    Trả về số CV đã nâng cấp.
+    """
+    upgraded = 0
+    last_id = 0
+    while True:
+        cvs = (
+            CV.query
+            .filter(CV.id > last_id)
+            .filter(db.or_(CV.schema_version.is_(None), CV.schema_version < CONTENT_SCHEMA_VERSION))
+            .order_by(CV.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not cvs:
+            break
+        
+        for cv in cvs:
+            if cv.upgrade_schema():
+                # Giữ nguyên updated_at: nâng cấp không phải là một lần người dùng sửa CV
+                flag_modified(cv, 'updated_at')
+                upgraded += 1
+        last_id = cvs[-1].id
+        
+        db.session.commit()
+        db.session.expunge_all()
+    
+    return upgraded
+
+
 class CV(db.Model):
     """Model CV"""
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False, default='CV mới')
-    content = db.Column(db.Text)  # JSON content của CV
+    content = db.deferred(db.Column(CompressedText()))  # JSON content cũ (chỉ còn ở CV chưa chuyển)
+    template_json = db.deferred(db.Column(CompressedText()))  # JSON template_data của CV chưa chuyển sang blob
+    template_blob_hash = db.column_property(
+        db.Column(db.String(64), db.ForeignKey('cv_blobs.hash'), index=True),
+        active_history=True
+    )  # template_data lưu trong bảng cv_blobs, nhiều CV có thể dùng chung
+    template_overlay = db.deferred(db.Column(CompressedText()))  # JSON overlay so với template gốc
+    form_json = db.deferred(db.Column(db.Text))  # JSON form_data
+    storage_layout = db.Column(db.Integer, default=LAYOUT_OVERLAY)
     template_id = db.Column(db.String(50), default='modern_complete')  # Add template_id field
+    template_version = db.Column(db.Integer)  # Version template lúc tạo CV (NULL: CV cũ, không rõ version)
+    schema_version = db.Column(db.Integer)  # Version cấu trúc content đang lưu (NULL: CV cũ, coi như 1)
     views = db.Column(db.Integer, default=0)
     downloads = db.Column(db.Integer, default=0)  # Track downloads
     is_canvas_editor = db.Column(db.Boolean, default=False)  # Track canvas editor usage
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Cột tóm tắt (denormalised) để trang danh sách không phải đọc content
+    full_name = db.Column(db.String(SUMMARY_TEXT_LENGTH), index=True)
+    position = db.Column(db.String(SUMMARY_TEXT_LENGTH), index=True)
+    content_hash = db.Column(db.String(64), index=True)
+    content_size = db.Column(db.Integer, default=0)
+    experience_count = db.Column(db.Integer, default=0)
+    education_count = db.Column(db.Integer, default=0)
+    skill_count = db.Column(db.Integer, default=0)
+    language_count = db.Column(db.Integer, default=0)
+    
     # Foreign key
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
+    # Mỗi cách sắp xếp danh sách CV của một user (WHERE user_id = ? ORDER BY cột, id) có index riêng
+    # để không quét bảng và không sắp xếp tạm; id đi kèm ngầm định (rowid/khoá chính)
+    __table_args__ = (
+        db.Index('ix_cv_user_updated', 'user_id', 'updated_at'),
+        db.Index('ix_cv_user_created', 'user_id', 'created_at'),
+        db.Index('ix_cv_user_title', 'user_id', 'title'),
+        db.Index('ix_cv_user_views', 'user_id', 'views'),
+        db.Index('ix_cv_user_downloads', 'user_id', 'downloads'),
+        db.Index('ix_cv_user_template', 'user_id', 'template_id'),
+    )
+    
     def set_content(self, content_dict):
-        """Lưu content dạng JSON"""
-        self.content = json.dumps(content_dict, ensure_ascii=False)
+        """Lưu content dạng JSON (template_data dạng overlay hoặc blob, form_data vào cột form_json).
+        
+        content_dict ở version cũ (bản lưu trong lịch sử phiên bản...) được nâng lên schema hiện tại.
+        """
+        content = upgrade_content(content_dict)
+        
+        self.content = None
+        self.template_json = None
+        self._store_template(content['template_data'])
+        self.form_json = _dumps(content['form_data'])
+        self.schema_version = CONTENT_SCHEMA_VERSION
+        self._refresh_summary(content['template_data'], content['form_data'])
     
     def get_content(self):
-        """Lấy content từ JSON"""
-        if self.content:
-            try:
-                return json.loads(self.content)
-            except json.JSONDecodeError:
-                return {}
-        return {}
+        """Lấy content dạng {'template_data', 'form_data'} theo schema hiện tại"""
+        if self._is_legacy():
+            return self._legacy_content()
+        return {'template_data': self.get_template_data(), 'form_data': self.get_form_data()}
+    
+    def get_template_data(self):
+        """Lấy template_data (không đọc form_data)"""
+        if self.storage_layout == LAYOUT_OVERLAY:
+            return materialize_overlay(db.session.connection(), self.template_overlay) or {}
+        if self.storage_layout == LAYOUT_BLOB:
+            return _loads(self._template_raw()) or {}
+        if self.storage_layout == LAYOUT_SPLIT:
+            return _loads(self.template_json) or {}
+        return self._legacy_content()['template_data']
+    
+    def get_form_data(self):
+        """Lấy form_data theo schema hiện tại (luôn đủ các field), chỉ đọc cột form_json"""
+        if self._is_legacy():
+            return self._legacy_content()['form_data']
+        form_data = _loads(self.form_json)
+        if self.schema_version == CONTENT_SCHEMA_VERSION:
+            return form_data
+        return current_form_data(form_data, self.schema_version)
+    
+    def set_template_data(self, template_data):
+        """Chỉ ghi template_data, không đụng tới form_data"""
+        self._ensure_current_schema()
+        self._store_template(template_data)
+        self._refresh_summary(template_data=template_data or {})
+    
+    def set_form_data(self, form_data):
+        """Chỉ ghi form_data, không đụng tới template_data"""
+        self._ensure_current_schema()
+        form_data = current_form_data(form_data)
+        self.form_json = _dumps(form_data)
+        self._refresh_summary(form_data=form_data)
+    
+    def upgrade_schema(self):
+        """Ghi lại content theo schema (và cách lưu) hiện tại, trả về False nếu CV đã ở version hiện tại"""
+        if self.schema_version == CONTENT_SCHEMA_VERSION:
+            return False
+        self._ensure_current_schema()
+        self._refresh_summary()
+        return True
+    
+    def _is_legacy(self):
+        """CV còn lưu toàn bộ trong cột content"""
+        return self.storage_layout not in (LAYOUT_SPLIT, LAYOUT_BLOB, LAYOUT_OVERLAY)
+    
+    def _legacy_content(self):
+        """Content của CV còn lưu trong cột content, đã nâng lên schema hiện tại"""
+        return upgrade_content(_loads(self.content), self.schema_version)
+    
+    def _ensure_current_schema(self):
+        """Chuyển CV sang cách lưu overlay/blob và form_data sang schema hiện tại (migration online khi ghi)"""
+        if self.schema_version == CONTENT_SCHEMA_VERSION and self.storage_layout in (LAYOUT_BLOB, LAYOUT_OVERLAY):
+            return
+        form_data = self.get_form_data()
+        if self.storage_layout == LAYOUT_SPLIT:
+            self._store_template(_loads(self.template_json))
+        elif self._is_legacy():
+            self._store_template(self._legacy_content()['template_data'])
+        self.content = None
+        self.template_json = None
+        self.form_json = _dumps(form_data)
+        self.schema_version = CONTENT_SCHEMA_VERSION
+    
+    def _store_template(self, template_data):
+        """Chuẩn hoá template_data (xem models.konva) rồi lưu dạng overlay nếu đủ nhỏ so với template gốc,
+        ngược lại lưu blob
+        """
+        if isinstance(template_data, dict):
+            template_data = canonicalize(template_data)
+        raw = _dumps(template_data) if template_data else None
+        connection = db.session.connection()
+        base_template = load_base_template(connection, self.template_id)
+        state = inspect(self)
+        overlay_raw = make_overlay(connection, self.template_id, template_data, raw, base_template)
+        if overlay_raw or not state.persistent or state.attrs.template_id.history.has_changes():
+            # Overlay vừa tính so với version hiện tại của template (hoặc CV mới/vừa đổi template):
+            # ghi lại version đó để cột luôn khớp với overlay đang lưu
+            self.template_version = base_template[0]
+        if overlay_raw:
+            self.storage_layout = LAYOUT_OVERLAY
+            self.template_overlay = overlay_raw
+            self._set_template_raw(None)
+        else:
+            self.storage_layout = LAYOUT_BLOB
+            self.template_overlay = None
+            self._set_template_raw(raw)
+    
+    def _set_template_raw(self, raw):
+        """Trỏ CV tới blob của template_data; blob được ghi vào DB khi flush"""
+        self.template_blob_hash = blob_hash(raw) if raw else None
+        self._pending_blob = (self.template_blob_hash, raw) if raw else None
+    
+    def _template_raw(self):
+        """JSON template_data của CV lưu dạng blob"""
+        pending = getattr(self, '_pending_blob', None)
+        if pending and pending[0] == self.template_blob_hash:
+            return pending[1]
+        return load_blob(db.session.connection(), self.template_blob_hash)
+    
+    def _template_digest(self):
+        """(hash, kích thước) phần template_data đang lưu (blob hoặc overlay), không đọc dữ liệu blob"""
+        if self.storage_layout == LAYOUT_OVERLAY:
+            if not self.template_overlay:
+                return None, 0
+            return blob_hash(self.template_overlay), len(self.template_overlay.encode('utf-8'))
+        pending = getattr(self, '_pending_blob', None)
+        if pending and pending[0] == self.template_blob_hash:
+            return self.template_blob_hash, len(pending[1].encode('utf-8'))
+        return self.template_blob_hash, blob_size(db.session.connection(), self.template_blob_hash)
+    
+    def copy_content_from(self, other):
+        """Sao chép content và các cột tóm tắt từ CV khác (chỉ sao chép con trỏ tới blob)"""
+        self.storage_layout = other.storage_layout
+        self.template_version = other.template_version
+        self.schema_version = other.schema_version
+        if other.storage_layout == LAYOUT_OVERLAY:
+            self.template_overlay = other.template_overlay
+            self.form_json = other.form_json
+        elif other.storage_layout == LAYOUT_BLOB:
+            self.template_blob_hash = other.template_blob_hash
+            self._pending_blob = getattr(other, '_pending_blob', None)
+            self.form_json = other.form_json
+        elif other.storage_layout == LAYOUT_SPLIT:
+            self.template_json = other.template_json
+            self.form_json = other.form_json
+        else:
+            self.content = other.content
+        self._apply_summary({name: getattr(other, name) for name in SUMMARY_COLUMNS})
+    
+    def _refresh_summary(self, template_data=None, form_data=None):
+        """Tính lại cột tóm tắt; phần nào không truyền vào thì đọc từ cột tương ứng"""
+        if form_data is None:
+            form_data = self.get_form_data()
+        if template_data is None and not (form_data.get('full_name') and form_data.get('position')):
+            template_data = self.get_template_data()
+        
+        content_dict = {'template_data': template_data or {}, 'form_data': form_data}
+        summary = summarize_content(content_dict, None)
+        summary.update(blob_summary(*self._template_digest(), self.form_json))
+        self._apply_summary(summary)
+    
+    def _apply_summary(self, summary):
+        """Gán các giá trị tóm tắt vào cột tương ứng"""
+        for name in SUMMARY_COLUMNS:
+            setattr(self, name, summary.get(name))
     
     def increment_views(self):
-        """Tăng số lượt xem"""
-        self.views += 1
-        db.session.commit()
+        """Tăng số lượt xem (ghi trễ theo lô, không commit)"""
+        counters.increment(CV, self.id, 'views')
+        record_event(EVENT_VIEW, cv=self)
     
-    def increment_downloads(self):
-        """Tăng số lượt tải xuống"""
-        self.downloads += 1
-        db.session.commit()
+    def increment_downloads(self, export_format=None):
+        """Tăng số lượt tải xuống (ghi trễ theo lô, không commit)"""
+        counters.increment(CV, self.id, 'downloads')
+        record_event(EVENT_DOWNLOAD, cv=self, detail=export_format)
+    
+    @property
+    def view_count(self):
+        """Số lượt xem hiển thị (gồm các lượt chưa ghi)"""
+        return counters.value(self, 'views')
+    
+    @property
+    def download_count(self):
+        """Số lượt tải xuống hiển thị (gồm các lượt chưa ghi)"""
+        return counters.value(self, 'downloads')
     
     def set_canvas_edited(self):
         """Đánh dấu CV đã được chỉnh sửa bằng canvas editor"""
@@ -54,12 +592,48 @@ class CV(db.Model):
             return f'Template {self.template_id.replace("_", " ").title()}'
         return 'Template mặc định'
         
-    def get_form_data(self):
-        """Lấy form_data từ content (nếu có)"""
-        content = self.get_content()
-        if content and isinstance(content, dict):
-            return content.get('form_data')
-        return None
-
+    @staticmethod
+    def listing_columns():
+        """Các cột cần cho trang danh sách (không gồm content)"""
+        return (
+            CV.id, CV.title, CV.template_id, CV.views, CV.downloads,
+            CV.is_canvas_editor, CV.created_at, CV.updated_at, CV.user_id,
+            CV.full_name, CV.position, CV.content_size
+        )
+    
     def __repr__(self):
-        return f'<CV {self.title}>'
\ No newline at end of file
+        return f'<CV {self.title}>'
+
+
+@event.listens_for(CV, 'before_insert')
+@event.listens_for(CV, 'before_update')
+def _store_pending_blob(mapper, connection, target):
+    """Ghi blob template_data mới (nếu chưa có) trước khi ghi hàng cv"""
+    pending = getattr(target, '_pending_blob', None)
+    if pending and pending[0] == target.template_blob_hash:
+        store_blob(connection, pending[1])
+    target._pending_blob = None
+
+
+@event.listens_for(CV, 'after_insert')
+def _ref_blob_on_insert(mapper, connection, target):
+    """CV mới tham chiếu tới blob"""
+    adjust_refcounts(connection, {target.template_blob_hash: 1})
+
+
+@event.listens_for(CV, 'after_update')
+def _ref_blob_on_update(mapper, connection, target):
+    """CV đổi blob: giảm refcount blob cũ, tăng blob mới"""
+    history = db.inspect(target).attrs.template_blob_hash.history
+    deltas = {}
+    for key in history.deleted:
+        deltas[key] = deltas.get(key, 0) - 1
+    for key in history.added:
+        deltas[key] = deltas.get(key, 0) + 1
+    adjust_refcounts(connection, deltas)
+
+
+@event.listens_for(CV, 'before_delete')
+def _unref_blob_on_delete(mapper, connection, target):
+    """CV bị xoá không còn tham chiếu tới blob (blob được dọn bởi lệnh gc-blobs)"""
+    adjust_refcounts(connection, {target.template_blob_hash: -1})
\ No newline at end of file
@@ -0,0 +1,147 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from db import db
+from models.types import CompressedText
+import hashlib
+
+# Số blob (dạng text JSON) giữ trong bộ nhớ mỗi process; blob là bất biến nên không cần invalidate
+BLOB_CACHE_SIZE = 128
+
+# Blob không còn tham chiếu chỉ bị xoá sau khoảng thời gian này
+GC_GRACE_PERIOD = timedelta(hours=1)
+
+_blob_cache = OrderedDict()
+
+
+class CVBlob(db.Model):
+    """Nội dung tài liệu CV lưu theo địa chỉ nội dung (hash -> JSON nén), có đếm tham chiếu"""
+    __tablename__ = 'cv_blobs'
+    
+    hash = db.Column(db.String(64), primary_key=True)  # sha256 của JSON
+    data = db.deferred(db.Column(CompressedText()))
+    size = db.Column(db.Integer, default=0)  # Kích thước JSON gốc (bytes)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CVBlob {self.hash[:12]} refs={self.refcount}>'
+
+
+def blob_hash(raw):
+    """Hash nội dung dùng làm khoá của blob"""
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def store_blob(connection, raw):
+    """Lưu JSON vào bảng blob nếu chưa có, trả về (hash, size). Không thay đổi refcount."""
+    key = blob_hash(raw)
+    table = CVBlob.__table__
+    values = {
+        'hash': key,
+        'data': raw,
+        'size': len(raw.encode('utf-8')),
+        'refcount': 0,
+        'created_at': datetime.utcnow()
+    }
+    
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        connection.execute(insert(table).values(**values).on_conflict_do_nothing(index_elements=['hash']))
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        connection.execute(insert(table).values(**values).on_conflict_do_nothing(index_elements=['hash']))
+    else:
+        exists = connection.execute(db.select(table.c.hash).where(table.c.hash == key)).first()
+        if not exists:
+            connection.execute(table.insert().values(**values))
+    
+    _remember(key, raw)
+    return key, values['size']
+
+
+def _remember(key, raw):
+    """Đưa blob vào cache LRU trong process"""
+    _blob_cache[key] = raw
+    _blob_cache.move_to_end(key)
+    if len(_blob_cache) > BLOB_CACHE_SIZE:
+        _blob_cache.popitem(last=False)
+
+
+def load_blob(connection, key):
+    """Đọc JSON của blob (có cache trong process)"""
+    if not key:
+        return None
+    
+    raw = _blob_cache.get(key)
+    if raw is not None:
+        _blob_cache.move_to_end(key)
+        return raw
+    
+    table = CVBlob.__table__
+    raw = connection.execute(db.select(table.c.data).where(table.c.hash == key)).scalar()
+    if raw is not None:
+        _remember(key, raw)
+    return raw
+
+
+def blob_size(connection, key):
+    """Kích thước JSON gốc của blob (không đọc dữ liệu)"""
+    if not key:
+        return 0
+    table = CVBlob.__table__
+    return connection.execute(db.select(table.c.size).where(table.c.hash == key)).scalar() or 0
+
+
+def adjust_refcounts(connection, deltas):
+    """Cộng/trừ refcount theo {hash: delta} bằng UPDATE nguyên tử"""
+    table = CVBlob.__table__
+    params = [{'_hash': key, '_delta': delta} for key, delta in deltas.items() if key and delta]
+    if params:
+        connection.execute(
+            table.update()
+            .where(table.c.hash == db.bindparam('_hash'))
+            .values(refcount=table.c.refcount + db.bindparam('_delta')),
+            params
+        )
+
+
+def reconcile_refcounts(connection, reference_columns):
+    """Tính lại refcount từ các cột đang tham chiếu tới blob (phòng khi bị lệch)"""
+    table = CVBlob.__table__
+    total = None
+    for column in reference_columns:
+        count = (
+            db.select(db.func.count())
+            .select_from(column.table)
+            .where(column == table.c.hash)
+            .scalar_subquery()
+        )
+        total = count if total is None else total + count
+    connection.execute(table.update().values(refcount=total))
+
+
+def collect_garbage(connection, grace_period=GC_GRACE_PERIOD, batch_size=500):
+    """Xoá các blob không còn được tham chiếu theo từng lô, trả về số blob đã xoá"""
+    table = CVBlob.__table__
+    cutoff = datetime.utcnow() - grace_period
+    deleted = 0
+    
+    while True:
+        keys = connection.execute(
+            db.select(table.c.hash)
+            .where(table.c.refcount <= 0, table.c.created_at < cutoff)
+            .limit(batch_size)
+        ).scalars().all()
+        if not keys:
+            break
+        
+        connection.execute(table.delete().where(table.c.hash.in_(keys), table.c.refcount <= 0))
+        for key in keys:
+            _blob_cache.pop(key, None)
+        deleted += len(keys)
+        
+        if len(keys) < batch_size:
+            break
+    
+    return deleted
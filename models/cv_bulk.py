@@ -0,0 +1,129 @@
+from datetime import datetime
+from db import db
+from models.cv import CV
+from models.cv_blob import adjust_refcounts
+from models.cv_revision import CVRevision
+from models.cv_search import copy_index_entries, remove_many_from_index
+
+# Số CV xử lý trong một câu lệnh (giới hạn số tham số của IN (...))
+BULK_CHUNK_SIZE = 500
+
+# Tiêu đề của CV bản sao
+DUPLICATE_TITLE_PREFIX = 'Bản sao - '
+
+# Các cột được chép nguyên từ CV gốc sang bản sao (content chỉ chép con trỏ blob/overlay)
+DUPLICATED_COLUMNS = (
+    'content', 'template_json', 'template_blob_hash', 'template_overlay', 'form_json',
+    'storage_layout', 'template_id', 'template_version', 'schema_version', 'is_canvas_editor',
+    'user_id', 'full_name', 'position', 'content_hash', 'content_size',
+    'experience_count', 'education_count', 'skill_count', 'language_count'
+)
+
+
+def parse_cv_ids(values):
+    """Các id hợp lệ (số nguyên, không trùng, giữ thứ tự) từ danh sách client gửi lên"""
+    ids = []
+    for value in values if isinstance(values, list) else []:
+        try:
+            cv_id = int(value)
+        except (TypeError, ValueError):
+            continue
+        if cv_id not in ids:
+            ids.append(cv_id)
+    return ids
+
+
+def _chunks(ids, size):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _owned(connection, user_id, cv_ids):
+    """(id, template_blob_hash) các CV trong cv_ids thuộc về user (chỉ đọc cột nhỏ, khoá các hàng nếu database hỗ trợ)"""
+    table = CV.__table__
+    return connection.execute(
+        db.select(table.c.id, table.c.template_blob_hash)
+        .where(table.c.id.in_(cv_ids), table.c.user_id == user_id)
+        .order_by(table.c.id)
+        .with_for_update()
+    ).all()
+
+
+def _blob_deltas(rows, sign):
+    deltas = {}
+    for row in rows:
+        if row.template_blob_hash:
+            deltas[row.template_blob_hash] = deltas.get(row.template_blob_hash, 0) + sign
+    return deltas
+
+
+def bulk_delete_cvs(connection, user_id, cv_ids, chunk_size=BULK_CHUNK_SIZE):
+    """Xoá các CV của user theo lô bằng DELETE ... WHERE id IN (...) AND user_id = ?, không nạp CV vào ORM.
+    
+    Xoá kèm lịch sử phiên bản, mục index tìm kiếm và giảm refcount blob. Trả về {id: True/False (đã xoá/không tìm thấy)}.
+    """
+    table = CV.__table__
+    revisions = CVRevision.__table__
+    results = dict.fromkeys(cv_ids, False)
+    
+    for chunk in _chunks(cv_ids, chunk_size):
+        rows = _owned(connection, user_id, chunk)
+        if not rows:
+            continue
+        ids = [row.id for row in rows]
+        
+        connection.execute(revisions.delete().where(revisions.c.cv_id.in_(ids)))
+        remove_many_from_index(connection, ids)
+        deleted = connection.execute(
+            table.delete().where(table.c.id.in_(ids), table.c.user_id == user_id)
+        ).rowcount
+        adjust_refcounts(connection, _blob_deltas(rows, -1))
+        
+        if deleted == len(ids):
+            results.update(dict.fromkeys(ids, True))
+        else:
+            # Có CV bị xoá đồng thời ở request khác: kiểm tra lại từng id còn hay không
+            remaining = set(connection.execute(db.select(table.c.id).where(table.c.id.in_(ids))).scalars())
+            results.update({cv_id: cv_id not in remaining for cv_id in ids})
+    
+    return results
+
+
+def bulk_duplicate_cvs(connection, user_id, cv_ids, chunk_size=BULK_CHUNK_SIZE):
+    """Sao chép các CV của user theo lô bằng INSERT ... SELECT (content không đi qua Python).
+    
+    Bản sao dùng chung blob với CV gốc (tăng refcount), mục index được chép từ CV gốc.
+    Trả về {id CV gốc: id bản sao hoặc None nếu không tìm thấy}.
+    """
+    table = CV.__table__
+    results = dict.fromkeys(cv_ids, None)
+    
+    for chunk in _chunks(cv_ids, chunk_size):
+        rows = _owned(connection, user_id, chunk)
+        if not rows:
+            continue
+        ids = [row.id for row in rows]
+        now = datetime.utcnow()
+        
+        columns = [table.c[name] for name in DUPLICATED_COLUMNS]
+        source = (
+            db.select(
+                db.literal(DUPLICATE_TITLE_PREFIX) + table.c.title,
+                db.literal(0), db.literal(0), db.literal(now), db.literal(now),
+                *columns
+            )
+            .where(table.c.id.in_(ids), table.c.user_id == user_id)
+            .order_by(table.c.id)
+        )
+        target_columns = ['title', 'views', 'downloads', 'created_at', 'updated_at', *DUPLICATED_COLUMNS]
+        new_ids = connection.execute(
+            table.insert().from_select(target_columns, source).returning(table.c.id)
+        ).scalars().all()
+        
+        # Id mới được cấp theo thứ tự chèn (ORDER BY id của câu SELECT)
+        pairs = list(zip(ids, sorted(new_ids)))
+        adjust_refcounts(connection, _blob_deltas(rows, 1))
+        copy_index_entries(connection, pairs, DUPLICATE_TITLE_PREFIX)
+        results.update(dict(pairs))
+    
+    return results
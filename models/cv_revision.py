@@ -0,0 +1,236 @@
+from datetime import datetime
+from difflib import SequenceMatcher
+from db import db
+from models.cv import CV
+from models.types import CompressedText
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+import json
+
+# Cứ mỗi KEYFRAME_INTERVAL phiên bản thì lưu một bản đầy đủ, còn lại lưu delta so với phiên bản trước
+KEYFRAME_INTERVAL = 10
+
+# Số phiên bản tối thiểu giữ lại cho mỗi CV (phiên bản cũ hơn bị xoá theo từng chuỗi keyframe)
+REVISION_RETENTION = 50
+
+# Số lần thử lại khi lần lưu khác của cùng CV vừa lấy số phiên bản kế tiếp
+RECORD_ATTEMPTS = 5
+
+
+class CVRevision(db.Model):
+    """Lịch sử phiên bản content của CV (keyframe đầy đủ + delta nén)"""
+    __tablename__ = 'cv_revisions'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    cv_id = db.Column(db.Integer, db.ForeignKey('cv.id'), nullable=False, index=True)
+    number = db.Column(db.Integer, nullable=False)  # Số thứ tự phiên bản trong CV
+    keyframe_number = db.Column(db.Integer, nullable=False)  # Keyframe mà chuỗi delta bắt đầu
+    is_keyframe = db.Column(db.Boolean, default=False)
+    data = db.deferred(db.Column(CompressedText(threshold=0)))  # JSON đầy đủ hoặc delta
+    size = db.Column(db.Integer, default=0)  # Kích thước JSON đầy đủ (bytes)
+    # Chỉ có ở keyframe: phiên bản mới nhất của chuỗi và JSON đầy đủ của nó (NULL: chính là data),
+    # để lần lưu sau tính delta mà không phải dựng lại chuỗi
+    head_number = db.Column(db.Integer)
+    head_data = db.deferred(db.Column(CompressedText(threshold=0)))
+    source = db.Column(db.String(20))  # form, canvas, restore...
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    cv = db.relationship('CV', backref=db.backref('revisions', lazy='dynamic', passive_deletes='all'))
+    
+    __table_args__ = (
+        db.UniqueConstraint('cv_id', 'number', name='uq_cv_revision_number'),
+    )
+    
+    def to_dict(self):
+        """Thông tin phiên bản (không gồm dữ liệu)"""
+        return {
+            'number': self.number,
+            'source': self.source,
+            'size': self.size,
+            'is_keyframe': self.is_keyframe,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    def __repr__(self):
+        return f'<CVRevision {self.cv_id}#{self.number}>'
+
+
+def _snapshot_text(content):
+    """JSON của content, mỗi giá trị một dòng để delta theo dòng nhỏ gọn"""
+    return json.dumps(content, ensure_ascii=False, indent=0)
+
+
+def make_delta(old_text, new_text):
+    """Delta theo dòng: [start, end] là đoạn giữ nguyên của bản cũ, chuỗi là các dòng mới"""
+    old_lines = old_text.split('\n')
+    new_lines = new_text.split('\n')
+    ops = []
+    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append('\n'.join(new_lines[j1:j2]))
+    return json.dumps(ops, ensure_ascii=False, separators=(',', ':'))
+
+
+def apply_delta(old_text, delta):
+    """Dựng lại bản mới từ bản cũ và delta"""
+    old_lines = old_text.split('\n')
+    lines = []
+    for op in json.loads(delta):
+        if isinstance(op, list):
+            lines.extend(old_lines[op[0]:op[1]])
+        else:
+            lines.extend(op.split('\n'))
+    return '\n'.join(lines)
+
+
+def _revision_text(cv_id, revision):
+    """Dựng lại JSON của một phiên bản: keyframe + tối đa KEYFRAME_INTERVAL - 1 delta"""
+    chain = (
+        CVRevision.query
+        .options(db.undefer(CVRevision.data))
+        .filter(CVRevision.cv_id == cv_id,
+                CVRevision.number >= revision.keyframe_number,
+                CVRevision.number <= revision.number)
+        .order_by(CVRevision.number)
+        .all()
+    )
+    text = None
+    for item in chain:
+        text = item.data if item.is_keyframe else apply_delta(text or '', item.data)
+    return text
+
+
+def get_revision_content(cv_id, number):
+    """Content của CV tại phiên bản number, None nếu không có"""
+    revision = CVRevision.query.filter_by(cv_id=cv_id, number=number).first()
+    if not revision:
+        return None
+    return json.loads(_revision_text(cv_id, revision))
+
+
+def _latest_text(cv_id, previous):
+    """JSON đầy đủ của phiên bản mới nhất: lấy từ bản cache trên keyframe, chỉ dựng lại chuỗi khi chưa có"""
+    if previous.is_keyframe:
+        keyframe = previous
+    else:
+        keyframe = (
+            CVRevision.query
+            .options(db.undefer(CVRevision.head_data))
+            .filter_by(cv_id=cv_id, number=previous.keyframe_number)
+            .first()
+        )
+    if keyframe is not None and keyframe.head_number == previous.number:
+        return keyframe, keyframe.head_data if keyframe.head_data is not None else keyframe.data
+    if previous.is_keyframe and keyframe.head_number is None:
+        return keyframe, keyframe.data
+    return keyframe, _revision_text(cv_id, previous)
+
+
+def _latest_revision(cv_id):
+    """Phiên bản mới nhất của CV, None nếu chưa có"""
+    if cv_id is None:
+        return None
+    return CVRevision.query.filter_by(cv_id=cv_id).order_by(CVRevision.number.desc()).first()
+
+
+def _append_revision(cv, text, source):
+    """Thêm phiên bản sau phiên bản mới nhất hiện có; None nếu content không đổi"""
+    previous = _latest_revision(cv.id)
+    keyframe = None
+    if previous is None:
+        number, keyframe_number, data = 1, 1, text
+    else:
+        keyframe, previous_text = _latest_text(cv.id, previous)
+        if previous_text == text:
+            return None
+        number = previous.number + 1
+        if number - previous.keyframe_number >= KEYFRAME_INTERVAL:
+            keyframe_number, data = number, text
+            _prune_revisions(cv.id, number)
+        else:
+            keyframe_number, data = previous.keyframe_number, make_delta(previous_text, text)
+    
+    revision = CVRevision(
+        cv=cv,
+        number=number,
+        keyframe_number=keyframe_number,
+        is_keyframe=keyframe_number == number,
+        head_number=number if keyframe_number == number else None,
+        data=data,
+        size=len(text.encode('utf-8')),
+        source=source
+    )
+    db.session.add(revision)
+    if not revision.is_keyframe and keyframe is not None:
+        keyframe.head_number = number
+        keyframe.head_data = text
+    db.session.flush()
+    return revision
+
+
+def record_revision(cv, source=None):
+    """Thêm phiên bản mới từ content hiện tại của CV (bỏ qua nếu content không đổi).
+    
+    Gọi sau khi đã gán content và trước khi commit. Phiên bản được ghi trong savepoint: nếu lần lưu
+    khác của cùng CV vừa dùng số phiên bản đó (uq_cv_revision_number) thì đọc lại và thử lại.
+    """
+    text = _snapshot_text(cv.get_content())
+    db.session.flush()  # Ghi CV trước savepoint: thử lại chỉ huỷ phần phiên bản
+    
+    for attempt in range(RECORD_ATTEMPTS):
+        try:
+            with db.session.begin_nested():
+                return _append_revision(cv, text, source)
+        except IntegrityError:
+            if attempt == RECORD_ATTEMPTS - 1:
+                raise
+            # Đọc lại phiên bản mới nhất (và cache trên keyframe) do lần lưu kia đã ghi
+            db.session.expire_all()
+
+
+def _prune_revisions(cv_id, latest_number, retention=REVISION_RETENTION):
+    """Xoá các chuỗi phiên bản cũ, luôn giữ ít nhất retention phiên bản và bắt đầu từ một keyframe"""
+    cutoff = (
+        db.session.query(db.func.max(CVRevision.number))
+        .filter(CVRevision.cv_id == cv_id,
+                CVRevision.is_keyframe.is_(True),
+                CVRevision.number <= latest_number - retention + 1)
+        .scalar()
+    )
+    if cutoff:
+        CVRevision.query.filter(
+            CVRevision.cv_id == cv_id, CVRevision.number < cutoff
+        ).delete(synchronize_session=False)
+
+
+def prune_all_revisions(connection, retention=REVISION_RETENTION):
+    """Áp dụng chính sách lưu giữ cho mọi CV, trả về số phiên bản đã xoá"""
+    table = CVRevision.__table__
+    latest = (
+        db.select(table.c.cv_id, db.func.max(table.c.number).label('latest'))
+        .group_by(table.c.cv_id)
+        .subquery()
+    )
+    keyframes = (
+        db.select(table.c.cv_id, db.func.max(table.c.number).label('cutoff'))
+        .join(latest, latest.c.cv_id == table.c.cv_id)
+        .where(table.c.is_keyframe.is_(True), table.c.number <= latest.c.latest - retention + 1)
+        .group_by(table.c.cv_id)
+    )
+    deleted = 0
+    for row in connection.execute(keyframes).all():
+        result = connection.execute(
+            table.delete().where(table.c.cv_id == row.cv_id, table.c.number < row.cutoff)
+        )
+        deleted += result.rowcount
+    return deleted
+
+
+@event.listens_for(CV, 'before_delete')
+def _delete_revisions(mapper, connection, target):
+    """Xoá lịch sử phiên bản cùng với CV"""
+    table = CVRevision.__table__
+    connection.execute(table.delete().where(table.c.cv_id == target.id))
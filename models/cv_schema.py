@@ -0,0 +1,132 @@
+# Version của cấu trúc content ({'template_data', 'form_data'}) mà mọi lần ghi đều dùng.
+# Hàng cv ghi schema_version của content đang lưu; content cũ được nâng lên version này khi đọc
+# và được lưu lại theo version này ở lần ghi kế tiếp ('flask cv upgrade-content' nâng các CV còn lại).
+CONTENT_SCHEMA_VERSION = 3
+
+# Các field của form_data ở version hiện tại (luôn có đủ)
+TEXT_FIELDS = ('full_name', 'position', 'email', 'phone', 'address', 'website', 'summary')
+ENTRY_FIELDS = {
+    'experience': ('company', 'position', 'start_date', 'end_date', 'description'),
+    'education': ('school', 'degree', 'start_date', 'end_date', 'description'),
+}
+ITEM_FIELDS = ('technical_skills', 'soft_skills', 'languages')
+
+# Form cũ lưu kinh nghiệm/học vấn thành các mảng song song (experience_company, experience_start...)
+_PARALLEL_KEYS = {'start_date': 'start', 'end_date': 'end'}
+# Mảng level song song của kỹ năng/ngôn ngữ trong form cũ
+_LEVEL_KEYS = {'technical_skills': 'technical_level', 'soft_skills': 'soft_level', 'languages': 'language_level'}
+
+_upgrades = {}  # version -> hàm nâng content từ version đó lên version + 1
+
+
+def upgrade(from_version):
+    """Đăng ký hàm nâng content từ from_version lên from_version + 1.
+    
+    Hàm nâng cấp phải giữ nguyên content đã ở version đích: content không rõ version
+    (bản lưu trong lịch sử phiên bản, dữ liệu từ request...) được nâng từ version 1.
+    """
+    def register(func):
+        _upgrades[from_version] = func
+        return func
+    return register
+
+
+def upgrade_content(content, version=None):
+    """Content ở version (None: không rõ, coi như 1) -> content ở CONTENT_SCHEMA_VERSION"""
+    version = version or 1
+    while version < CONTENT_SCHEMA_VERSION:
+        content = _upgrades[version](content)
+        version += 1
+    return content
+
+
+def current_form_data(form_data, version=None):
+    """form_data ở version bất kỳ -> form_data ở CONTENT_SCHEMA_VERSION"""
+    return upgrade_content({'form_data': form_data}, version)['form_data']
+
+
+def has_form_data(form_data):
+    """form_data (version hiện tại) có nội dung do người dùng nhập hay không (CV canvas: không có)"""
+    return any(form_data[name] for name in (*TEXT_FIELDS, *ENTRY_FIELDS, *ITEM_FIELDS))
+
+
+@upgrade(1)
+def _split_envelope(content):
+    """Version 1: cột content có thể chỉ có template_data, có cả form_data, hoặc là form phẳng
+    (full_name, experience... ở cấp trên cùng). Version 2: luôn là {'template_data', 'form_data'}.
+    """
+    content = content if isinstance(content, dict) else {}
+    if 'template_data' in content or 'form_data' in content:
+        template_data, form_data = content.get('template_data'), content.get('form_data')
+    else:
+        template_data, form_data = None, content
+    return {
+        'template_data': template_data if isinstance(template_data, dict) else {},
+        'form_data': form_data if isinstance(form_data, dict) else {},
+    }
+
+
+def _text(value):
+    if value is None:
+        return ''
+    return value if isinstance(value, str) else str(value)
+
+
+def _parallel_entries(form_data, section, fields):
+    """Các mục kinh nghiệm/học vấn từ mảng song song của form cũ (bỏ mục không có field đầu tiên)"""
+    columns = {}
+    for field in fields:
+        values = form_data.get(f'{section}_{_PARALLEL_KEYS.get(field, field)}')
+        columns[field] = values if isinstance(values, list) else []
+    first = columns[fields[0]]
+    return [
+        {field: values[index] if index < len(values) else '' for field, values in columns.items()}
+        for index in range(len(first)) if first[index]
+    ]
+
+
+def _items(value, levels):
+    """Kỹ năng/ngôn ngữ -> [{'name', 'level'}] (từ danh sách chuỗi, chuỗi phân cách dấu phẩy,
+    dict {'names', 'levels'} hoặc danh sách dict)
+    """
+    if isinstance(value, dict):
+        levels = value.get('levels') or []
+        value = value.get('names') or []
+    elif isinstance(value, str):
+        value = [part.strip() for part in value.split(',')]
+    items = []
+    for index, item in enumerate(value if isinstance(value, list) else []):
+        if isinstance(item, dict):
+            name, level = item.get('name'), item.get('level')
+        else:
+            name, level = item, levels[index] if index < len(levels) else ''
+        if _text(name).strip():
+            items.append({'name': _text(name), 'level': _text(level)})
+    return items
+
+
+@upgrade(2)
+def _normalize_form(content):
+    """Version 3: form_data có đủ mọi field; kinh nghiệm/học vấn là danh sách dict đủ field,
+    kỹ năng/ngôn ngữ là danh sách {'name', 'level'}. Mảng song song của form cũ được gộp lại.
+    """
+    form_data = dict(content['form_data'])
+    for name in TEXT_FIELDS:
+        form_data[name] = _text(form_data.get(name))
+    
+    for section, fields in ENTRY_FIELDS.items():
+        entries = form_data.get(section)
+        if not isinstance(entries, list):
+            entries = _parallel_entries(form_data, section, fields)
+        form_data[section] = [
+            {**entry, **{field: _text(entry.get(field)) for field in fields}}
+            for entry in entries if isinstance(entry, dict)
+        ]
+        for field in fields:
+            form_data.pop(f'{section}_{_PARALLEL_KEYS.get(field, field)}', None)
+    
+    for name in ITEM_FIELDS:
+        levels = form_data.pop(_LEVEL_KEYS[name], None)
+        form_data[name] = _items(form_data.get(name), levels if isinstance(levels, list) else [])
+    
+    return {**content, 'form_data': form_data}
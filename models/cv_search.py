@@ -0,0 +1,322 @@
+from db import db
+from models.app_state import get_state, set_state
+from models.cv import CV
+from models.cv_schema import ITEM_FIELDS
+from sqlalchemy import bindparam, event, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import Session
+import re
+import unicodedata
+
+# Số kết quả tối đa (đã xếp hạng) một lần tìm kiếm trả về
+SEARCH_RESULT_LIMIT = 100
+
+# Số từ khoá tối đa lấy từ chuỗi tìm kiếm
+SEARCH_MAX_TERMS = 10
+
+# Trọng số BM25 theo cột của index SQLite: owner, title, headline, body
+FTS_COLUMN_WEIGHTS = (0.0, 10.0, 5.0, 1.0)
+
+# Các cột CV mà khi đổi thì text tìm kiếm có thể đổi theo
+INDEXED_ATTRIBUTES = (
+    'title', 'user_id', 'content', 'template_json', 'form_json',
+    'template_blob_hash', 'template_overlay'
+)
+
+FTS_TABLE = 'cv_search_fts'
+PG_TABLE = 'cv_search'
+
+# Cờ trong app_state: index đã chứa mọi CV ('flask cv reindex-search' đã chạy xong, hoặc index được tạo
+# khi chưa có CV). Trước đó tìm kiếm vẫn dùng ilike, index chỉ được cập nhật khi CV được ghi.
+INDEX_BUILT_KEY = 'cv_search.index_built'
+
+_WORD_RE = re.compile(r'\w+')
+
+# Backend của index theo engine: 'fts5', 'tsvector' hoặc None (chưa có index, dùng ilike)
+_backends = {}
+# Các engine mà index đã được dựng đầy đủ (cờ INDEX_BUILT_KEY không bị xoá khi đang chạy)
+_built = set()
+
+
+def fold_text(value):
+    """Chuẩn hoá text để so khớp không dấu: chữ thường, bỏ dấu tiếng Việt (kể cả đ -> d)"""
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFD', str(value).lower())
+    value = ''.join(char for char in value if unicodedata.category(char) != 'Mn')
+    return value.replace('đ', 'd')
+
+
+def search_terms(query):
+    """Các từ khoá (đã chuẩn hoá) của chuỗi tìm kiếm"""
+    return _WORD_RE.findall(fold_text(query))[:SEARCH_MAX_TERMS]
+
+
+def _template_texts(template_data):
+    """Các đoạn text hiển thị trong cây Konva (bỏ placeholder {{...}})"""
+    texts = []
+    stack = [template_data] if isinstance(template_data, dict) else []
+    while stack:
+        node = stack.pop()
+        value = (node.get('attrs') or {}).get('text')
+        if isinstance(value, str) and value.strip() and '{{' not in value:
+            texts.append(value)
+        children = node.get('children') or []
+        stack.extend(child for child in reversed(children) if isinstance(child, dict))
+    return texts
+
+
+def extract_search_document(cv):
+    """Text cần index của CV: {'title', 'headline' (tên, vị trí), 'body' (tóm tắt, kinh nghiệm, học vấn, kỹ năng)}"""
+    form_data = cv.get_form_data()  # Theo schema hiện tại: luôn đủ các field
+    
+    body = [form_data['summary']]
+    for exp in form_data['experience']:
+        body.extend([exp['company'], exp['position'], exp['description']])
+    for edu in form_data['education']:
+        body.extend([edu['school'], edu['degree'], edu['description']])
+    for field in ITEM_FIELDS:
+        body.extend(item['name'] for item in form_data[field])
+    
+    # CV soạn bằng canvas: text nằm trong template_data
+    body.extend(_template_texts(cv.get_template_data()))
+    
+    headline = [cv.full_name or form_data['full_name'], cv.position or form_data['position']]
+    
+    def join(parts):
+        seen = []
+        for part in parts:
+            if isinstance(part, str) and part.strip() and part not in seen:
+                seen.append(part)
+        return fold_text(' '.join(seen))
+    
+    return {'title': fold_text(cv.title), 'headline': join(headline), 'body': join(body)}
+
+
+def create_search_index(connection):
+    """Tạo index full-text (FTS5 trên SQLite, tsvector + GIN trên PostgreSQL) nếu chưa có"""
+    dialect = connection.dialect.name
+    statements = []
+    if dialect == 'sqlite':
+        statements.append(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            f"USING fts5(owner, title, headline, body, tokenize='unicode61 remove_diacritics 2')"
+        )
+    elif dialect == 'postgresql':
+        statements.extend([
+            f'CREATE TABLE IF NOT EXISTS {PG_TABLE} ('
+            f'cv_id INTEGER PRIMARY KEY REFERENCES cv (id) ON DELETE CASCADE, '
+            f'user_id INTEGER NOT NULL, document TSVECTOR NOT NULL)',
+            f'CREATE INDEX IF NOT EXISTS ix_{PG_TABLE}_document ON {PG_TABLE} USING GIN (document)',
+            f'CREATE INDEX IF NOT EXISTS ix_{PG_TABLE}_user_id ON {PG_TABLE} (user_id)',
+        ])
+    
+    _backends.pop(str(connection.engine.url), None)
+    _built.discard(str(connection.engine.url))
+    for statement in statements:
+        try:
+            with connection.begin_nested():
+                connection.execute(text(statement))
+        except (OperationalError, ProgrammingError):
+            # SQLite build không có FTS5: tìm kiếm quay về ilike
+            return False
+    return bool(statements)
+
+
+def search_backend(connection):
+    """Loại index full-text đang dùng được trên database này (None nếu không có)"""
+    key = str(connection.engine.url)
+    if key not in _backends:
+        tables = set(db.inspect(connection).get_table_names())
+        dialect = connection.dialect.name
+        if dialect == 'sqlite' and FTS_TABLE in tables:
+            _backends[key] = 'fts5'
+        elif dialect == 'postgresql' and PG_TABLE in tables:
+            _backends[key] = 'tsvector'
+        else:
+            _backends[key] = None
+    return _backends[key]
+
+
+def index_built(connection):
+    """Index đã chứa mọi CV hay chưa (chưa: tìm kiếm dùng ilike)"""
+    key = str(connection.engine.url)
+    if key not in _built:
+        if search_backend(connection) is None or get_state(connection, INDEX_BUILT_KEY) is None:
+            return False
+        _built.add(key)
+    return True
+
+
+def index_cv(connection, cv):
+    """Ghi (hoặc ghi đè) text tìm kiếm của một CV vào index"""
+    backend = search_backend(connection)
+    if backend is None:
+        return
+    
+    document = extract_search_document(cv)
+    params = dict(document, cv_id=cv.id, user_id=cv.user_id)
+    if backend == 'fts5':
+        connection.execute(text(f'DELETE FROM {FTS_TABLE} WHERE rowid = :cv_id'), params)
+        connection.execute(
+            text(f'INSERT INTO {FTS_TABLE} (rowid, owner, title, headline, body) '
+                 f'VALUES (:cv_id, :owner, :title, :headline, :body)'),
+            dict(params, owner=f'u{cv.user_id}')
+        )
+    else:
+        connection.execute(
+            text(f"INSERT INTO {PG_TABLE} (cv_id, user_id, document) VALUES (:cv_id, :user_id, "
+                 f"setweight(to_tsvector('simple', :title), 'A') || "
+                 f"setweight(to_tsvector('simple', :headline), 'B') || "
+                 f"setweight(to_tsvector('simple', :body), 'D')) "
+                 f"ON CONFLICT (cv_id) DO UPDATE SET user_id = excluded.user_id, document = excluded.document"),
+            params
+        )
+
+
+def remove_from_index(connection, cv_id):
+    """Xoá CV khỏi index"""
+    backend = search_backend(connection)
+    if backend == 'fts5':
+        connection.execute(text(f'DELETE FROM {FTS_TABLE} WHERE rowid = :cv_id'), {'cv_id': cv_id})
+    elif backend == 'tsvector':
+        connection.execute(text(f'DELETE FROM {PG_TABLE} WHERE cv_id = :cv_id'), {'cv_id': cv_id})
+
+
+def remove_many_from_index(connection, cv_ids):
+    """Xoá nhiều CV khỏi index trong một câu lệnh"""
+    backend = search_backend(connection)
+    if backend is None or not cv_ids:
+        return
+    
+    column, table = ('rowid', FTS_TABLE) if backend == 'fts5' else ('cv_id', PG_TABLE)
+    statement = text(f'DELETE FROM {table} WHERE {column} IN :cv_ids').bindparams(bindparam('cv_ids', expanding=True))
+    connection.execute(statement, {'cv_ids': list(cv_ids)})
+
+
+def copy_index_entries(connection, pairs, title_prefix=''):
+    """Index các CV bản sao bằng cách chép mục index của CV gốc (không đọc lại content).
+    
+    pairs: [(id CV gốc, id bản sao)]; title_prefix: phần thêm vào đầu tiêu đề của bản sao.
+    """
+    backend = search_backend(connection)
+    if backend is None or not pairs:
+        return
+    
+    params = [{'source_id': source_id, 'cv_id': cv_id, 'prefix': fold_text(title_prefix)} for source_id, cv_id in pairs]
+    if backend == 'fts5':
+        connection.execute(
+            text(f'INSERT INTO {FTS_TABLE} (rowid, owner, title, headline, body) '
+                 f'SELECT :cv_id, owner, :prefix || title, headline, body FROM {FTS_TABLE} WHERE rowid = :source_id'),
+            params
+        )
+    else:
+        connection.execute(
+            text(f"INSERT INTO {PG_TABLE} (cv_id, user_id, document) "
+                 f"SELECT :cv_id, user_id, document || setweight(to_tsvector('simple', :prefix), 'A') "
+                 f"FROM {PG_TABLE} WHERE cv_id = :source_id ON CONFLICT (cv_id) DO NOTHING"),
+            params
+        )
+
+
+def search_cv_ids(connection, user_id, query, limit=SEARCH_RESULT_LIMIT):
+    """Id các CV của user khớp mọi từ khoá (khớp tiền tố, không dấu), xếp theo độ liên quan.
+    
+    Trả về None nếu database chưa có index hoặc index chưa được dựng đầy đủ (người gọi tự tìm bằng ilike).
+    """
+    if not index_built(connection):
+        return None
+    backend = search_backend(connection)
+    
+    terms = search_terms(query)
+    if not terms:
+        return []
+    
+    if backend == 'fts5':
+        # Lọc theo owner ngay trong FTS nên chi phí chỉ phụ thuộc số CV khớp của user
+        terms_match = ' '.join(f'"{term}"*' for term in terms)
+        match = f'owner : u{int(user_id)} AND {{title headline body}} : ({terms_match})'
+        weights = ', '.join(str(weight) for weight in FTS_COLUMN_WEIGHTS)
+        statement = text(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match '
+            f'ORDER BY bm25({FTS_TABLE}, {weights}), rowid DESC LIMIT :limit'
+        )
+        params = {'match': match, 'limit': limit}
+    else:
+        statement = text(
+            f"SELECT cv_id FROM {PG_TABLE}, to_tsquery('simple', :match) AS tsq "
+            f"WHERE user_id = :user_id AND document @@ tsq "
+            f"ORDER BY ts_rank_cd(document, tsq) DESC, cv_id DESC LIMIT :limit"
+        )
+        params = {'match': ' & '.join(f'{term}:*' for term in terms), 'user_id': user_id, 'limit': limit}
+    
+    return [row[0] for row in connection.execute(statement, params)]
+
+
+def rebuild_search_index(batch_size=200):
+    """Index lại toàn bộ CV theo từng lô (commit sau mỗi lô), trả về số CV đã index"""
+    if search_backend(db.session.connection()) is None:
+        return 0
+    
+    indexed = 0
+    last_id = 0
+    while True:
+        cvs = CV.query.filter(CV.id > last_id).order_by(CV.id).limit(batch_size).all()
+        if not cvs:
+            break
+        
+        connection = db.session.connection()
+        for cv in cvs:
+            index_cv(connection, cv)
+        indexed += len(cvs)
+        last_id = cvs[-1].id
+        
+        db.session.commit()
+        db.session.expunge_all()
+    
+    # Xoá các mục của CV không còn tồn tại
+    if search_backend(db.session.connection()) == 'fts5':
+        db.session.execute(text(f'DELETE FROM {FTS_TABLE} WHERE rowid NOT IN (SELECT id FROM cv)'))
+    else:
+        db.session.execute(text(f'DELETE FROM {PG_TABLE} WHERE cv_id NOT IN (SELECT id FROM cv)'))
+    set_state(db.session.connection(), INDEX_BUILT_KEY, 1)
+    db.session.commit()
+    return indexed
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_search_index(target, connection, **kw):
+    """Tạo index cùng lúc với db.create_all(); index tạo khi chưa có CV nào thì đã đầy đủ"""
+    if create_search_index(connection) and connection.execute(text('SELECT 1 FROM cv LIMIT 1')).first() is None:
+        set_state(connection, INDEX_BUILT_KEY, 1)
+
+
+@event.listens_for(CV, 'after_insert')
+@event.listens_for(CV, 'after_update')
+def _mark_for_indexing(mapper, connection, target):
+    """Đánh dấu CV cần index lại; việc index chạy sau flush để đọc được content đầy đủ"""
+    state = db.inspect(target)
+    if state.has_identity and not any(
+        state.attrs[name].history.has_changes() for name in INDEXED_ATTRIBUTES
+    ):
+        return
+    state.session.info.setdefault('cv_search_pending', []).append(target)
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _index_pending(session, flush_context):
+    """Cập nhật index cho các CV vừa được ghi trong lần flush này"""
+    pending = session.info.pop('cv_search_pending', None)
+    if not pending:
+        return
+    
+    connection = session.connection()
+    for cv in {id(cv): cv for cv in pending}.values():
+        if cv.id is not None:
+            index_cv(connection, cv)
+
+
+@event.listens_for(CV, 'after_delete')
+def _remove_from_index(mapper, connection, target):
+    """CV bị xoá thì xoá khỏi index"""
+    remove_from_index(connection, target.id)
@@ -1,7 +1,24 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from counters import counters
 from db import db
+from models.analytics import EVENT_TEMPLATE_USE, record_event, template_usage
+from models.app_state import acquire_lock, release_lock
+from models.template_bundle import load_definition, load_manifest
+from models.template_version import snapshot_template
+from models.types import CompressedText
+from sqlalchemy import event, inspect
+import hashlib
 import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tên khoá dùng khi seed template (chỉ một process ghi tại một thời điểm)
+SEED_LOCK = 'templates.seed'
+
+# JSON template theo (template_id, version); version tăng mỗi khi template đổi nên không cần invalidate
+_base_cache = {}
 
 class CVTemplate(db.Model):
     """Model for CV Templates"""
@@ -11,7 +28,9 @@ class CVTemplate(db.Model):
     name = db.Column(db.String(100), nullable=False)  # Display name
     description = db.Column(db.Text)
     category = db.Column(db.String(50), default='modern')  # modern, professional, creative, minimal
-    template = db.Column(db.Text)  # Template configuration or HTML template
+    template = db.Column(CompressedText())  # Template configuration (Konva JSON), compressed at rest
+    version = db.Column(db.Integer, nullable=False, default=1)  # Tăng mỗi khi template đổi
+    seed_hash = db.Column(db.String(64))  # Hash của bản đi kèm ứng dụng đã seed lần cuối
     preview_image = db.Column(db.String(200))  # Path to preview image
     is_active = db.Column(db.Boolean, default=True)
     usage_count = db.Column(db.Integer, default=0)
@@ -43,1924 +62,155 @@ class CVTemplate(db.Model):
     
     def set_template_data(self, template_dict):
         """Set template data from dict (canvas editor format)"""
-        self.template = json.dumps(template_dict, ensure_ascii=False)
+        template = json.dumps(template_dict, ensure_ascii=False)
+        if template != self.template:
+            self.template = template
+            self.version = (self.version or 0) + 1
     
-    def increment_usage(self):
-        """Increment usage count"""
-        self.usage_count += 1
-        db.session.commit()
+    def increment_usage(self, user_id=None):
+        """Increment usage count (ghi trễ theo lô, không commit)"""
+        counters.increment(CVTemplate, self.id, 'usage_count')
+        record_event(EVENT_TEMPLATE_USE, user_id=user_id, template_id=self.id)
+    
+    @property
+    def usage_total(self):
+        """Usage count hiển thị (gồm các lượt chưa ghi)"""
+        return counters.value(self, 'usage_count')
     
     def get_popularity_badge(self):
-        """Get popularity badge based on usage"""
-        if self.usage_count > 1000:
-            return {'text': 'Phổ biến', 'class': 'bg-amber-400 text-amber-900'}
-        elif self.usage_count > 500:
-            return {'text': 'Được yêu thích', 'class': 'bg-green-400 text-green-900'}
-        elif self.created_at and (datetime.utcnow() - self.created_at).days < 30:
-            return {'text': 'Mới', 'class': 'bg-purple-500 text-white'}
-        return None
+        """Get popularity badge based on recent usage"""
+        return popularity_badge(self.id, self.created_at)
     
-    def to_dict(self):
-        """Convert to dictionary for JSON response"""
-        return {
-            'id': self.id,
-            'name': self.name,
-            'description': self.description,
-            'category': self.category,
-            'template': self.get_template_data(),
-            'preview_image': self.preview_image,
-            'usage_count': self.usage_count,
-            'features': self.get_features(),
-            'popularity_badge': self.get_popularity_badge()
+    def to_dict(self, fields=None):
+        """Convert to dictionary for JSON response (chỉ các field trong fields nếu có)"""
+        values = {
+            'id': lambda: self.id,
+            'name': lambda: self.name,
+            'description': lambda: self.description,
+            'category': lambda: self.category,
+            'template': self.get_template_data,
+            'preview_image': lambda: self.preview_image,
+            'usage_count': lambda: self.usage_total,
+            'features': self.get_features,
+            'popularity_badge': self.get_popularity_badge
         }
+        return {name: value() for name, value in values.items() if fields is None or name in fields}
     
     @staticmethod
-    def seed_default_templates():
-        """Create default templates if they don't exist"""
-        default_templates = [
-            {
-                'id': 'modern_complete',
-                'name': 'Modern Complete CV',
-                'description': 'Template hiện đại hoàn chỉnh với đầy đủ các thành phần CV chuyên nghiệp',
-                'category': 'modern',
-                'features': ['Full Layout', 'Professional Design', 'Header Section', 'Skills Visual', 'Modern Colors'],
-                'usage_count': 0,
-                'template_data': {
-                    'attrs': {
-                        'width': 595,
-                        'height': 842
-                    },
-                    'className': 'Stage',
-                    'children': [
-                        {
-                            'attrs': {},
-                            'className': 'Layer',
-                            'children': [
-                                {
-                                    'attrs': {
-                                        'width': 595,
-                                        'height': 120,
-                                        'fill': '#3B82F6',
-                                        'strokeWidth': 0,
-                                        'id': 'header_bg'
-                                    },
-                                    'className': 'Rect'
-                                }
-                            ]
-                        },
-                        {
-                            'attrs': {},
-                            'className': 'Layer',
-                            'children': [
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 170,
-                                        'width': 4,
-                                        'height': 60,
-                                        'fill': '#3B82F6',
-                                        'strokeWidth': 0,
-                                        'id': 'summary_border'
-                                    },
-                                    'className': 'Rect'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 280,
-                                        'width': 4,
-                                        'height': 160,
-                                        'fill': '#3B82F6',
-                                        'strokeWidth': 0,
-                                        'id': 'experience_border'
-                                    },
-                                    'className': 'Rect'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 490,
-                                        'width': 4,
-                                        'height': 100,
-                                        'fill': '#3B82F6',
-                                        'strokeWidth': 0,
-                                        'id': 'skills_border'
-                                    },
-                                    'className': 'Rect'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 620,
-                                        'width': 4,
-                                        'height': 120,
-                                        'fill': '#3B82F6',
-                                        'strokeWidth': 0,
-                                        'id': 'education_border'
-                                    },
-                                    'className': 'Rect'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 770,
-                                        'width': 4,
-                                        'height': 60,
-                                        'fill': '#3B82F6',
-                                        'strokeWidth': 0,
-                                        'id': 'languages_border'
-                                    },
-                                    'className': 'Rect'
-                                }
-                            ]
-                        },
-                        {
-                            'attrs': {},
-                            'className': 'Layer',
-                            'children': [
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 25,
-                                        'text': '{{full_name}}',
-                                        'fontSize': 28,
-                                        'fontStyle': 'bold',
-                                        'fill': '#FFFFFF',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'full_name'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 65,
-                                        'text': '{{position}}',
-                                        'fontSize': 16,
-                                        'fill': '#E5E7EB',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'position'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 420,
-                                        'y': 30,
-                                        'text': '✉ {{email}}',
-                                        'fontSize': 11,
-                                        'fill': '#FFFFFF',
-                                        'width': 150,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'email'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 420,
-                                        'y': 50,
-                                        'text': '📞 {{phone}}',
-                                        'fontSize': 11,
-                                        'fill': '#FFFFFF',
-                                        'width': 150,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'phone'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 420,
-                                        'y': 70,
-                                        'text': '📍 {{address}}',
-                                        'fontSize': 11,
-                                        'fill': '#FFFFFF',
-                                        'width': 150,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'address'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 150,
-                                        'text': 'MÔ TẢ BẢN THÂN',
-                                        'fontSize': 14,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 515,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'summary_title'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 175,
-                                        'text': '{{summary}}',
-                                        'fontSize': 11,
-                                        'fill': '#4B5563',
-                                        'width': 500,
-                                        'height': 50,
-                                        'lineHeight': 1.2,
-                                        'id': 'summary'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 260,
-                                        'text': 'KINH NGHIỆM LÀM VIỆC',
-                                        'fontSize': 14,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 515,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'experience_title'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 285,
-                                        'text': '{{experience[0].position}}',
-                                        'fontSize': 12,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'exp1_position'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 305,
-                                        'text': '{{experience[0].company}}',
-                                        'fontSize': 11,
-                                        'fill': '#3B82F6',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'exp1_company'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 420,
-                                        'y': 285,
-                                        'text': '{{experience[0].start_date}} - {{experience[0].end_date}}',
-                                        'fontSize': 10,
-                                        'fill': '#6B7280',
-                                        'width': 135,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'exp1_date'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 75,
-                                        'y': 325,
-                                        'text': '{{experience[0].description}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 480,
-                                        'height': 40,
-                                        'lineHeight': 1.2,
-                                        'id': 'exp1_description'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 375,
-                                        'text': '{{experience[1].position}}',
-                                        'fontSize': 12,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'exp2_position'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 395,
-                                        'text': '{{experience[1].company}}',
-                                        'fontSize': 11,
-                                        'fill': '#3B82F6',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'exp2_company'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 420,
-                                        'y': 375,
-                                        'text': '{{experience[1].start_date}} - {{experience[1].end_date}}',
-                                        'fontSize': 10,
-                                        'fill': '#6B7280',
-                                        'width': 135,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'exp2_date'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 75,
-                                        'y': 415,
-                                        'text': '{{experience[1].description}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 480,
-                                        'height': 40,
-                                        'lineHeight': 1.2,
-                                        'id': 'exp2_description'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 470,
-                                        'text': 'KỸ NĂNG',
-                                        'fontSize': 14,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 515,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'skills_title'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 495,
-                                        'text': 'Kỹ năng chuyên môn',
-                                        'fontSize': 12,
-                                        'fontStyle': 'bold',
-                                        'fill': '#374151',
-                                        'width': 250,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'tech_skills_title'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 320,
-                                        'y': 495,
-                                        'text': 'Kỹ năng mềm',
-                                        'fontSize': 12,
-                                        'fontStyle': 'bold',
-                                        'fill': '#374151',
-                                        'width': 235,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'soft_skills_title'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 515,
-                                        'text': '• {{technical_skills[0]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 250,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'tech_skill_1'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 530,
-                                        'text': '• {{technical_skills[1]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 250,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'tech_skill_2'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 545,
-                                        'text': '• {{technical_skills[2]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 250,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'tech_skill_3'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 320,
-                                        'y': 515,
-                                        'text': '• {{soft_skills[0]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 235,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'soft_skill_1'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 320,
-                                        'y': 530,
-                                        'text': '• {{soft_skills[1]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 235,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'soft_skill_2'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 320,
-                                        'y': 545,
-                                        'text': '• {{soft_skills[2]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 235,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'soft_skill_3'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 600,
-                                        'text': 'HỌC VẤN',
-                                        'fontSize': 14,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 515,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'education_title'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 625,
-                                        'text': '{{education[0].degree}}',
-                                        'fontSize': 12,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'edu1_degree'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 645,
-                                        'text': '{{education[0].school}}',
-                                        'fontSize': 11,
-                                        'fill': '#3B82F6',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'edu1_school'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 420,
-                                        'y': 625,
-                                        'text': '{{education[0].start_date}} - {{education[0].end_date}}',
-                                        'fontSize': 10,
-                                        'fill': '#6B7280',
-                                        'width': 135,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'edu1_date'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 75,
-                                        'y': 665,
-                                        'text': '{{education[0].description}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 480,
-                                        'height': 30,
-                                        'lineHeight': 1.2,
-                                        'id': 'edu1_description'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 705,
-                                        'text': '{{education[1].degree}}',
-                                        'fontSize': 12,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'edu2_degree'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 725,
-                                        'text': '{{education[1].school}}',
-                                        'fontSize': 11,
-                                        'fill': '#3B82F6',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'edu2_school'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 420,
-                                        'y': 705,
-                                        'text': '{{education[1].start_date}} - {{education[1].end_date}}',
-                                        'fontSize': 10,
-                                        'fill': '#6B7280',
-                                        'width': 135,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'edu2_date'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 750,
-                                        'text': 'NGÔN NGỮ',
-                                        'fontSize': 14,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 515,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'languages_title'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 775,
-                                        'text': '• {{languages[0]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 250,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'language_1'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 320,
-                                        'y': 775,
-                                        'text': '• {{languages[1]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 235,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'language_2'
-                                    },
-                                    'className': 'Text'
-                                }
-                            ]
-                        }
-                    ]
-                }
-            },
-            {
-                'id': 'modern_green',
-                'name': 'Modern Green CV',
-                'description': 'Template hiện đại với tông màu xanh lá cây tươi mát, phù hợp cho các ngành sáng tạo và môi trường',
-                'category': 'modern',
-                'features': ['Full Layout', 'Eco Design', 'Header Section', 'Skills Visual', 'Green Theme'],
-                'usage_count': 0,
-                'template_data': {
-                    'attrs': {
-                        'width': 595,
-                        'height': 842
-                    },
-                    'className': 'Stage',
-                    'children': [
-                        {
-                            'attrs': {},
-                            'className': 'Layer',
-                            'children': [
-                                {
-                                    'attrs': {
-                                        'width': 595,
-                                        'height': 120,
-                                        'fill': '#10B981',
-                                        'strokeWidth': 0,
-                                        'id': 'header_bg'
-                                    },
-                                    'className': 'Rect'
-                                }
-                            ]
-                        },
-                        {
-                            'attrs': {},
-                            'className': 'Layer',
-                            'children': [
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 170,
-                                        'width': 4,
-                                        'height': 60,
-                                        'fill': '#10B981',
-                                        'strokeWidth': 0,
-                                        'id': 'summary_border'
-                                    },
-                                    'className': 'Rect'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 280,
-                                        'width': 4,
-                                        'height': 160,
-                                        'fill': '#10B981',
-                                        'strokeWidth': 0,
-                                        'id': 'experience_border'
-                                    },
-                                    'className': 'Rect'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 490,
-                                        'width': 4,
-                                        'height': 100,
-                                        'fill': '#10B981',
-                                        'strokeWidth': 0,
-                                        'id': 'skills_border'
-                                    },
-                                    'className': 'Rect'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 620,
-                                        'width': 4,
-                                        'height': 120,
-                                        'fill': '#10B981',
-                                        'strokeWidth': 0,
-                                        'id': 'education_border'
-                                    },
-                                    'className': 'Rect'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 770,
-                                        'width': 4,
-                                        'height': 60,
-                                        'fill': '#10B981',
-                                        'strokeWidth': 0,
-                                        'id': 'languages_border'
-                                    },
-                                    'className': 'Rect'
-                                }
-                            ]
-                        },
-                        {
-                            'attrs': {},
-                            'className': 'Layer',
-                            'children': [
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 25,
-                                        'text': '{{full_name}}',
-                                        'fontSize': 28,
-                                        'fontStyle': 'bold',
-                                        'fill': '#FFFFFF',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'full_name'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 65,
-                                        'text': '{{position}}',
-                                        'fontSize': 16,
-                                        'fill': '#E5E7EB',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'position'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 420,
-                                        'y': 30,
-                                        'text': '✉ {{email}}',
-                                        'fontSize': 11,
-                                        'fill': '#FFFFFF',
-                                        'width': 150,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'email'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 420,
-                                        'y': 50,
-                                        'text': '📞 {{phone}}',
-                                        'fontSize': 11,
-                                        'fill': '#FFFFFF',
-                                        'width': 150,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'phone'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 420,
-                                        'y': 70,
-                                        'text': '📍 {{address}}',
-                                        'fontSize': 11,
-                                        'fill': '#FFFFFF',
-                                        'width': 150,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'address'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 150,
-                                        'text': 'MÔ TẢ BẢN THÂN',
-                                        'fontSize': 14,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 515,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'summary_title'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 175,
-                                        'text': '{{summary}}',
-                                        'fontSize': 11,
-                                        'fill': '#4B5563',
-                                        'width': 500,
-                                        'height': 50,
-                                        'lineHeight': 1.2,
-                                        'id': 'summary'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 260,
-                                        'text': 'KINH NGHIỆM LÀM VIỆC',
-                                        'fontSize': 14,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 515,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'experience_title'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 285,
-                                        'text': '{{experience[0].position}}',
-                                        'fontSize': 12,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'exp1_position'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 305,
-                                        'text': '{{experience[0].company}}',
-                                        'fontSize': 11,
-                                        'fill': '#10B981',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'exp1_company'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 420,
-                                        'y': 285,
-                                        'text': '{{experience[0].start_date}} - {{experience[0].end_date}}',
-                                        'fontSize': 10,
-                                        'fill': '#6B7280',
-                                        'width': 135,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'exp1_date'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 75,
-                                        'y': 325,
-                                        'text': '{{experience[0].description}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 480,
-                                        'height': 40,
-                                        'lineHeight': 1.2,
-                                        'id': 'exp1_description'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 375,
-                                        'text': '{{experience[1].position}}',
-                                        'fontSize': 12,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'exp2_position'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 395,
-                                        'text': '{{experience[1].company}}',
-                                        'fontSize': 11,
-                                        'fill': '#10B981',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'exp2_company'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 420,
-                                        'y': 375,
-                                        'text': '{{experience[1].start_date}} - {{experience[1].end_date}}',
-                                        'fontSize': 10,
-                                        'fill': '#6B7280',
-                                        'width': 135,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'exp2_date'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 75,
-                                        'y': 415,
-                                        'text': '{{experience[1].description}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 480,
-                                        'height': 40,
-                                        'lineHeight': 1.2,
-                                        'id': 'exp2_description'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 470,
-                                        'text': 'KỸ NĂNG',
-                                        'fontSize': 14,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 515,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'skills_title'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 495,
-                                        'text': 'Kỹ năng chuyên môn',
-                                        'fontSize': 12,
-                                        'fontStyle': 'bold',
-                                        'fill': '#374151',
-                                        'width': 250,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'tech_skills_title'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 320,
-                                        'y': 495,
-                                        'text': 'Kỹ năng mềm',
-                                        'fontSize': 12,
-                                        'fontStyle': 'bold',
-                                        'fill': '#374151',
-                                        'width': 235,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'soft_skills_title'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 515,
-                                        'text': '• {{technical_skills[0]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 250,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'tech_skill_1'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 530,
-                                        'text': '• {{technical_skills[1]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 250,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'tech_skill_2'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 545,
-                                        'text': '• {{technical_skills[2]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 250,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'tech_skill_3'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 320,
-                                        'y': 515,
-                                        'text': '• {{soft_skills[0]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 235,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'soft_skill_1'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 320,
-                                        'y': 530,
-                                        'text': '• {{soft_skills[1]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 235,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'soft_skill_2'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 320,
-                                        'y': 545,
-                                        'text': '• {{soft_skills[2]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 235,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'soft_skill_3'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 600,
-                                        'text': 'HỌC VẤN',
-                                        'fontSize': 14,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 515,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'education_title'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 625,
-                                        'text': '{{education[0].degree}}',
-                                        'fontSize': 12,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'edu1_degree'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 645,
-                                        'text': '{{education[0].school}}',
-                                        'fontSize': 11,
-                                        'fill': '#10B981',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'edu1_school'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 420,
-                                        'y': 625,
-                                        'text': '{{education[0].start_date}} - {{education[0].end_date}}',
-                                        'fontSize': 10,
-                                        'fill': '#6B7280',
-                                        'width': 135,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'edu1_date'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 75,
-                                        'y': 665,
-                                        'text': '{{education[0].description}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 480,
-                                        'height': 30,
-                                        'lineHeight': 1.2,
-                                        'id': 'edu1_description'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 705,
-                                        'text': '{{education[1].degree}}',
-                                        'fontSize': 12,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'edu2_degree'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 725,
-                                        'text': '{{education[1].school}}',
-                                        'fontSize': 11,
-                                        'fill': '#10B981',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'edu2_school'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 420,
-                                        'y': 705,
-                                        'text': '{{education[1].start_date}} - {{education[1].end_date}}',
-                                        'fontSize': 10,
-                                        'fill': '#6B7280',
-                                        'width': 135,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'edu2_date'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 750,
-                                        'text': 'NGÔN NGỮ',
-                                        'fontSize': 14,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 515,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'languages_title'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 775,
-                                        'text': '• {{languages[0]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 250,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'language_1'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 320,
-                                        'y': 775,
-                                        'text': '• {{languages[1]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 235,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'language_2'
-                                    },
-                                    'className': 'Text'
-                                }
-                            ]
-                        }
-                    ]
-                }
-            },
-            {
-                'id': 'modern_gray',
-                'name': 'Modern Gray CV',
-                'description': 'Template hiện đại với tông màu xám thanh lịch, phù hợp cho môi trường công sở chuyên nghiệp',
-                'category': 'professional',
-                'features': ['Full Layout', 'Minimal Design', 'Header Section', 'Skills Visual', 'Gray Theme'],
-                'usage_count': 0,
-                'template_data': {
-                    'attrs': {
-                        'width': 595,
-                        'height': 842
-                    },
-                    'className': 'Stage',
-                    'children': [
-                        {
-                            'attrs': {},
-                            'className': 'Layer',
-                            'children': [
-                                {
-                                    'attrs': {
-                                        'width': 595,
-                                        'height': 120,
-                                        'fill': '#6B7280',
-                                        'strokeWidth': 0,
-                                        'id': 'header_bg'
-                                    },
-                                    'className': 'Rect'
-                                }
-                            ]
-                        },
-                        {
-                            'attrs': {},
-                            'className': 'Layer',
-                            'children': [
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 170,
-                                        'width': 4,
-                                        'height': 60,
-                                        'fill': '#6B7280',
-                                        'strokeWidth': 0,
-                                        'id': 'summary_border'
-                                    },
-                                    'className': 'Rect'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 280,
-                                        'width': 4,
-                                        'height': 160,
-                                        'fill': '#6B7280',
-                                        'strokeWidth': 0,
-                                        'id': 'experience_border'
-                                    },
-                                    'className': 'Rect'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 490,
-                                        'width': 4,
-                                        'height': 100,
-                                        'fill': '#6B7280',
-                                        'strokeWidth': 0,
-                                        'id': 'skills_border'
-                                    },
-                                    'className': 'Rect'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 620,
-                                        'width': 4,
-                                        'height': 120,
-                                        'fill': '#6B7280',
-                                        'strokeWidth': 0,
-                                        'id': 'education_border'
-                                    },
-                                    'className': 'Rect'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 770,
-                                        'width': 4,
-                                        'height': 60,
-                                        'fill': '#6B7280',
-                                        'strokeWidth': 0,
-                                        'id': 'languages_border'
-                                    },
-                                    'className': 'Rect'
-                                }
-                            ]
-                        },
-                        {
-                            'attrs': {},
-                            'className': 'Layer',
-                            'children': [
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 25,
-                                        'text': '{{full_name}}',
-                                        'fontSize': 28,
-                                        'fontStyle': 'bold',
-                                        'fill': '#FFFFFF',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'full_name'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 65,
-                                        'text': '{{position}}',
-                                        'fontSize': 16,
-                                        'fill': '#E5E7EB',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'position'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 420,
-                                        'y': 30,
-                                        'text': '✉ {{email}}',
-                                        'fontSize': 11,
-                                        'fill': '#FFFFFF',
-                                        'width': 150,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'email'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 420,
-                                        'y': 50,
-                                        'text': '📞 {{phone}}',
-                                        'fontSize': 11,
-                                        'fill': '#FFFFFF',
-                                        'width': 150,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'phone'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 420,
-                                        'y': 70,
-                                        'text': '📍 {{address}}',
-                                        'fontSize': 11,
-                                        'fill': '#FFFFFF',
-                                        'width': 150,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'address'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 150,
-                                        'text': 'MÔ TẢ BẢN THÂN',
-                                        'fontSize': 14,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 515,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'summary_title'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 175,
-                                        'text': '{{summary}}',
-                                        'fontSize': 11,
-                                        'fill': '#4B5563',
-                                        'width': 500,
-                                        'height': 50,
-                                        'lineHeight': 1.2,
-                                        'id': 'summary'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 260,
-                                        'text': 'KINH NGHIỆM LÀM VIỆC',
-                                        'fontSize': 14,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 515,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'experience_title'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 285,
-                                        'text': '{{experience[0].position}}',
-                                        'fontSize': 12,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'exp1_position'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 305,
-                                        'text': '{{experience[0].company}}',
-                                        'fontSize': 11,
-                                        'fill': '#6B7280',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'exp1_company'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 420,
-                                        'y': 285,
-                                        'text': '{{experience[0].start_date}} - {{experience[0].end_date}}',
-                                        'fontSize': 10,
-                                        'fill': '#9CA3AF',
-                                        'width': 135,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'exp1_date'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 75,
-                                        'y': 325,
-                                        'text': '{{experience[0].description}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 480,
-                                        'height': 40,
-                                        'lineHeight': 1.2,
-                                        'id': 'exp1_description'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 375,
-                                        'text': '{{experience[1].position}}',
-                                        'fontSize': 12,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'exp2_position'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 395,
-                                        'text': '{{experience[1].company}}',
-                                        'fontSize': 11,
-                                        'fill': '#6B7280',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'exp2_company'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 420,
-                                        'y': 375,
-                                        'text': '{{experience[1].start_date}} - {{experience[1].end_date}}',
-                                        'fontSize': 10,
-                                        'fill': '#9CA3AF',
-                                        'width': 135,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'exp2_date'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 75,
-                                        'y': 415,
-                                        'text': '{{experience[1].description}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 480,
-                                        'height': 40,
-                                        'lineHeight': 1.2,
-                                        'id': 'exp2_description'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 470,
-                                        'text': 'KỸ NĂNG',
-                                        'fontSize': 14,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 515,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'skills_title'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 495,
-                                        'text': 'Kỹ năng chuyên môn',
-                                        'fontSize': 12,
-                                        'fontStyle': 'bold',
-                                        'fill': '#374151',
-                                        'width': 250,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'tech_skills_title'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 320,
-                                        'y': 495,
-                                        'text': 'Kỹ năng mềm',
-                                        'fontSize': 12,
-                                        'fontStyle': 'bold',
-                                        'fill': '#374151',
-                                        'width': 235,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'soft_skills_title'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 515,
-                                        'text': '• {{technical_skills[0]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 250,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'tech_skill_1'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 530,
-                                        'text': '• {{technical_skills[1]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 250,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'tech_skill_2'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 545,
-                                        'text': '• {{technical_skills[2]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 250,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'tech_skill_3'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 320,
-                                        'y': 515,
-                                        'text': '• {{soft_skills[0]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 235,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'soft_skill_1'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 320,
-                                        'y': 530,
-                                        'text': '• {{soft_skills[1]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 235,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'soft_skill_2'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 320,
-                                        'y': 545,
-                                        'text': '• {{soft_skills[2]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 235,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'soft_skill_3'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 600,
-                                        'text': 'HỌC VẤN',
-                                        'fontSize': 14,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 515,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'education_title'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 625,
-                                        'text': '{{education[0].degree}}',
-                                        'fontSize': 12,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'edu1_degree'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 645,
-                                        'text': '{{education[0].school}}',
-                                        'fontSize': 11,
-                                        'fill': '#6B7280',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'edu1_school'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 420,
-                                        'y': 625,
-                                        'text': '{{education[0].start_date}} - {{education[0].end_date}}',
-                                        'fontSize': 10,
-                                        'fill': '#9CA3AF',
-                                        'width': 135,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'edu1_date'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 75,
-                                        'y': 665,
-                                        'text': '{{education[0].description}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 480,
-                                        'height': 30,
-                                        'lineHeight': 1.2,
-                                        'id': 'edu1_description'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 705,
-                                        'text': '{{education[1].degree}}',
-                                        'fontSize': 12,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'edu2_degree'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 725,
-                                        'text': '{{education[1].school}}',
-                                        'fontSize': 11,
-                                        'fill': '#6B7280',
-                                        'width': 350,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'edu2_school'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 420,
-                                        'y': 705,
-                                        'text': '{{education[1].start_date}} - {{education[1].end_date}}',
-                                        'fontSize': 10,
-                                        'fill': '#9CA3AF',
-                                        'width': 135,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'edu2_date'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 40,
-                                        'y': 750,
-                                        'text': 'NGÔN NGỮ',
-                                        'fontSize': 14,
-                                        'fontStyle': 'bold',
-                                        'fill': '#1F2937',
-                                        'width': 515,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'languages_title'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 55,
-                                        'y': 775,
-                                        'text': '• {{languages[0]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 250,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'language_1'
-                                    },
-                                    'className': 'Text'
-                                },
-                                {
-                                    'attrs': {
-                                        'x': 320,
-                                        'y': 775,
-                                        'text': '• {{languages[1]}}',
-                                        'fontSize': 10,
-                                        'fill': '#4B5563',
-                                        'width': 235,
-                                        'wrap': 'none',
-                                        'lineHeight': 1.2,
-                                        'id': 'language_2'
-                                    },
-                                    'className': 'Text'
-                                }
-                            ]
-                        }
-                    ]
-                }
-            }
-        ]
-        
-        for template_data in default_templates:
-            existing = CVTemplate.query.get(template_data['id'])
-            if not existing:
-                template = CVTemplate(
-                    id=template_data['id'],
-                    name=template_data['name'],
-                    description=template_data['description'],
-                    category=template_data['category'],
-                    usage_count=template_data['usage_count']
-                )
-                template.set_features(template_data['features'])
-                template.set_template_data(template_data['template_data'])
-                db.session.add(template)
-            else:
-                # Update existing template with new data including education section
-                existing.set_template_data(template_data['template_data'])
-        
-        db.session.commit()
+    def seed_default_templates(force=False):
+        """Create/update default templates từ data/templates; chỉ ghi template có nội dung đổi (so seed_hash)"""
+        return seed_templates(load_manifest(), force=force)
     
     def __repr__(self):
         return f'<CVTemplate {self.name}>'
+
+
+def seed_hash(definition):
+    """Hash nội dung của một template đi kèm (không tính usage_count)"""
+    content = {name: definition.get(name) for name in ('name', 'description', 'category', 'features', 'template_data')}
+    raw = json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def seed_templates(manifest, force=False):
+    """Tạo/cập nhật các template đi kèm theo manifest, trả về số template đã ghi.
+    
+    So hash trong manifest với seed_hash đã lưu nên không đọc file template nào khi không có gì đổi;
+    chỉ file của template mới/đã đổi mới được đọc. Chỉ một process được ghi tại một thời điểm (khoá trong app_state).
+    """
+    hashes = {entry['id']: entry['hash'] for entry in manifest}
+    
+    def changed_ids():
+        table = CVTemplate.__table__
+        stored = dict(db.session.execute(
+            db.select(table.c.id, table.c.seed_hash).where(table.c.id.in_(list(hashes)))
+        ).all())
+        return [template_id for template_id, value in hashes.items() if force or stored.get(template_id) != value]
+    
+    if not changed_ids():
+        return 0
+    
+    token = acquire_lock(SEED_LOCK)
+    if token is None:
+        # Process khác đang seed
+        return 0
+    
+    try:
+        # Đọc lại sau khi có khoá: process khác có thể vừa seed xong
+        pending = set(changed_ids())
+        for entry in manifest:
+            if entry['id'] not in pending:
+                continue
+            definition = load_definition(entry)
+            actual_hash = seed_hash(definition)
+            if actual_hash != entry['hash']:
+                logger.warning("Hash của template %s khác manifest, hãy chạy 'flask cv build-template-manifest'", entry['id'])
+            
+            template = db.session.get(CVTemplate, definition['id'])
+            if template is None:
+                template = CVTemplate(id=definition['id'], usage_count=definition.get('usage_count', 0))
+                db.session.add(template)
+            template.name = definition['name']
+            template.description = definition['description']
+            template.category = definition['category']
+            template.set_features(definition['features'])
+            template.set_template_data(definition['template_data'])
+            template.seed_hash = entry['hash']
+        db.session.commit()
+        return len(pending)
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        release_lock(SEED_LOCK, token)
+
+
+def popularity_badge(template_id, created_at):
+    """Badge theo số CV tạo từ template trong 30 ngày gần nhất (đọc từ rollup)"""
+    usage_count = template_usage().get(template_id, 0)
+    if usage_count > 1000:
+        return {'text': 'Phổ biến', 'class': 'bg-amber-400 text-amber-900'}
+    elif usage_count > 500:
+        return {'text': 'Được yêu thích', 'class': 'bg-green-400 text-green-900'}
+    elif created_at and (datetime.utcnow() - created_at).days < 30:
+        return {'text': 'Mới', 'class': 'bg-purple-500 text-white'}
+    return None
+
+
+def load_base_template(connection, template_id):
+    """Trả về (version, JSON) hiện tại của template, JSON được cache trong process theo version"""
+    if not template_id:
+        return None, None
+    
+    table = CVTemplate.__table__
+    version = connection.execute(
+        db.select(table.c.version).where(table.c.id == template_id)
+    ).scalar()
+    if version is None:
+        return None, None
+    
+    raw = _base_cache.get((template_id, version))
+    if raw is None:
+        row = connection.execute(
+            db.select(table.c.version, table.c.template).where(table.c.id == template_id)
+        ).first()
+        if row is None:
+            return None, None
+        version, raw = row.version, row.template
+        for key in [key for key in _base_cache if key[0] == template_id]:
+            del _base_cache[key]
+        _base_cache[(template_id, version)] = raw
+    return version, raw
+
+
+@event.listens_for(CVTemplate, 'after_insert')
+def _snapshot_new_template(mapper, connection, target):
+    """Template mới: lưu snapshot version đầu tiên (cùng transaction)"""
+    snapshot_template(connection, target.id, target.version, target.template)
+
+
+@event.listens_for(CVTemplate, 'after_update')
+def _snapshot_new_version(mapper, connection, target):
+    """Mỗi version mới của template được lưu snapshot bất biến (cùng transaction với lần ghi template)"""
+    if inspect(target).attrs.version.history.has_changes():
+        snapshot_template(connection, target.id, target.version, target.template)
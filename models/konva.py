@@ -0,0 +1,133 @@
+from flask import current_app, has_app_context
+import json
+
+# Số chữ số thập phân giữ lại cho toạ độ/kích thước (ghi đè bằng config KONVA_GEOMETRY_PRECISION)
+GEOMETRY_PRECISION = 2
+
+# Thuộc tính số được làm tròn (toJSON của Konva hay có nhiễu kiểu 55.00000001)
+GEOMETRY_ATTRS = frozenset({
+    'x', 'y', 'width', 'height', 'rotation', 'scaleX', 'scaleY', 'skewX', 'skewY',
+    'offsetX', 'offsetY', 'radius', 'innerRadius', 'outerRadius', 'cornerRadius',
+    'strokeWidth', 'fontSize', 'lineHeight', 'letterSpacing', 'padding', 'opacity', 'points'
+})
+
+# Giá trị mặc định của Konva được bỏ khi lưu và thêm lại khi mở editor.
+# Chỉ gồm các thuộc tính mà pdf_generator cũng mặc định giống Konva: fontSize, lineHeight,
+# width của Text, strokeWidth, fill... có mặc định khác nhau nên luôn được giữ nguyên.
+NODE_DEFAULTS = {
+    'x': 0,
+    'y': 0,
+    'rotation': 0,
+    'scaleX': 1,
+    'scaleY': 1,
+    'skewX': 0,
+    'skewY': 0,
+    'offsetX': 0,
+    'offsetY': 0,
+    'opacity': 1,
+    'visible': True,
+    'listening': True,
+    'draggable': False,
+}
+CLASS_DEFAULTS = {
+    'Text': {
+        'fontFamily': 'Arial',
+        'fontStyle': 'normal',
+        'fontVariant': 'normal',
+        'textDecoration': '',
+        'align': 'left',
+        'verticalAlign': 'top',
+        'padding': 0,
+        'letterSpacing': 0,
+        'wrap': 'word',
+        'ellipsis': False,
+    },
+    'Rect': {
+        'cornerRadius': 0,
+    },
+}
+
+
+def geometry_precision():
+    """Số chữ số thập phân theo config của app (mặc định GEOMETRY_PRECISION)"""
+    if has_app_context():
+        return current_app.config.get('KONVA_GEOMETRY_PRECISION', GEOMETRY_PRECISION)
+    return GEOMETRY_PRECISION
+
+
+def _defaults(class_name):
+    extra = CLASS_DEFAULTS.get(class_name)
+    return {**NODE_DEFAULTS, **extra} if extra else NODE_DEFAULTS
+
+
+def _round(value, precision):
+    """Làm tròn số (cả danh sách points); số nguyên sau khi làm tròn được ghi dạng int"""
+    if isinstance(value, list):
+        return [_round(item, precision) for item in value]
+    if isinstance(value, float):
+        value = round(value, precision)
+        return int(value) if value.is_integer() else value
+    return value
+
+
+def _same(value, default):
+    # True == 1 trong Python: thuộc tính bool chỉ khớp với giá trị bool và ngược lại
+    return value == default and isinstance(value, bool) == isinstance(default, bool)
+
+
+def canonicalize(document, precision=None):
+    """Bản chuẩn hoá của cây Konva: làm tròn toạ độ/kích thước, bỏ thuộc tính bằng mặc định của Konva.
+    
+    Không sửa document; cùng một nội dung luôn cho cùng kết quả (dùng với canonical_json).
+    """
+    if not isinstance(document, dict):
+        return document
+    if precision is None:
+        precision = geometry_precision()
+    
+    root = dict(document)
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        attrs = node.get('attrs')
+        if isinstance(attrs, dict):
+            defaults = _defaults(node.get('className'))
+            canonical = {}
+            for name, value in attrs.items():
+                if name in GEOMETRY_ATTRS:
+                    value = _round(value, precision)
+                if name in defaults and _same(value, defaults[name]):
+                    continue
+                canonical[name] = value
+            node['attrs'] = canonical
+        children = node.get('children')
+        if isinstance(children, list):
+            node['children'] = [dict(child) if isinstance(child, dict) else child for child in children]
+            stack.extend(child for child in node['children'] if isinstance(child, dict))
+    return root
+
+
+def expand_defaults(document):
+    """Bản sao cây Konva với các thuộc tính mặc định đã bỏ khi chuẩn hoá được thêm lại (cho editor)"""
+    if not isinstance(document, dict):
+        return document
+    
+    root = dict(document)
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        attrs = node.get('attrs')
+        if attrs is None or isinstance(attrs, dict):
+            node['attrs'] = {**_defaults(node.get('className')), **(attrs or {})}
+        children = node.get('children')
+        if isinstance(children, list):
+            node['children'] = [dict(child) if isinstance(child, dict) else child for child in children]
+            stack.extend(child for child in node['children'] if isinstance(child, dict))
+    return root
+
+
+def canonical_json(value):
+    """JSON gọn (không khoảng trắng, khoá được sắp xếp): cùng nội dung luôn cho cùng chuỗi và cùng hash"""
+    if value is None:
+        return None
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
@@ -0,0 +1,110 @@
+import copy
+
+
+def _index_nodes(root):
+    """Đánh khoá cho mọi node của cây Konva theo thứ tự duyệt trước.
+    
+    Khoá là attrs.id nếu có, ngược lại là vị trí trong node cha ('<khoá cha>/<index>').
+    Trả về {khoá: (node, khoá cha, index)} hoặc None nếu có khoá trùng.
+    """
+    if not isinstance(root, dict):
+        return None
+    
+    nodes = {}
+    stack = [(root, None, 0)]
+    while stack:
+        node, parent, index = stack.pop()
+        node_id = (node.get('attrs') or {}).get('id')
+        if parent is None:
+            key = ''
+        elif isinstance(node_id, str) and node_id:
+            key = node_id
+        else:
+            key = f'{parent}/{index}'
+        if key in nodes:
+            return None
+        nodes[key] = (node, parent, index)
+        
+        children = node.get('children') or []
+        for child_index in range(len(children) - 1, -1, -1):
+            if not isinstance(children[child_index], dict):
+                return None
+            stack.append((children[child_index], key, child_index))
+    return nodes
+
+
+def _node_shape(node):
+    """Các khoá của node ngoài attrs/children (className...), phải giống nhau mới so sánh được"""
+    return {name: value for name, value in node.items() if name not in ('attrs', 'children')}
+
+
+def build_overlay(base, document):
+    """Tính overlay biến template gốc thành tài liệu: attrs ghi đè/bỏ đi, node bị xoá và node thêm mới.
+    
+    Trả về None nếu không biểu diễn được (node đổi cha, đổi thứ tự, đổi loại...).
+    """
+    base_nodes = _index_nodes(base)
+    doc_nodes = _index_nodes(document)
+    if base_nodes is None or doc_nodes is None:
+        return None
+    
+    overlay = {'attrs': {}, 'unset': {}, 'removed': [], 'added': []}
+    for key, (node, parent, _) in base_nodes.items():
+        if key not in doc_nodes:
+            if parent in doc_nodes:
+                overlay['removed'].append(key)
+            continue
+        
+        other, other_parent, _ = doc_nodes[key]
+        if other_parent != parent or _node_shape(other) != _node_shape(node):
+            return None
+        
+        attrs = node.get('attrs') or {}
+        other_attrs = other.get('attrs') or {}
+        changed = {
+            name: value for name, value in other_attrs.items()
+            if name not in attrs or attrs[name] != value
+        }
+        unset = [name for name in attrs if name not in other_attrs]
+        if changed:
+            overlay['attrs'][key] = changed
+        if unset:
+            overlay['unset'][key] = unset
+    
+    for key, (node, parent, index) in doc_nodes.items():
+        if key not in base_nodes and parent in base_nodes:
+            overlay['added'].append({'parent': parent, 'index': index, 'node': node})
+    
+    overlay = {part: value for part, value in overlay.items() if value}
+    if apply_overlay(copy.deepcopy(base), overlay) != document:
+        return None
+    return overlay
+
+
+def apply_overlay(base, overlay):
+    """Dựng lại tài liệu từ template gốc và overlay (sửa trực tiếp trên base)"""
+    nodes = _index_nodes(base)
+    if nodes is None or not isinstance(overlay, dict):
+        return base
+    
+    for key, changed in (overlay.get('attrs') or {}).items():
+        if key in nodes:
+            nodes[key][0].setdefault('attrs', {}).update(changed)
+    for key, names in (overlay.get('unset') or {}).items():
+        if key in nodes:
+            attrs = nodes[key][0].get('attrs') or {}
+            for name in names:
+                attrs.pop(name, None)
+    
+    removed = {id(nodes[key][0]) for key in overlay.get('removed') or [] if key in nodes}
+    if removed:
+        for node, _, _ in nodes.values():
+            if node.get('children'):
+                node['children'] = [child for child in node['children'] if id(child) not in removed]
+    
+    for entry in overlay.get('added') or []:
+        if entry.get('parent') in nodes:
+            parent = nodes[entry['parent']][0]
+            parent.setdefault('children', []).insert(entry.get('index', 0), entry['node'])
+    
+    return base
@@ -0,0 +1,65 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Thư mục chứa các template đi kèm: mỗi template một file JSON, manifest.json liệt kê id, file, version, hash
+BUNDLE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'templates')
+MANIFEST_FILE = 'manifest.json'
+
+_manifest_cache = {}
+
+
+def load_manifest(bundle_dir=BUNDLE_DIR):
+    """Danh sách {id, file, version, hash} của các template đi kèm (chỉ đọc manifest, cache theo mtime)"""
+    path = os.path.join(bundle_dir, MANIFEST_FILE)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        logger.warning('Không tìm thấy manifest template: %s', path)
+        return []
+    
+    cached = _manifest_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, encoding='utf-8') as f:
+            entries = json.load(f).get('templates', [])
+        cached = (mtime, entries)
+        _manifest_cache[path] = cached
+    return cached[1]
+
+
+def load_definition(entry, bundle_dir=BUNDLE_DIR):
+    """Đọc định nghĩa đầy đủ (cả template_data) của một template trong manifest; không cache"""
+    with open(os.path.join(bundle_dir, entry['file']), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def build_manifest(hash_function, bundle_dir=BUNDLE_DIR):
+    """Tạo lại manifest từ các file template trong thư mục (giữ version cũ, tăng version khi hash đổi)"""
+    previous = {entry['id']: entry for entry in load_manifest(bundle_dir)}
+    entries = []
+    for name in sorted(os.listdir(bundle_dir)):
+        if not name.endswith('.json') or name == MANIFEST_FILE:
+            continue
+        entry = {'file': name}
+        definition = load_definition(entry, bundle_dir)
+        entry['id'] = definition['id']
+        entry['hash'] = hash_function(definition)
+        old = previous.get(entry['id'])
+        if old is None:
+            entry['version'] = 1
+        else:
+            entry['version'] = old.get('version', 1) + (old.get('hash') != entry['hash'])
+        entries.append({'id': entry['id'], 'file': name, 'version': entry['version'], 'hash': entry['hash']})
+    
+    # Giữ thứ tự cũ (thứ tự seed), template mới thêm vào cuối
+    order = list(previous)
+    entries.sort(key=lambda entry: order.index(entry['id']) if entry['id'] in order else len(order))
+    
+    path = os.path.join(bundle_dir, MANIFEST_FILE)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'templates': entries}, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+    _manifest_cache.pop(path, None)
+    return entries
@@ -0,0 +1,190 @@
+from datetime import datetime, timedelta
+from counters import counters
+from db import db
+from flask import g, has_app_context
+from models.analytics import EVENT_TEMPLATE_USE, record_event
+from models.app_state import get_state, set_state
+from models.cv_template import CVTemplate, popularity_badge
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError, ProgrammingError
+import copy
+import json
+import uuid
+
+# Khoá trong app_state: đổi giá trị mỗi khi có template được ghi, mọi worker so với bản đang cache
+CATALOG_VERSION_KEY = 'templates.catalog_version'
+
+# usage_count đổi liên tục (bộ đếm ghi trễ) nên không nằm trong catalogue mà được đọc lại theo chu kỳ này
+USAGE_REFRESH_INTERVAL = timedelta(seconds=60)
+
+_catalog = None
+_state_available = False
+_usage = {'loaded_at': None, 'counts': {}}
+
+
+class TemplateEntry:
+    """Bản chụp chỉ đọc của một template (JSON đã parse và serialise sẵn), dùng thay CVTemplate khi chỉ đọc"""
+    
+    def __init__(self, row):
+        self.id = row.id
+        self.name = row.name
+        self.description = row.description
+        self.category = row.category
+        self.preview_image = row.preview_image
+        self.is_active = row.is_active
+        self.version = row.version
+        self.created_at = row.created_at
+        self.template_raw = row.template or '{}'
+        self._template_data = _parse(row.template, {})
+        self._features = _parse(row.features, [])
+        static = {
+            'id': self.id,
+            'name': self.name,
+            'description': self.description,
+            'category': self.category,
+            'preview_image': self.preview_image,
+            'features': self._features,
+        }
+        self._static_json = {name: json.dumps(value, ensure_ascii=False) for name, value in static.items()}
+    
+    def get_template_data(self):
+        """Template data (bản sao, người gọi được phép sửa)"""
+        return copy.deepcopy(self._template_data)
+    
+    def get_features(self):
+        return list(self._features)
+    
+    def get_popularity_badge(self):
+        return popularity_badge(self.id, self.created_at)
+    
+    @property
+    def usage_total(self):
+        """Usage count hiển thị (gồm các lượt chưa ghi)"""
+        return usage_counts().get(self.id, 0) + counters.pending(CVTemplate, self.id, 'usage_count')
+    
+    def increment_usage(self, user_id=None):
+        """Increment usage count (ghi trễ theo lô, không commit)"""
+        counters.increment(CVTemplate, self.id, 'usage_count')
+        record_event(EVENT_TEMPLATE_USE, user_id=user_id, template_id=self.id)
+    
+    def to_json(self, fields=None):
+        """JSON giống CVTemplate.to_dict(fields) nhưng ghép từ các phần đã serialise sẵn (không parse/serialise template)"""
+        parts = []
+        for name in ('id', 'name', 'description', 'category', 'template', 'preview_image',
+                     'usage_count', 'features', 'popularity_badge'):
+            if fields is not None and name not in fields:
+                continue
+            if name == 'template':
+                value = self.template_raw
+            elif name == 'usage_count':
+                value = json.dumps(self.usage_total)
+            elif name == 'popularity_badge':
+                value = json.dumps(self.get_popularity_badge(), ensure_ascii=False)
+            else:
+                value = self._static_json[name]
+            parts.append(f'"{name}": {value}')
+        return '{' + ', '.join(parts) + '}'
+    
+    def __repr__(self):
+        return f'<TemplateEntry {self.id} v{self.version}>'
+
+
+class TemplateCatalog:
+    """Toàn bộ template theo một version của catalogue"""
+    
+    def __init__(self, version, entries):
+        self.version = version
+        self.entries = entries
+        self.by_id = {entry.id: entry for entry in entries}
+        self.categories = sorted({entry.category for entry in entries if entry.category})
+    
+    def get(self, template_id):
+        return self.by_id.get(template_id)
+    
+    def active(self, category=None):
+        """Các template đang hoạt động (lọc theo category nếu có)"""
+        return [
+            entry for entry in self.entries
+            if entry.is_active and (not category or category == 'all' or entry.category == category)
+        ]
+
+
+def _parse(raw, default):
+    try:
+        value = json.loads(raw) if raw else default
+    except (TypeError, ValueError):
+        return default
+    return value if isinstance(value, type(default)) else default
+
+
+def _load_catalog(connection, version):
+    table = CVTemplate.__table__
+    rows = connection.execute(db.select(table).order_by(table.c.id)).all()
+    return TemplateCatalog(version, [TemplateEntry(row) for row in rows])
+
+
+def get_catalog():
+    """Catalogue template hiện tại (read-through cache trong process).
+    
+    Mỗi request chỉ đọc khoá version trong app_state một lần; catalogue được nạp lại khi version đổi.
+    """
+    global _catalog
+    if has_app_context() and 'template_catalog' in g:
+        return g.template_catalog
+    
+    version = _read_version()
+    
+    catalog = _catalog
+    if catalog is None or version is None or catalog.version != version:
+        catalog = _load_catalog(db.session.connection(), version)
+        if version is not None:
+            _catalog = catalog
+    
+    if has_app_context():
+        g.template_catalog = catalog
+    return catalog
+
+
+def _read_version():
+    """Version hiện tại của catalogue, None nếu database chưa có bảng app_state (schema cũ)"""
+    global _state_available
+    if _state_available:
+        return get_state(db.session.connection(), CATALOG_VERSION_KEY, '')
+    
+    # Lần đầu đọc trong savepoint để lỗi thiếu bảng không làm hỏng transaction của request
+    try:
+        with db.session.begin_nested():
+            version = get_state(db.session.connection(), CATALOG_VERSION_KEY, '')
+    except (OperationalError, ProgrammingError):
+        return None
+    _state_available = True
+    return version
+
+
+def usage_counts():
+    """usage_count đã lưu của mọi template {id: số lượt}, đọc lại mỗi USAGE_REFRESH_INTERVAL"""
+    now = datetime.utcnow()
+    if _usage['loaded_at'] is None or now - _usage['loaded_at'] >= USAGE_REFRESH_INTERVAL:
+        table = CVTemplate.__table__
+        rows = db.session.execute(db.select(table.c.id, table.c.usage_count)).all()
+        _usage['counts'] = {row.id: row.usage_count or 0 for row in rows}
+        _usage['loaded_at'] = now
+    return _usage['counts']
+
+
+def invalidate_catalog(connection=None):
+    """Đổi version của catalogue (mọi worker sẽ nạp lại) và bỏ bản cache của process này"""
+    global _catalog
+    _catalog = None
+    if has_app_context():
+        g.pop('template_catalog', None)
+    if connection is not None:
+        set_state(connection, CATALOG_VERSION_KEY, uuid.uuid4().hex)
+
+
+@event.listens_for(CVTemplate, 'after_insert')
+@event.listens_for(CVTemplate, 'after_update')
+@event.listens_for(CVTemplate, 'after_delete')
+def _bump_catalog_version(mapper, connection, target):
+    """Mọi thay đổi template (trong cùng transaction) làm mất hiệu lực catalogue ở mọi worker"""
+    invalidate_catalog(connection)
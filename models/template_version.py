@@ -0,0 +1,171 @@
+from collections import OrderedDict
+from datetime import datetime
+from db import db
+from models.types import CompressedText
+from sqlalchemy.exc import OperationalError, ProgrammingError
+import hashlib
+import json
+import threading
+
+# Số snapshot (JSON) giữ trong bộ nhớ mỗi process; snapshot là bất biến nên không cần invalidate
+SNAPSHOT_CACHE_SIZE = 64
+
+# Số artifact (binding map, ảnh preview...) giữ trong bộ nhớ mỗi process
+ARTIFACT_CACHE_SIZE = 256
+
+_snapshots = OrderedDict()  # (template_id, version) -> JSON
+_artifacts = OrderedDict()  # (template_id, version, kind) -> artifact
+_lock = threading.Lock()
+_MISSING = object()
+
+
+class CVTemplateVersion(db.Model):
+    """Snapshot bất biến của một version template (ghi một lần khi version tăng, không bao giờ sửa)"""
+    __tablename__ = 'cv_template_versions'
+    
+    template_id = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False, index=True)  # sha256 của JSON template
+    template = db.deferred(db.Column(CompressedText()))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CVTemplateVersion {self.template_id} v{self.version}>'
+
+
+class CVTemplateArtifact(db.Model):
+    """Dữ liệu dựng sẵn từ một version template (ảnh preview...), dùng chung giữa các worker"""
+    __tablename__ = 'cv_template_artifacts'
+    
+    template_id = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), primary_key=True)  # Loại artifact, ví dụ 'preview.png'
+    data = db.deferred(db.Column(db.LargeBinary))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CVTemplateArtifact {self.template_id} v{self.version} {self.kind}>'
+
+
+def content_hash(raw):
+    return hashlib.sha256((raw or '').encode('utf-8')).hexdigest()
+
+
+def _insert_missing(connection, table, values, keys):
+    """INSERT một hàng nếu chưa có hàng cùng khoá (bỏ qua khi process khác vừa ghi)"""
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        connection.execute(insert(table).values(**values).on_conflict_do_nothing(index_elements=keys))
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        connection.execute(insert(table).values(**values).on_conflict_do_nothing(index_elements=keys))
+    else:
+        condition = db.and_(*(table.c[key] == values[key] for key in keys))
+        if connection.execute(db.select(table.c[keys[0]]).where(condition)).first() is None:
+            connection.execute(table.insert().values(**values))
+
+
+def _remember(cache, size, key, value):
+    with _lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > size:
+            cache.popitem(last=False)
+
+
+def snapshot_template(connection, template_id, version, raw):
+    """Lưu snapshot của version template (không ghi đè nếu đã có)"""
+    if not template_id or version is None or raw is None:
+        return
+    _insert_missing(connection, CVTemplateVersion.__table__, {
+        'template_id': template_id,
+        'version': version,
+        'content_hash': content_hash(raw),
+        'template': raw,
+        'created_at': datetime.utcnow()
+    }, ['template_id', 'version'])
+
+
+def load_template_version(connection, template_id, version):
+    """JSON của một version template, None nếu chưa có snapshot (cache trong process).
+    
+    Database chưa có bảng cv_template_versions (schema cũ) cũng trả về None.
+    """
+    if not template_id or version is None:
+        return None
+    key = (template_id, version)
+    raw = _snapshots.get(key)
+    if raw is None:
+        table = CVTemplateVersion.__table__
+        # Đọc trong savepoint để lỗi thiếu bảng không làm hỏng transaction đang chạy
+        try:
+            with connection.begin_nested():
+                raw = connection.execute(
+                    db.select(table.c.template).where(table.c.template_id == template_id, table.c.version == version)
+                ).scalar()
+        except (OperationalError, ProgrammingError):
+            return None
+        if raw is None:
+            return None
+        _remember(_snapshots, SNAPSHOT_CACHE_SIZE, key, raw)
+    return raw
+
+
+def _cached_artifact(key):
+    with _lock:
+        if key in _artifacts:
+            _artifacts.move_to_end(key)
+            return _artifacts[key]
+    return _MISSING
+
+
+def template_artifact(connection, template_id, version, kind, build):
+    """Artifact của một version template (cache trong process), build(template_data) chỉ chạy khi chưa có.
+    
+    Version là bất biến nên artifact không bao giờ cũ; None nếu version không có snapshot.
+    """
+    key = (template_id, version, kind)
+    artifact = _cached_artifact(key)
+    if artifact is not _MISSING:
+        return artifact
+    
+    raw = load_template_version(connection, template_id, version)
+    if raw is None:
+        return None
+    artifact = build(json.loads(raw))
+    _remember(_artifacts, ARTIFACT_CACHE_SIZE, key, artifact)
+    return artifact
+
+
+def stored_artifact(connection, template_id, version, kind, build):
+    """Artifact dạng bytes lưu trong bảng cv_template_artifacts (dùng chung giữa các worker và sau khi khởi động lại).
+    
+    Thứ tự đọc: cache trong process, bảng artifact, cuối cùng build(template_data) rồi lưu lại.
+    """
+    key = (template_id, version, kind)
+    data = _cached_artifact(key)
+    if data is not _MISSING:
+        return data
+    
+    table = CVTemplateArtifact.__table__
+    data = connection.execute(
+        db.select(table.c.data)
+        .where(table.c.template_id == template_id, table.c.version == version, table.c.kind == kind)
+    ).scalar()
+    if data is None:
+        raw = load_template_version(connection, template_id, version)
+        if raw is None:
+            return None
+        data = build(json.loads(raw))
+        _insert_missing(connection, table, {
+            'template_id': template_id,
+            'version': version,
+            'kind': kind,
+            'data': data,
+            'created_at': datetime.utcnow()
+        }, ['template_id', 'version', 'kind'])
+    
+    data = bytes(data)
+    _remember(_artifacts, ARTIFACT_CACHE_SIZE, key, data)
+    return data
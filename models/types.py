@@ -0,0 +1,166 @@
+import zlib
+
+from db import db
+
+try:
+    import zstandard
+except ImportError:  # zstd là tuỳ chọn, mặc định dùng zlib
+    zstandard = None
+
+# Giá trị nhỏ hơn ngưỡng này được lưu nguyên dạng UTF-8
+COMPRESSION_THRESHOLD = 512
+
+# Dữ liệu nén bắt đầu bằng byte 0x00 (JSON/text hợp lệ không bao giờ bắt đầu như vậy)
+# theo sau là 1 byte cho biết codec
+MARKER_PREFIX = b'\x00'
+MARKER_ZLIB = b'\x00z'
+MARKER_ZSTD = b'\x00s'
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+
+def preferred_codec():
+    """Codec dùng khi nén: zstd nếu đã cài zstandard, ngược lại zlib"""
+    return 'zstd' if zstandard is not None else 'zlib'
+
+
+def compress_text(text, threshold=COMPRESSION_THRESHOLD):
+    """Mã hoá text thành bytes, nén nếu lớn hơn ngưỡng và thực sự nhỏ đi"""
+    if text is None:
+        return None
+    
+    data = text.encode('utf-8')
+    if len(data) < threshold:
+        return data
+    
+    if zstandard is not None:
+        packed = MARKER_ZSTD + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    else:
+        packed = MARKER_ZLIB + zlib.compress(data, ZLIB_LEVEL)
+    
+    return packed if len(packed) < len(data) else data
+
+
+def decompress_value(value):
+    """Giải mã giá trị đọc từ DB: text cũ, bytes UTF-8 thô hoặc bytes đã nén"""
+    if value is None or isinstance(value, str):
+        return value
+    
+    data = bytes(value)
+    if not data.startswith(MARKER_PREFIX):
+        return data.decode('utf-8')
+    
+    marker, payload = data[:2], data[2:]
+    if marker == MARKER_ZLIB:
+        return zlib.decompress(payload).decode('utf-8')
+    if marker == MARKER_ZSTD:
+        if zstandard is None:
+            raise RuntimeError('Dữ liệu được nén bằng zstd nhưng chưa cài gói zstandard')
+        return zstandard.ZstdDecompressor().decompress(payload).decode('utf-8')
+    raise ValueError(f'Không nhận diện được định dạng nén {marker!r}')
+
+
+def stored_codec(value):
+    """Cho biết giá trị thô trong DB đang ở dạng nào: text, raw, zlib hoặc zstd"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return 'text'
+    data = bytes(value)
+    if data[:2] == MARKER_ZLIB:
+        return 'zlib'
+    if data[:2] == MARKER_ZSTD:
+        return 'zstd'
+    return 'raw'
+
+
+class CompressedText(db.TypeDecorator):
+    """Cột text được nén trong suốt khi lưu (zstd/zlib) nếu vượt ngưỡng kích thước.
+    
+    Phía Python luôn làm việc với str. Hàng cũ lưu dạng TEXT chưa nén vẫn đọc được.
+    """
+    impl = db.LargeBinary
+    cache_ok = True
+    
+    def __init__(self, threshold=COMPRESSION_THRESHOLD, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threshold = threshold
+    
+    def process_bind_param(self, value, dialect):
+        return compress_text(value, self.threshold)
+    
+    def process_result_value(self, value, dialect):
+        return decompress_value(value)
+
+
+def compressed_columns(metadata):
+    """Liệt kê (table, column) dùng kiểu CompressedText"""
+    return [
+        (table, column)
+        for table in metadata.sorted_tables
+        for column in table.columns
+        if isinstance(column.type, CompressedText)
+    ]
+
+
+def _iter_raw_batches(connection, table, column, batch_size):
+    """Đọc giá trị thô (chưa giải nén) theo lô, theo thứ tự khoá chính"""
+    pk = list(table.primary_key.columns)[0]
+    raw = db.type_coerce(column, db.LargeBinary).label('raw')
+    last = None
+    
+    while True:
+        query = db.select(pk.label('pk'), raw).where(column.isnot(None)).order_by(pk).limit(batch_size)
+        if last is not None:
+            query = query.where(pk > last)
+        rows = connection.execute(query).all()
+        if not rows:
+            break
+        yield pk, rows
+        last = rows[-1].pk
+
+
+def recompress_column(connection, table, column, batch_size=200, commit_each_batch=False):
+    """Mã hoá lại một cột theo cấu hình nén hiện tại, trả về (số hàng đã quét, số hàng đã ghi lại)"""
+    scanned = rewritten = 0
+    
+    for pk, rows in _iter_raw_batches(connection, table, column, batch_size):
+        params = []
+        for row in rows:
+            current = row.raw if isinstance(row.raw, str) else bytes(row.raw)
+            packed = compress_text(decompress_value(current), column.type.threshold)
+            if packed != current:
+                params.append({'_pk': row.pk, '_value': packed})
+        
+        if params:
+            connection.execute(
+                table.update()
+                .where(pk == db.bindparam('_pk'))
+                .values({column.name: db.type_coerce(db.bindparam('_value'), db.LargeBinary)}),
+                params
+            )
+            if commit_each_batch:
+                connection.commit()
+        
+        scanned += len(rows)
+        rewritten += len(params)
+    
+    return scanned, rewritten
+
+
+def column_compression_stats(connection, table, column, batch_size=200):
+    """Thống kê dung lượng lưu trữ và tỉ lệ nén của một cột"""
+    stats = {'rows': 0, 'stored_bytes': 0, 'raw_bytes': 0, 'codecs': {}}
+    
+    for _, rows in _iter_raw_batches(connection, table, column, batch_size):
+        for row in rows:
+            current = row.raw if isinstance(row.raw, str) else bytes(row.raw)
+            codec = stored_codec(current)
+            stats['rows'] += 1
+            stats['stored_bytes'] += len(current.encode('utf-8') if isinstance(current, str) else current)
+            stats['raw_bytes'] += len(decompress_value(current).encode('utf-8'))
+            stats['codecs'][codec] = stats['codecs'].get(codec, 0) + 1
+    
+    stats['ratio'] = round(stats['raw_bytes'] / stats['stored_bytes'], 2) if stats['stored_bytes'] else None
+    return stats
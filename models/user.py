@@ -3,6 +3,9 @@ from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 from db import db
+from models.cv import CV
+from sqlalchemy import event
+from sqlalchemy.orm import load_only
 
 class User(UserMixin, db.Model):
     """Model người dùng"""
@@ -14,9 +17,10 @@ class User(UserMixin, db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_login = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    session_version = db.Column(db.Integer, nullable=False, default=1)  # Tăng mỗi khi user được ghi (cache user_loader)
     
-    # Relationship với CV
-    cvs = db.relationship('CV', backref='user', lazy=True, cascade='all, delete-orphan')
+    # Relationship với CV (dạng query: đếm/sắp xếp/giới hạn trong SQL, không nạp toàn bộ CV)
+    cvs = db.relationship('CV', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     
     def set_password(self, password):
         """Mã hóa mật khẩu"""
@@ -26,15 +30,40 @@ class User(UserMixin, db.Model):
         """Kiểm tra mật khẩu"""
         return check_password_hash(self.password_hash, password)
     
+    def record(self):
+        """Bản ghi ORM để sửa (cùng giao diện với UserSnapshot)"""
+        return self
+    
     def get_cv_count(self):
-        """Đếm số CV của user"""
-        return len(self.cvs)
+        """Đếm số CV của user (COUNT trong SQL)"""
+        return count_cvs(self.cvs)
     
     def get_recent_cvs(self, limit=5):
-        """Lấy CV gần đây"""
-        return sorted(self.cvs, key=lambda x: x.updated_at, reverse=True)[:limit]
+        """Lấy CV gần đây (chỉ các cột của trang danh sách, không đọc content)"""
+        return recent_cvs(self.cvs, limit)
     
     def __repr__(self):
         return f'<User {self.username}>'
 
 
+def count_cvs(query):
+    """COUNT các CV của query (relationship User.cvs hoặc query lọc theo user_id)"""
+    return query.order_by(None).with_entities(db.func.count(CV.id)).scalar()
+
+
+def recent_cvs(query, limit):
+    """limit CV sửa gần nhất của query, chỉ các cột của trang danh sách"""
+    return (
+        query
+        .options(load_only(*CV.listing_columns()))
+        .order_by(CV.updated_at.desc(), CV.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+@event.listens_for(User, 'before_update')
+def _bump_session_version(mapper, connection, target):
+    """Mỗi lần ghi user (hồ sơ, mật khẩu, khoá tài khoản...) tăng session_version để các worker nạp lại user"""
+    if db.inspect(target).session.is_modified(target, include_collections=False):
+        target.session_version = (target.session_version or 0) + 1
@@ -0,0 +1,107 @@
+from collections import OrderedDict
+from db import db
+from flask import session
+from flask_login import UserMixin
+from models.cv import CV
+from models.user import User, count_cvs, recent_cvs
+from sqlalchemy import event
+import threading
+import time
+
+# Số giây một bản chụp user được dùng lại mà không đọc database (giới hạn độ trễ giữa các worker)
+USER_CACHE_TTL = 30
+
+# Số user giữ trong cache mỗi process
+USER_CACHE_SIZE = 1024
+
+# Khoá trong session Flask: session_version của user khi session được đóng dấu
+SESSION_VERSION_KEY = '_user_version'
+
+SNAPSHOT_FIELDS = ('id', 'username', 'email', 'phone', 'created_at', 'last_login', 'is_active', 'session_version')
+
+_cache = OrderedDict()  # user_id -> (thời điểm nạp, UserSnapshot)
+_lock = threading.Lock()
+
+
+class UserSnapshot(UserMixin):
+    """Bản chụp chỉ đọc của User dùng làm current_user (không gắn với session SQLAlchemy).
+    
+    Cần ghi thì lấy bản ghi ORM qua record().
+    """
+    
+    def __init__(self, user):
+        self.__dict__.update({name: getattr(user, name) for name in SNAPSHOT_FIELDS})
+    
+    def __setattr__(self, name, value):
+        raise AttributeError('UserSnapshot chỉ đọc, hãy ghi qua current_user.record()')
+    
+    @property
+    def is_active(self):
+        # UserMixin.is_active là property nên phải đọc trực tiếp giá trị đã chụp
+        return self.__dict__['is_active']
+    
+    def record(self):
+        """Bản ghi User (ORM) của user này để sửa/kiểm tra mật khẩu"""
+        return db.session.get(User, self.id)
+    
+    def get_cv_count(self):
+        """Đếm số CV của user (COUNT trong SQL)"""
+        return count_cvs(CV.query.filter(CV.user_id == self.id))
+    
+    def get_recent_cvs(self, limit=5):
+        """Lấy CV gần đây (chỉ các cột của trang danh sách, không đọc content)"""
+        return recent_cvs(CV.query.filter(CV.user_id == self.id), limit)
+    
+    def __repr__(self):
+        return f'<UserSnapshot {self.username} v{self.session_version}>'
+
+
+def load_user_snapshot(user_id):
+    """user_loader của Flask-Login: trả bản chụp trong cache nếu còn hạn và không cũ hơn session.
+    
+    Session được đóng dấu session_version của lần ghi user gần nhất (stamp_session), nên request
+    tới worker còn giữ bản cũ sẽ nạp lại ngay thay vì chờ hết TTL.
+    """
+    stamp = session.get(SESSION_VERSION_KEY)
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(user_id)
+        if entry is not None:
+            loaded_at, snapshot = entry
+            if now - loaded_at < USER_CACHE_TTL and (stamp is None or snapshot.session_version >= stamp):
+                _cache.move_to_end(user_id)
+                return snapshot
+    
+    user = db.session.get(User, user_id)
+    if user is None:
+        invalidate_user(user_id)
+        return None
+    
+    snapshot = UserSnapshot(user)
+    with _lock:
+        _cache[user_id] = (now, snapshot)
+        _cache.move_to_end(user_id)
+        while len(_cache) > USER_CACHE_SIZE:
+            _cache.popitem(last=False)
+    
+    if stamp != snapshot.session_version:
+        session[SESSION_VERSION_KEY] = snapshot.session_version
+    return snapshot
+
+
+def stamp_session(user):
+    """Ghi session_version hiện tại của user vào session (gọi sau khi đăng nhập hoặc ghi user)"""
+    session[SESSION_VERSION_KEY] = user.session_version
+
+
+def invalidate_user(user_id):
+    """Bỏ bản chụp của user khỏi cache của process này"""
+    with _lock:
+        _cache.pop(user_id, None)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_on_write(mapper, connection, target):
+    """User được ghi ở process này thì bỏ bản chụp ngay (worker khác: theo session_version hoặc TTL)"""
+    invalidate_user(target.id)
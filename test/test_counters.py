@@ -0,0 +1,65 @@
+import os
+import sys
+import tempfile
+
+# Add the parent directory to the Python path to import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('API_KEY', 'test')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'counters.db')
+
+import sqlalchemy as sa
+
+from app import create_app
+from counters import CounterBuffer
+from db import db
+
+app = create_app()
+app.config['TESTING'] = True
+
+metadata = sa.MetaData()
+
+
+class Hit:
+    """Bảng chỉ thêm chưa được tạo: mọi lần flush đều lỗi cho tới khi create_all"""
+    __table__ = sa.Table('counter_test_hits', metadata, sa.Column('id', sa.Integer, primary_key=True),
+                         sa.Column('name', sa.String(20)))
+
+
+def make_buffer(max_attempts):
+    buffer = CounterBuffer()
+    buffer.app = app
+    buffer.max_attempts = max_attempts
+    buffer._ensure_worker = lambda: None
+    return buffer
+
+
+def test_failed_batch_is_dropped_after_max_attempts():
+    """Lô ghi lỗi liên tục bị bỏ sau max_attempts lần; lô đến sau được đếm số lần thử riêng"""
+    buffer = make_buffer(3)
+    buffer.append(Hit, {'name': 'first'})
+    assert buffer.flush() == 0
+    buffer.append(Hit, {'name': 'second'})
+    assert buffer.flush() == 0
+    assert [len(rows) for _, _, rows in buffer._failed] == [1, 1]
+    
+    assert buffer.flush() == 0
+    assert [rows[0][1]['name'] for _, _, rows in buffer._failed] == ['second']
+    assert buffer.flush() == 0
+    assert buffer._failed == []
+
+
+def test_failed_batch_is_written_once_database_recovers():
+    """Lô chưa đủ số lần thử được ghi ở lần flush kế tiếp thành công"""
+    buffer = make_buffer(3)
+    buffer.append(Hit, {'name': 'retried'})
+    assert buffer.flush() == 0
+    
+    with app.app_context():
+        metadata.create_all(db.engine)
+    buffer.append(Hit, {'name': 'new'})
+    assert buffer.flush() == 2
+    assert buffer._failed == []
+    with app.app_context():
+        names = db.session.execute(sa.select(Hit.__table__.c.name).order_by(Hit.__table__.c.id)).scalars().all()
+    assert names == ['retried', 'new']
@@ -0,0 +1,79 @@
+import os
+import sys
+import tempfile
+
+# Add the parent directory to the Python path to import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('API_KEY', 'test')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'cv_revisions.db')
+
+from app import create_app
+from db import db
+from models import cv_revision
+from models.cv import CV
+from models.cv_revision import CVRevision, get_revision_content, record_revision
+
+app = create_app()
+app.config['TESTING'] = True
+
+
+def save(cv, full_name):
+    cv.set_content({'form_data': {'full_name': full_name}})
+    return record_revision(cv, source='form')
+
+
+def test_concurrent_save_takes_next_number(monkeypatch):
+    """Lần lưu khác vừa ghi số phiên bản kế tiếp: lần lưu này thử lại với số sau đó thay vì lỗi 500"""
+    with app.app_context():
+        cv = CV(title='Revisions', user_id=1)
+        db.session.add(cv)
+        save(cv, 'A')
+        db.session.commit()
+
+        first = cv.revisions.one()
+        # Một worker khác vừa ghi phiên bản 2; lần đọc đầu của lần lưu này vẫn thấy phiên bản 1
+        other = CV(title='Other', user_id=1)
+        other.set_content({'form_data': {'full_name': 'B'}})
+        db.session.execute(CVRevision.__table__.insert().values(
+            cv_id=cv.id, number=2, keyframe_number=2, is_keyframe=True, head_number=2,
+            data=cv_revision._snapshot_text(other.get_content()), size=0, source='form'
+        ))
+        latest_revision = cv_revision._latest_revision
+        reads = []
+
+        def stale_read(cv_id):
+            reads.append(cv_id)
+            return first if len(reads) == 1 else latest_revision(cv_id)
+
+        monkeypatch.setattr(cv_revision, '_latest_revision', stale_read)
+        revision = save(cv, 'C')
+        db.session.commit()
+
+        assert len(reads) == 2
+        assert revision.number == 3
+        assert get_revision_content(cv.id, 2)['form_data']['full_name'] == 'B'
+        assert get_revision_content(cv.id, 3)['form_data']['full_name'] == 'C'
+
+
+def test_delta_uses_cached_head_text(monkeypatch):
+    """Mỗi lần lưu tính delta từ bản đầy đủ cache trên keyframe, không dựng lại chuỗi delta"""
+    with app.app_context():
+        cv = CV(title='Cached head', user_id=1)
+        db.session.add(cv)
+        save(cv, 'Name 0')
+        db.session.commit()
+
+        def rebuild(cv_id, revision):
+            raise AssertionError('Không được dựng lại chuỗi delta khi lưu')
+
+        monkeypatch.setattr(cv_revision, '_revision_text', rebuild)
+        for i in range(1, 5):
+            save(cv, f'Name {i}')
+            db.session.commit()
+        monkeypatch.undo()
+
+        numbers = [revision.number for revision in cv.revisions.order_by(CVRevision.number)]
+        assert numbers == [1, 2, 3, 4, 5]
+        for i in range(5):
+            assert get_revision_content(cv.id, i + 1)['form_data']['full_name'] == f'Name {i}'
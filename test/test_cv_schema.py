@@ -0,0 +1,95 @@
+import os
+import sys
+
+# Add the parent directory to the Python path to import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.cv_schema import CONTENT_SCHEMA_VERSION, upgrade_content
+
+EMPTY_FORM = {
+    'full_name': '', 'position': '', 'email': '', 'phone': '', 'address': '', 'website': '', 'summary': '',
+    'experience': [], 'education': [], 'technical_skills': [], 'soft_skills': [], 'languages': [],
+}
+
+
+def form(**fields):
+    return {**EMPTY_FORM, **fields}
+
+
+def test_flat_form_is_wrapped_in_envelope():
+    """Version 1: form phẳng ở cấp trên cùng -> {'template_data', 'form_data'} đủ field"""
+    content = upgrade_content({
+        'full_name': 'Nguyễn Văn A',
+        'phone': 912345678,
+        'experience': [{'company': 'A', 'position': 'Dev'}],
+        'technical_skills': 'Python, SQL, ',
+    })
+    
+    assert content == {
+        'template_data': {},
+        'form_data': form(
+            full_name='Nguyễn Văn A',
+            phone='912345678',
+            experience=[{'company': 'A', 'position': 'Dev', 'start_date': '', 'end_date': '', 'description': ''}],
+            technical_skills=[{'name': 'Python', 'level': ''}, {'name': 'SQL', 'level': ''}],
+        ),
+    }
+
+
+def test_template_only_content():
+    """Version 1: CV canvas chỉ có template_data -> form_data rỗng đủ field"""
+    template_data = {'className': 'Stage', 'children': []}
+    content = upgrade_content({'template_data': template_data}, 1)
+    
+    assert content == {'template_data': template_data, 'form_data': form()}
+
+
+def test_parallel_arrays_are_merged():
+    """Version 2: mảng song song experience_*/education_* được gộp thành danh sách mục"""
+    content = upgrade_content({'template_data': {}, 'form_data': {
+        'experience_company': ['A', '', 'C'],
+        'experience_position': ['Dev', 'QA', 'Lead'],
+        'experience_start': ['2020', '2021'],
+        'experience_end': ['2021'],
+        'education_school': ['ĐH Bách Khoa'],
+        'education_degree': ['Kỹ sư'],
+    }}, 2)
+    
+    assert content['form_data'] == form(
+        experience=[
+            {'company': 'A', 'position': 'Dev', 'start_date': '2020', 'end_date': '2021', 'description': ''},
+            {'company': 'C', 'position': 'Lead', 'start_date': '', 'end_date': '', 'description': ''},
+        ],
+        education=[
+            {'school': 'ĐH Bách Khoa', 'degree': 'Kỹ sư', 'start_date': '', 'end_date': '', 'description': ''},
+        ],
+    )
+
+
+def test_names_levels_skills_are_paired():
+    """Version 2: kỹ năng dạng {'names', 'levels'} và mảng level song song -> [{'name', 'level'}]"""
+    content = upgrade_content({'template_data': {}, 'form_data': {
+        'technical_skills': {'names': ['Python', '', 'Go'], 'levels': ['Giỏi', 'Khá']},
+        'soft_skills': ['Giao tiếp', 'Làm việc nhóm'],
+        'soft_level': ['Tốt'],
+        'languages': [{'name': 'English', 'level': 'IELTS 7.0'}],
+    }}, 2)
+    
+    assert content['form_data'] == form(
+        technical_skills=[{'name': 'Python', 'level': 'Giỏi'}, {'name': 'Go', 'level': ''}],
+        soft_skills=[{'name': 'Giao tiếp', 'level': 'Tốt'}, {'name': 'Làm việc nhóm', 'level': ''}],
+        languages=[{'name': 'English', 'level': 'IELTS 7.0'}],
+    )
+
+
+def test_upgrade_is_idempotent_on_current_content():
+    """Content đã ở version hiện tại không đổi khi nâng lại (kể cả khi không rõ version)"""
+    current = upgrade_content({
+        'full_name': 'B',
+        'experience_company': ['A'],
+        'technical_skills': {'names': ['Python'], 'levels': ['Giỏi']},
+    })
+    
+    assert upgrade_content(current, CONTENT_SCHEMA_VERSION) == current
+    assert upgrade_content(current) == current
+    assert upgrade_content(upgrade_content(current)) == current
@@ -0,0 +1,48 @@
+import json
+import os
+import sys
+import tempfile
+
+# Add the parent directory to the Python path to import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('API_KEY', 'test')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'cv_template_version.db')
+
+from app import create_app
+from db import db
+from models.cv import CV, LAYOUT_OVERLAY
+from models.cv_template import CVTemplate
+
+app = create_app()
+app.config['TESTING'] = True
+
+
+def test_resave_after_template_bump_records_overlay_version():
+    """CV lưu lại sau khi template tăng version: template_version khớp version overlay được tính"""
+    with app.app_context():
+        template = db.session.get(CVTemplate, 'modern_complete')
+        base = template.get_template_data()
+        cv = CV(title='Template bump', user_id=1, template_id=template.id)
+        cv.set_template_data(base)
+        db.session.add(cv)
+        db.session.commit()
+        old_version = cv.template_version
+        assert old_version == template.version
+
+        bumped = json.loads(json.dumps(base))
+        bumped.setdefault('attrs', {})['name'] = 'bumped'
+        template.set_template_data(bumped)
+        db.session.commit()
+        assert template.version == old_version + 1
+
+        edited = json.loads(json.dumps(base))
+        edited['children'][0]['attrs']['edited'] = True
+        cv.set_template_data(edited)
+        db.session.commit()
+
+        assert cv.storage_layout == LAYOUT_OVERLAY
+        assert json.loads(cv.template_overlay)['version'] == template.version
+        assert cv.template_version == template.version
+        db.session.expire_all()
+        assert db.session.get(CV, cv.id).get_template_data() == edited
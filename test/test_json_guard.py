@@ -0,0 +1,103 @@
+import io
+import json
+import os
+import sys
+
+# Add the parent directory to the Python path to import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from flask import Flask
+
+from utils.json_guard import JSONPayloadError, JSONPayloadTooLarge, parse_json, read_request_json
+
+LIMITS = {'max_bytes': 1000, 'max_nodes': 50, 'max_depth': 5, 'max_text': 100}
+
+flask_app = Flask(__name__)
+
+
+def test_parses_within_limits():
+    """Payload trong giới hạn cho cùng kết quả với json.loads (chuỗi, bytes và stream)"""
+    document = {'attrs': {'x': 1.5, 'text': 'Nguyễn'}, 'children': [{'a': [1, None, True]}]}
+    raw = json.dumps(document, ensure_ascii=False)
+    for source in (raw, raw.encode('utf-8'), io.BytesIO(raw.encode('utf-8'))):
+        assert parse_json(source, **LIMITS) == document
+
+
+def test_byte_limit():
+    """Vượt max_bytes (tính theo bytes UTF-8, không theo ký tự) là 413"""
+    limits = dict(LIMITS, max_text=10000)
+    assert parse_json('"' + 'x' * 998 + '"', **limits) == 'x' * 998
+    with pytest.raises(JSONPayloadTooLarge):
+        parse_json('"' + 'x' * 999 + '"', **limits)
+    with pytest.raises(JSONPayloadTooLarge):
+        parse_json('"' + 'ễ' * 400 + '"', **limits)
+    with pytest.raises(JSONPayloadTooLarge):
+        parse_json(io.BytesIO(b'"' + b'x' * 2000 + b'"'), **limits)
+
+
+def test_node_limit():
+    """Số giá trị (object, array và phần tử) vượt max_nodes là 413"""
+    assert len(parse_json(json.dumps(list(range(49))), **LIMITS)) == 49
+    with pytest.raises(JSONPayloadTooLarge):
+        parse_json(json.dumps(list(range(50))), **LIMITS)
+    with pytest.raises(JSONPayloadTooLarge):
+        parse_json(json.dumps([{'a': i} for i in range(30)]), **LIMITS)
+
+
+def test_depth_limit():
+    """Lồng quá max_depth (object hoặc array) là 413, kể cả khi vượt giới hạn đệ quy của parser"""
+    assert parse_json('[[[[[1]]]]]', **LIMITS) == [[[[[1]]]]]
+    with pytest.raises(JSONPayloadTooLarge):
+        parse_json('[[[[[[1]]]]]]', **LIMITS)
+    with pytest.raises(JSONPayloadTooLarge):
+        parse_json('{"a": {"a": {"a": {"a": {"a": {"a": 1}}}}}}', **LIMITS)
+    with pytest.raises(JSONPayloadTooLarge):
+        parse_json('[' * 100000 + ']' * 100000, max_bytes=300000)
+
+
+def test_text_limit():
+    """Chuỗi giá trị dài quá max_text là 413"""
+    with pytest.raises(JSONPayloadTooLarge):
+        parse_json(json.dumps({'text': 'x' * 101}), **LIMITS)
+
+
+@pytest.mark.parametrize('raw', ['NaN', '[Infinity]', '{"x": -Infinity}'])
+def test_rejects_non_standard_constants(raw):
+    """NaN/Infinity không phải JSON chuẩn: 400"""
+    with pytest.raises(JSONPayloadError) as info:
+        parse_json(raw, **LIMITS)
+    assert info.value.status_code == 400
+
+
+@pytest.mark.parametrize('raw', [b'{"a":', b'{"a": "\xff"}', b'{"x": ' + b'9' * 5000 + b'}'])
+def test_invalid_json_is_400(raw):
+    """JSON hỏng, UTF-8 sai hay số quá dài: 400 (không phải 413)"""
+    with pytest.raises(JSONPayloadError) as info:
+        parse_json(raw, max_bytes=10000)
+    assert not isinstance(info.value, JSONPayloadTooLarge)
+    assert info.value.status_code == 400
+
+
+def read(data, content_type='application/json', **headers):
+    with flask_app.test_request_context('/', method='POST', data=data, content_type=content_type, headers=headers):
+        from flask import request
+        return read_request_json(request, LIMITS)
+
+
+def test_read_request_json_status_codes():
+    """read_request_json: lỗi định dạng/Content-Type là 400, vượt giới hạn là 413"""
+    assert read('{"a": [1, 2]}') == {'a': [1, 2]}
+    
+    cases = [
+        ({'data': '{"a": 1}', 'content_type': 'text/plain'}, 400),
+        ({'data': '{"a":'}, 400),
+        ({'data': 'NaN'}, 400),
+        ({'data': 'x' * 2000}, 413),
+        ({'data': json.dumps(list(range(100)))}, 413),
+        ({'data': '[' * 10 + ']' * 10}, 413),
+    ]
+    for kwargs, status in cases:
+        with pytest.raises(JSONPayloadError) as info:
+            read(**kwargs)
+        assert info.value.status_code == status, kwargs
@@ -0,0 +1,56 @@
+import json
+import os
+import sys
+
+# Add the parent directory to the Python path to import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from reportlab import rl_config
+
+from models.konva import canonicalize, expand_defaults
+from utils.pdf_generator import KonvaJSONToPDF
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'templates')
+
+with open(os.path.join(TEMPLATE_DIR, 'manifest.json'), encoding='utf-8') as f:
+    SEEDED = [entry['file'] for entry in json.load(f)['templates']]
+
+
+def load_template(file_name):
+    with open(os.path.join(TEMPLATE_DIR, file_name), encoding='utf-8') as f:
+        return json.load(f)['template_data']
+
+
+@pytest.fixture
+def render(tmp_path, monkeypatch):
+    """Bytes PDF của một cây Konva (invariant: không có ngày tạo/ID ngẫu nhiên, cùng nội dung cùng bytes)"""
+    monkeypatch.setattr(rl_config, 'invariant', 1)
+    
+    def render(document):
+        path = str(tmp_path / 'render.pdf')
+        KonvaJSONToPDF().convert_json_to_pdf(document, path)
+        with open(path, 'rb') as f:
+            return f.read()
+    return render
+
+
+@pytest.mark.parametrize('file_name', SEEDED)
+def test_canonical_round_trip_renders_the_same(file_name, render):
+    """expand_defaults(canonicalize(doc)) cho cùng PDF với doc, cả khi doc đã có đủ mặc định (như editor gửi về)"""
+    document = load_template(file_name)
+    expected = render(document)
+    
+    for source in (document, expand_defaults(document)):
+        stored = canonicalize(source)
+        assert render(stored) == expected
+        assert render(expand_defaults(stored)) == expected
+
+
+def test_render_comparison_detects_changes(render):
+    """So sánh bytes PDF thấy được thay đổi thật (toạ độ lệch nửa pixel)"""
+    document = load_template(SEEDED[0])
+    moved = canonicalize(document)
+    moved['children'][0]['children'][0]['attrs']['x'] = 0.5
+    
+    assert render(moved) != render(document)
@@ -0,0 +1,28 @@
+import os
+import sys
+from datetime import datetime
+
+# Add the parent directory to the Python path to import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from models.cv import CV
+from utils.pagination import keyset_slice
+
+
+@pytest.mark.parametrize('descending', [False, True])
+def test_keyset_slice_pages_through_null_sort_values(descending):
+    """Giá trị sắp xếp None (created_at trống) không làm các trang sau rỗng hay lặp lại"""
+    items = [(None if i % 3 == 0 else datetime(2026, 1, i + 1), i) for i in range(10)]
+
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = keyset_slice(items, lambda item: item, CV.created_at, descending, cursor, limit=2)
+        seen.extend(item_id for _, item_id in page)
+        if not cursor:
+            break
+
+    assert sorted(seen) == list(range(10))
+    assert len(seen) == len(set(seen))
@@ -0,0 +1,75 @@
+import os
+import sys
+import tempfile
+
+# Add the parent directory to the Python path to import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('API_KEY', 'test')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'query_counts.db')
+
+from sqlalchemy import event
+
+from app import create_app
+from db import db
+from models.cv import CV
+from models.user import User
+
+app = create_app()
+app.config['TESTING'] = True
+
+
+def count_statements(client, url):
+    """Đếm số câu SQL được chạy khi GET url"""
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    
+    assert response.status_code == 200
+    return len(statements)
+
+
+def add_cvs(user_id, count):
+    """Tạo thêm count CV cho user với các template khác nhau"""
+    template_ids = ['modern_complete', 'modern_green', 'modern_gray', 'custom_template']
+    with app.app_context():
+        for i in range(count):
+            cv = CV(title=f'CV {i}', user_id=user_id, template_id=template_ids[i % len(template_ids)])
+            cv.set_content({'form_data': {'full_name': f'Người dùng {i}', 'position': 'Developer'}})
+            cv.views = i
+            db.session.add(cv)
+        db.session.commit()
+
+
+def test_constant_statement_count():
+    """Số câu SQL của danh sách CV và dashboard không phụ thuộc số CV"""
+    with app.app_context():
+        user = User(username='query_counts', email='query_counts@example.com')
+        user.set_password('secret123')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    
+    client = app.test_client()
+    client.post('/login', data={'email': 'query_counts@example.com', 'password': 'secret123'})
+    
+    add_cvs(user_id, 2)
+    urls = ('/cv/list', '/dashboard', '/cv/list?search=Developer')
+    for url in urls:
+        # Nạp trước các cache trong process (catalogue template...)
+        client.get(url)
+    few = {url: count_statements(client, url) for url in urls}
+    
+    add_cvs(user_id, 30)
+    many = {url: count_statements(client, url) for url in few}
+    
+    assert few == many
@@ -0,0 +1,110 @@
+import os
+import sys
+import tempfile
+
+# Add the parent directory to the Python path to import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('API_KEY', 'test')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'query_plans.db')
+
+import pytest
+from flask_login import login_user
+from sqlalchemy import event, text
+
+from app import create_app
+from db import db
+from models.cv import CV
+from models.user import User
+from utils.cv_utils import get_cv_statistics
+from utils.pagination import encode_cursor
+from views.cv import CV_SORT_KEYS, _cv_listing_page, _cv_listing_query
+
+app = create_app()
+app.config['TESTING'] = True
+
+with app.app_context():
+    user = User(username='query_plans', email='query_plans@example.com')
+    user.set_password('secret123')
+    db.session.add(user)
+    db.session.commit()
+    USER_ID = user.id
+    
+    for i in range(200):
+        cv = CV(title=f'CV {i}', user_id=USER_ID if i % 4 == 0 else 1, template_id='modern_complete')
+        cv.set_content({'form_data': {'full_name': f'Người dùng {i}', 'position': 'Developer'}})
+        db.session.add(cv)
+    db.session.commit()
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+
+
+def capture_statements(action):
+    """Chạy action trong request của user và trả về các câu SELECT trên bảng cv (kèm tham số)"""
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and ' cv' in statement:
+            statements.append((statement, parameters))
+    
+    with app.test_request_context():
+        login_user(db.session.get(User, USER_ID))
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            action()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    
+    assert statements
+    return statements
+
+
+def query_plan(statement, parameters):
+    """Các dòng EXPLAIN QUERY PLAN của một câu lệnh"""
+    with app.app_context():
+        rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+    return [row[-1] for row in rows]
+
+
+def assert_indexed(statements):
+    """Bảng cv phải được đọc qua index (SEARCH) và không cần sắp xếp tạm"""
+    for statement, parameters in statements:
+        plan = query_plan(statement, parameters)
+        details = '\n'.join(plan)
+        assert not any(line.split()[:2] == ['SCAN', 'cv'] for line in plan), \
+            f'Quét toàn bảng cv:\n{statement}\n{details}'
+        assert not any('USE TEMP B-TREE' in line for line in plan), \
+            f'Sắp xếp tạm thay vì dùng index:\n{statement}\n{details}'
+
+
+@pytest.mark.parametrize('sort_by', sorted(CV_SORT_KEYS))
+@pytest.mark.parametrize('with_cursor', [False, True])
+def test_listing_uses_index(sort_by, with_cursor):
+    """Mỗi cách sắp xếp danh sách CV (trang đầu và trang sau) dùng index (user_id, cột sắp xếp)"""
+    sort_column, _ = CV_SORT_KEYS[sort_by]
+    
+    def action():
+        cursor = None
+        if with_cursor:
+            row = CV.query.filter_by(user_id=USER_ID).first()
+            cursor = encode_cursor(getattr(row, sort_column.key), row.id)
+        query, ranked_ids = _cv_listing_query('', '')
+        _cv_listing_page(query, ranked_ids, sort_by, cursor, 20)
+    
+    statements = capture_statements(action)
+    assert_indexed(statements[-1:])
+
+
+def test_single_cv_lookup_uses_primary_key():
+    """CV.query.filter_by(id=..., user_id=...) đọc theo khoá chính"""
+    statements = capture_statements(lambda: CV.query.filter_by(id=1, user_id=USER_ID).first())
+    assert_indexed(statements)
+
+
+def test_recent_cvs_and_statistics_use_index():
+    """CV gần đây và thống kê của dashboard không quét toàn bảng"""
+    def action():
+        db.session.get(User, USER_ID).get_recent_cvs(limit=3)
+        get_cv_statistics(CV, USER_ID)
+    
+    assert_indexed(capture_statements(action))
@@ -0,0 +1,99 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add the parent directory to the Python path to import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('API_KEY', 'test')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'concurrency.db')
+
+from sqlalchemy import text
+
+from app import create_app
+from db import db
+
+app = create_app()
+app.config['TESTING'] = True
+
+with app.app_context():
+    engine = db.engine
+
+with engine.begin() as connection:
+    connection.execute(text('CREATE TABLE IF NOT EXISTS concurrency_counter (id INTEGER PRIMARY KEY, value INTEGER)'))
+    connection.execute(text('INSERT OR REPLACE INTO concurrency_counter (id, value) VALUES (1, 0)'))
+
+
+def read_counter():
+    with engine.connect() as connection:
+        return connection.execute(text('SELECT value FROM concurrency_counter WHERE id = 1')).scalar()
+
+
+def test_sqlite_pragmas():
+    """Mỗi connection mới dùng WAL, synchronous=NORMAL và busy_timeout theo config"""
+    with engine.connect() as connection:
+        assert connection.execute(text('PRAGMA journal_mode')).scalar().lower() == 'wal'
+        assert connection.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+        assert connection.execute(text('PRAGMA busy_timeout')).scalar() == app.config['SQLITE_BUSY_TIMEOUT']
+        assert connection.execute(text('PRAGMA cache_size')).scalar() == -app.config['SQLITE_CACHE_SIZE']
+
+
+def test_readers_not_blocked_by_writer():
+    """Người đọc không phải chờ khi một transaction đang giữ khoá ghi (EXCLUSIVE chỉ chặn người đọc khi không dùng WAL)"""
+    locked = threading.Event()
+    release = threading.Event()
+    
+    def writer():
+        raw = engine.raw_connection()
+        try:
+            cursor = raw.driver_connection.cursor()
+            cursor.execute('BEGIN EXCLUSIVE')
+            cursor.execute('UPDATE concurrency_counter SET value = value + 1000 WHERE id = 1')
+            locked.set()
+            release.wait(10)
+            raw.driver_connection.rollback()
+        finally:
+            raw.close()
+    
+    before = read_counter()
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        assert locked.wait(10)
+        started = time.monotonic()
+        value = read_counter()
+        elapsed = time.monotonic() - started
+    finally:
+        release.set()
+        thread.join()
+    
+    # Đọc được ngay, thấy dữ liệu đã commit (không thấy thay đổi chưa commit)
+    assert value == before
+    assert elapsed < 1
+
+
+def test_concurrent_writers_do_not_fail():
+    """Nhiều thread cùng ghi: busy_timeout cho phép chờ lượt thay vì lỗi 'database is locked'"""
+    threads_count, writes = 8, 25
+    errors = []
+    before = read_counter()
+    
+    def worker():
+        try:
+            for _ in range(writes):
+                with engine.begin() as connection:
+                    connection.execute(text('UPDATE concurrency_counter SET value = value + 1 WHERE id = 1'))
+                read_counter()
+        except Exception as error:
+            errors.append(error)
+    
+    threads = [threading.Thread(target=worker) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert not errors
+    assert read_counter() == before + threads_count * writes
@@ -3,6 +3,7 @@ import json
 import copy
 from dotenv import load_dotenv
 from google.genai import Client
+from utils.cv_extract import extract_template_record
 
 class GeminiAI:
     def __init__(self):
@@ -18,115 +19,54 @@ class GeminiAI:
         # Initialize the client with API key
         self.client = Client(api_key=self.api_key)
     
-    def extract_text_from_json(self, data):
+    def extract_text_from_json(self, data, content_hash=None):
         """
         Extract text attributes from elements with className 'Text'
         
         Args:
             data: JSON data structure containing template_data
+            content_hash: CV content hash (reuse the cached extraction if given)
             
         Returns:
             dict: Dictionary with element IDs as keys and text content as values
         """
-        text_elements = {}
-        
-        def traverse_elements(element):
-            """Recursively traverse the JSON structure to find Text elements"""
-            if isinstance(element, dict):
-                # Check if this is a Text element
-                if element.get('className') == 'Text':
-                    attrs = element.get('attrs', {})
-                    element_id = attrs.get('id', 'unknown')
-                    text_content = attrs.get('text', '')
-                    text_elements[element_id] = text_content
-                
-                # Continue traversing children
-                if 'children' in element:
-                    for child in element['children']:
-                        traverse_elements(child)
-            
-            elif isinstance(element, list):
-                for item in element:
-                    traverse_elements(item)
-        
-        # Start traversal from template_data
-        if 'template_data' in data:
-            traverse_elements(data['template_data'])
-        
-        return text_elements
+        return dict(self.extract_text_with_ids(data, content_hash))
 
-    def extract_text_list_from_json(self, data):
+    def extract_text_list_from_json(self, data, content_hash=None):
         """
         Extract text attributes as a simple list
         
         Args:
             data: JSON data structure containing template_data
+            content_hash: CV content hash (reuse the cached extraction if given)
             
         Returns:
             list: List of text content from Text elements
         """
-        text_list = []
-        
-        def traverse_elements(element):
-            if isinstance(element, dict):
-                if element.get('className') == 'Text':
-                    attrs = element.get('attrs', {})
-                    text_content = attrs.get('text', '')
-                    if text_content:  # Only add non-empty text
-                        text_list.append(text_content)
-                
-                if 'children' in element:
-                    for child in element['children']:
-                        traverse_elements(child)
-            
-            elif isinstance(element, list):
-                for item in element:
-                    traverse_elements(item)
-        
-        if 'template_data' in data:
-            traverse_elements(data['template_data'])
-        
-        return text_list
+        return [text for _, text in self.extract_text_with_ids(data, content_hash) if text]
 
-    def extract_text_with_ids(self, data):
+    def extract_text_with_ids(self, data, content_hash=None):
         """
         Extract text attributes with their IDs as list of tuples
         
         Args:
             data: JSON data structure containing template_data
+            content_hash: CV content hash (reuse the cached extraction if given)
             
         Returns:
             list: List of tuples (id, text) from Text elements
         """
-        text_tuples = []
-        
-        def traverse_elements(element):
-            if isinstance(element, dict):
-                if element.get('className') == 'Text':
-                    attrs = element.get('attrs', {})
-                    element_id = attrs.get('id', 'unknown')
-                    text_content = attrs.get('text', '')
-                    text_tuples.append((element_id, text_content))
-                
-                if 'children' in element:
-                    for child in element['children']:
-                        traverse_elements(child)
-            
-            elif isinstance(element, list):
-                for item in element:
-                    traverse_elements(item)
-        
-        if 'template_data' in data:
-            traverse_elements(data['template_data'])
-        
-        return text_tuples
+        if 'template_data' not in data:
+            return []
+        return list(extract_template_record(data['template_data'], content_hash).texts)
     
-    def evaluate_cv(self, cv_data):
+    def evaluate_cv(self, cv_data, content_hash=None):
         """
         Evaluate a CV using Gemini AI
         
         Args:
             cv_data: JSON data structure containing CV information
+            content_hash: CV content hash (reuse the cached extraction if given)
             
         Returns:
             dict: Evaluation result with scores and suggestions
@@ -134,7 +74,7 @@ class GeminiAI:
         try:
             # Extract text content from CV
             # text_elements = self.extract_text_from_json(cv_data)
-            text_list = self.extract_text_list_from_json(cv_data)
+            text_list = self.extract_text_list_from_json(cv_data, content_hash)
             
             # Combine all text content
             cv_content = "\n".join(text_list)
@@ -354,20 +294,21 @@ class GeminiAI:
             print(f"Nội dung mới: {element['new_text']}")
             print("-" * 40)
     
-    def translate_text(self, cv_data, target_language='vi'):
+    def translate_text(self, cv_data, target_language='vi', content_hash=None):
         """
         Dịch văn bản sang ngôn ngữ đích sử dụng Gemini AI
         
         Args:
             cv_data: JSON data structure containing CV information
             target_language (str): Mã ngôn ngữ đích (mặc định là 'vi' cho tiếng Việt)
+            content_hash: Hash content của CV (dùng lại kết quả trích xuất đã cache nếu có)
         
         Returns:
             dict: Dữ liệu JSON đã được cập nhật với nội dung đã dịch
         """
         try:
             # Trích xuất text elements với IDs
-            text_tuples = self.extract_text_with_ids(cv_data)
+            text_tuples = self.extract_text_with_ids(cv_data, content_hash)
             
             if not text_tuples:
                 return cv_data  # Trả về dữ liệu gốc nếu không có text để dịch
@@ -0,0 +1,198 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+import copy
+import re
+
+from models.cv_template import load_base_template
+from models.template_version import template_artifact
+from utils.cv_extract import ENTRY_SECTIONS, classify_element_id
+
+# {{full_name}}, {{technical_skills[0]}}, {{experience[1].company}}
+_PLACEHOLDER = re.compile(r'\{\{\s*(\w+)(?:\[(\d+)\])?(?:\.(\w+))?\s*\}\}')
+
+# Field được ghép bằng dấu phẩy khi giá trị là danh sách (element tech_skills_list...)
+LIST_SEPARATOR = ', '
+
+# Loại artifact của BindingMap trong cache theo version template
+BINDINGS_ARTIFACT = 'bindings'
+
+
+@dataclass
+class NodeBinding:
+    """Cách tạo text của một element: các phần chữ cố định xen với đường dẫn field của form"""
+    attr: str
+    pieces: Tuple  # str hoặc tuple đường dẫn field, ví dụ ('experience', 0, 'company')
+    trim_range: bool = False  # Bỏ ' - ' thừa khi thiếu ngày bắt đầu/kết thúc
+    placeholder: bool = False  # Tạo từ placeholder trong template (không phải từ quy ước id)
+    
+    @property
+    def paths(self):
+        return [piece for piece in self.pieces if isinstance(piece, tuple)]
+
+
+@dataclass
+class BindingMap:
+    """Binding của một template: element id -> NodeBinding và field form -> các element id"""
+    nodes: Dict[str, NodeBinding] = field(default_factory=dict)
+    fields: Dict[Tuple, List[str]] = field(default_factory=dict)  # đường dẫn field -> element id
+    by_name: Dict[str, List[str]] = field(default_factory=dict)  # field cấp trên cùng -> element id
+    
+    def bind(self, node_id, binding):
+        self.nodes[node_id] = binding
+        for path in binding.paths:
+            self.fields.setdefault(path, []).append(node_id)
+            names = self.by_name.setdefault(path[0], [])
+            if node_id not in names:
+                names.append(node_id)
+
+
+def compile_pattern(text):
+    """Text có placeholder -> các phần (chữ cố định, đường dẫn field), None nếu không có placeholder"""
+    if not isinstance(text, str) or '{{' not in text:
+        return None
+    pieces = []
+    position = 0
+    for match in _PLACEHOLDER.finditer(text):
+        if match.start() > position:
+            pieces.append(text[position:match.start()])
+        name, index, attribute = match.groups()
+        path = (name,)
+        if index is not None:
+            path += (int(index),)
+        if attribute:
+            path += (attribute,)
+        pieces.append(path)
+        position = match.end()
+    if not any(isinstance(piece, tuple) for piece in pieces):
+        return None
+    if position < len(text):
+        pieces.append(text[position:])
+    return tuple(pieces)
+
+
+def convention_binding(element_id):
+    """Binding suy ra từ quy ước đặt id (exp2_company, tech_skill_3, email...), None nếu id không theo quy ước"""
+    kind = classify_element_id(element_id)
+    if kind[0] == 'field':
+        icon = f'{kind[2]} ' if kind[2] else ''
+        return NodeBinding('text', (icon, (kind[1],)) if icon else ((kind[1],),))
+    if kind[0] == 'entry':
+        section = ENTRY_SECTIONS[kind[1]][0]
+        if kind[3] == 'date':
+            return NodeBinding('text', ((section, kind[2], 'start_date'), ' - ', (section, kind[2], 'end_date')), True)
+        return NodeBinding('text', ((section, kind[2], kind[3]),))
+    if kind[0] == 'item':
+        return NodeBinding('text', ((kind[1], kind[2]),))
+    if kind[0] == 'list':
+        return NodeBinding('text', ((kind[1],),))
+    return None
+
+
+def _text_nodes(document):
+    """Các element Text có id trong cây Konva (duyệt một lần)"""
+    stack = [document] if isinstance(document, dict) else []
+    while stack:
+        node = stack.pop()
+        children = node.get('children')
+        if children:
+            stack.extend(child for child in reversed(children) if isinstance(child, dict))
+        attrs = node.get('attrs')
+        if node.get('className') == 'Text' and isinstance(attrs, dict) and isinstance(attrs.get('id'), str):
+            yield attrs['id'], attrs
+
+
+def compile_bindings(template_data):
+    """Compile template thành BindingMap: placeholder trong text được ưu tiên, sau đó tới quy ước id"""
+    bindings = BindingMap()
+    for node_id, attrs in _text_nodes(template_data):
+        pieces = compile_pattern(attrs.get('text'))
+        if pieces:
+            trim_range = any(path[-1] in ('start_date', 'end_date') for path in pieces if isinstance(path, tuple))
+            binding = NodeBinding('text', pieces, trim_range, placeholder=True)
+        else:
+            binding = convention_binding(node_id)
+        if binding:
+            bindings.bind(node_id, binding)
+    return bindings
+
+
+def template_bindings(connection, template_id, version=None):
+    """BindingMap của một version template (mặc định version hiện tại), compile một lần cho mỗi version.
+    
+    None nếu template không tồn tại hoặc version không có snapshot.
+    """
+    if version is None:
+        version, _ = load_base_template(connection, template_id)
+    if version is None:
+        return None
+    return template_artifact(connection, template_id, version, BINDINGS_ARTIFACT, compile_bindings)
+
+
+def _resolve(data, path):
+    value = data
+    for step in path:
+        if isinstance(step, int):
+            value = value[step] if isinstance(value, list) and step < len(value) else None
+        else:
+            value = value.get(step) if isinstance(value, dict) else None
+        if value is None:
+            return ''
+    if isinstance(value, list):
+        return LIST_SEPARATOR.join(filter(None, (_item_text(item) for item in value)))
+    return _item_text(value)
+
+
+def _item_text(value):
+    """Giá trị hiển thị của một mục (kỹ năng dạng {'name', 'level'} chỉ lấy tên)"""
+    if isinstance(value, dict):
+        return str(value.get('name') or '')
+    return str(value)
+
+
+def render_binding(binding, data, fill_empty=False):
+    """Text của element theo form data; None nếu mọi field đều rỗng (giữ nguyên text hiện tại).
+    
+    fill_empty: vẫn thay placeholder bằng chuỗi rỗng khi không có dữ liệu.
+    """
+    values = {path: _resolve(data, path) for path in binding.paths}
+    if not (fill_empty and binding.placeholder) and not any(values.values()):
+        return None
+    text = ''.join(values[piece] if isinstance(piece, tuple) else piece for piece in binding.pieces)
+    return text.strip(' -') if binding.trim_range else text
+
+
+def apply_bindings(document, bindings, data, names=None, fill_empty=False):
+    """Ghi form data vào document (cây Konva, sửa tại chỗ) theo BindingMap.
+    
+    Chỉ duyệt document một lần để lập chỉ mục element theo id, sau đó mỗi field được ghi trực tiếp
+    vào các element của nó. names: các field cấp trên cùng cần ghi (mặc định mọi field trong data).
+    Element có id theo quy ước nhưng không có trong BindingMap (CV thêm element sau) cũng được ghi.
+    """
+    nodes = {}
+    extra = BindingMap()
+    for node_id, attrs in _text_nodes(document):
+        nodes.setdefault(node_id, attrs)
+        if node_id not in bindings.nodes:
+            binding = convention_binding(node_id)
+            if binding:
+                extra.bind(node_id, binding)
+    
+    if names is None:
+        # Khi điền template mới, placeholder của field không có trong data cũng được thay bằng chuỗi rỗng
+        names = list(data) + [name for name in bindings.by_name if name not in data] if fill_empty else data
+    for name in names:
+        for source in (bindings, extra):
+            for node_id in source.by_name.get(name, ()):
+                attrs = nodes.get(node_id)
+                if attrs is None:
+                    continue
+                binding = source.nodes[node_id]
+                text = render_binding(binding, data, fill_empty)
+                if text is not None:
+                    attrs[binding.attr] = text
+    return document
+
+
+def fill_template(template_data, bindings, data):
+    """Bản sao template với mọi placeholder được thay bằng form data (CV mới tạo từ template)"""
+    return apply_bindings(copy.deepcopy(template_data), bindings, data, fill_empty=True)
@@ -0,0 +1,210 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+import copy
+import re
+import threading
+
+# Số bản trích xuất giữ trong cache mỗi process (theo content_hash của CV)
+EXTRACT_CACHE_SIZE = 256
+
+# Bỏ qua các id có số thứ tự lớn hơn giá trị này (exp999_position...) để không tạo danh sách khổng lồ
+MAX_SLOT_INDEX = 100
+
+# Các element id giữ nguyên tên field (icon phía trước được bỏ đi)
+SIMPLE_FIELDS = {
+    'full_name': '',
+    'position': '',
+    'email': '✉',
+    'phone': '📞',
+    'address': '📍',
+    'website': '',
+    'summary': '',
+}
+
+# exp1_position, edu2_school... -> (section, số thứ tự, field)
+_ENTRY_ID = re.compile(r'(exp|edu)(\d+)_([a-z_]+)$')
+# tech_skill_1, soft_skill_2, language_3 -> (danh sách, số thứ tự)
+_ITEM_ID = re.compile(r'(tech_skill|soft_skill|language)_(\d+)$')
+_PLACEHOLDER = re.compile(r'\{\{[^{}]*\}\}')
+_DATE_SEPARATOR = re.compile(r'(?:^|\s+)-(?:\s+|$)')
+
+ENTRY_SECTIONS = {
+    'exp': ('experience', ('company', 'position', 'start_date', 'end_date', 'description')),
+    'edu': ('education', ('school', 'degree', 'start_date', 'end_date', 'description')),
+}
+ITEM_LISTS = {
+    'tech_skill': 'technical_skills',
+    'soft_skill': 'soft_skills',
+    'language': 'languages',
+}
+# Element chứa cả danh sách (phân cách bởi dấu phẩy), chỉ dùng khi không có element từng mục
+LIST_IDS = {
+    'tech_skills_list': 'technical_skills',
+    'technical_skills': 'technical_skills',
+    'soft_skills_list': 'soft_skills',
+    'soft_skills': 'soft_skills',
+    'languages_list': 'languages',
+}
+
+# Số element id được ghi nhớ cách phân loại (id do template quyết định nên số lượng ít)
+ID_KINDS_SIZE = 4096
+
+_cache = OrderedDict()  # content_hash -> CVRecord
+_id_kinds = {}  # element id -> (loại, tham số...)
+_lock = threading.Lock()
+
+
+@dataclass
+class CVRecord:
+    """Dữ liệu CV trích xuất từ template_data (chỉ đọc, có thể được dùng chung qua cache)"""
+    full_name: str = ''
+    position: str = ''
+    email: str = ''
+    phone: str = ''
+    address: str = ''
+    website: str = ''
+    summary: str = ''
+    experience: List[Dict[str, str]] = field(default_factory=list)
+    education: List[Dict[str, str]] = field(default_factory=list)
+    technical_skills: List[str] = field(default_factory=list)
+    soft_skills: List[str] = field(default_factory=list)
+    languages: List[str] = field(default_factory=list)
+    texts: Tuple[Tuple[str, str], ...] = ()  # (id, text) của mọi element Text theo thứ tự trong cây
+    
+    def to_dict(self):
+        """Các field dạng dict giống form_data (bản sao, người gọi được phép sửa)"""
+        return {
+            name: copy.deepcopy(getattr(self, name))
+            for name in (*SIMPLE_FIELDS, 'experience', 'education', 'technical_skills', 'soft_skills', 'languages')
+        }
+
+
+def _clean(text, icon=''):
+    """Bỏ placeholder chưa được thay ({{...}}) và icon phía trước"""
+    if '{{' in text:
+        text = _PLACEHOLDER.sub('', text)
+    if icon:
+        text = text.replace(icon, '', 1)
+    return text.strip()
+
+
+def _slot(index):
+    """Số thứ tự (bắt đầu từ 1) -> index trong danh sách, None nếu không hợp lệ"""
+    index = int(index)
+    return index - 1 if 1 <= index <= MAX_SLOT_INDEX else None
+
+
+def classify_element_id(element_id):
+    """Phân loại element id: ('field', tên, icon), ('entry', section, index, field), ('item', danh sách, index),
+    ('list', danh sách) hoặc ('none',). Chỉ chạy regex một lần cho mỗi id, kết quả được ghi nhớ.
+    """
+    kind = _id_kinds.get(element_id)
+    if kind is not None:
+        return kind
+    
+    if element_id in SIMPLE_FIELDS:
+        kind = ('field', element_id, SIMPLE_FIELDS[element_id])
+    elif element_id in LIST_IDS:
+        kind = ('list', LIST_IDS[element_id])
+    else:
+        kind = ('none',)
+        match = _ENTRY_ID.match(element_id)
+        if match:
+            section, index, name = match.groups()
+            index = _slot(index)
+            if index is not None and (name == 'date' or name in ENTRY_SECTIONS[section][1]):
+                kind = ('entry', section, index, name)
+        else:
+            match = _ITEM_ID.match(element_id)
+            if match and _slot(match.group(2)) is not None:
+                kind = ('item', ITEM_LISTS[match.group(1)], _slot(match.group(2)))
+    
+    if len(_id_kinds) < ID_KINDS_SIZE:
+        _id_kinds[element_id] = kind
+    return kind
+
+
+def scan_template(template_data):
+    """Duyệt toàn bộ cây Konva một lần, phân loại element Text theo id vào CVRecord"""
+    record = CVRecord()
+    texts = []
+    entries = {'exp': {}, 'edu': {}}  # section -> {index: {field: text}}
+    items = {name: {} for name in ITEM_LISTS.values()}  # danh sách -> {index: text}
+    lists = {}
+    
+    stack = [template_data] if isinstance(template_data, dict) else []
+    while stack:
+        node = stack.pop()
+        children = node.get('children')
+        if children:
+            stack.extend(child for child in reversed(children) if isinstance(child, dict))
+        if node.get('className') != 'Text':
+            continue
+        
+        attrs = node.get('attrs')
+        attrs = attrs if isinstance(attrs, dict) else {}
+        element_id = attrs.get('id', 'unknown')
+        text = attrs.get('text', '')
+        texts.append((element_id, text))
+        if not isinstance(element_id, str) or not isinstance(text, str):
+            continue
+        
+        kind = _id_kinds.get(element_id) or classify_element_id(element_id)
+        if kind[0] == 'field':
+            setattr(record, kind[1], _clean(text, kind[2]))
+        elif kind[0] == 'entry':
+            entry = entries[kind[1]].setdefault(kind[2], {})
+            if kind[3] == 'date':
+                dates = _DATE_SEPARATOR.split(_clean(text), 1)
+                entry['start_date'] = dates[0].strip()
+                entry['end_date'] = dates[1].strip() if len(dates) > 1 else ''
+            else:
+                entry[kind[3]] = _clean(text)
+        elif kind[0] == 'item':
+            items[kind[1]][kind[2]] = _clean(text).lstrip('•').strip()
+        elif kind[0] == 'list':
+            lists[kind[1]] = _clean(text)
+    
+    for section, (attribute, names) in ENTRY_SECTIONS.items():
+        slots = entries[section]
+        values = []
+        for index in sorted(slots):
+            entry = dict.fromkeys(names, '')
+            entry.update(slots[index])
+            if any(entry.values()):
+                values.append(entry)
+        setattr(record, attribute, values)
+    
+    for attribute, slots in items.items():
+        values = [slots[index] for index in sorted(slots) if slots[index]]
+        if not values and lists.get(attribute):
+            values = [value.strip() for value in lists[attribute].split(',') if value.strip()]
+        setattr(record, attribute, values)
+    
+    record.texts = tuple(texts)
+    return record
+
+
+def extract_template_record(template_data, content_hash=None):
+    """CVRecord của template_data, dùng lại bản trong cache nếu cùng content_hash.
+    
+    content_hash là hash content của CV (đổi mỗi khi template_data hoặc form_data đổi),
+    không truyền thì luôn duyệt lại cây.
+    """
+    if content_hash:
+        with _lock:
+            record = _cache.get(content_hash)
+            if record is not None:
+                _cache.move_to_end(content_hash)
+                return record
+    
+    record = scan_template(template_data)
+    
+    if content_hash:
+        with _lock:
+            _cache[content_hash] = record
+            _cache.move_to_end(content_hash)
+            while len(_cache) > EXTRACT_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return record
@@ -1,5 +1,10 @@
 from datetime import datetime
 from typing import Dict, List, Any, Optional
+from db import db
+from sqlalchemy import func
+from models.cv_schema import ENTRY_FIELDS, ITEM_FIELDS, TEXT_FIELDS, has_form_data
+from utils.cv_bindings import BindingMap, apply_bindings, compile_bindings, fill_template
+from utils.cv_extract import extract_template_record
 import copy
 import re
 
@@ -7,16 +12,9 @@ import re
 class CVDataUpdater:
     """Class để cập nhật dữ liệu CV từ form input"""
     
-    def __init__(self):
-        # Mapping giữa form fields và template element IDs
-        self.field_mappings = {
-            'full_name': {'id': 'full_name', 'key': 'text'},
-            'position': {'id': 'position', 'key': 'text'},
-            'email': {'id': 'email', 'key': 'text'},
-            'phone': {'id': 'phone', 'key': 'text'},
-            'address': {'id': 'address', 'key': 'text'},
-            'summary': {'id': 'summary', 'key': 'text'},
-        }
+    def __init__(self, bindings=None):
+        # BindingMap của template gốc (field form -> element id); None thì chỉ dùng quy ước đặt id
+        self.bindings = bindings or BindingMap()
     
     def find_element_by_id(self, data: Dict, target_id: str) -> Optional[Dict]:
         """Tìm element theo ID trong template data"""
@@ -40,10 +38,7 @@ class CVDataUpdater:
         updated_data = copy.deepcopy(cv_data)
         
         # Cập nhật form_data
-        form_data = updated_data.get('form_data', {})
-        for key, value in form_updates.items():
-            form_data[key] = value
-        updated_data['form_data'] = form_data
+        updated_data['form_data'].update(form_updates)
         
         # Cập nhật template_data dựa trên form_data mới
         self._update_template_from_form_data(updated_data)
@@ -51,167 +46,8 @@ class CVDataUpdater:
         return updated_data
     
     def _update_template_from_form_data(self, data: Dict) -> None:
-        """Cập nhật template_data dựa trên form_data"""
-        form_data = data.get('form_data', {})
-        
-        # Cập nhật các field đơn giản
-        self._update_simple_fields(data, form_data)
-        
-        # Cập nhật các sections phức tạp
-        self._update_experience_section(data, form_data)
-        self._update_education_section(data, form_data)
-        self._update_skills_section(data, form_data)
-        self._update_languages_section(data, form_data)
-    
-    def _update_simple_fields(self, data: Dict, form_data: Dict) -> None:
-        """Cập nhật các field đơn giản"""
-        # Cập nhật các field đơn giản
-        simple_fields = ['full_name', 'position', 'summary']
-        for field in simple_fields:
-            if field in form_data and form_data[field]:
-                element = self.find_element_by_id(data, field)
-                if element and 'attrs' in element:
-                    element['attrs']['text'] = form_data[field]
-        
-        # Cập nhật email với icon
-        if 'email' in form_data and form_data['email']:
-            element = self.find_element_by_id(data, 'email')
-            if element and 'attrs' in element:
-                element['attrs']['text'] = f"✉ {form_data['email']}"
-        
-        # Cập nhật phone với icon
-        if 'phone' in form_data and form_data['phone']:
-            element = self.find_element_by_id(data, 'phone')
-            if element and 'attrs' in element:
-                element['attrs']['text'] = f"📞 {form_data['phone']}"
-        
-        # Cập nhật address với icon
-        if 'address' in form_data and form_data['address']:
-            element = self.find_element_by_id(data, 'address')
-            if element and 'attrs' in element:
-                element['attrs']['text'] = f"📍 {form_data['address']}"
-    
-    def _update_experience_section(self, data: Dict, form_data: Dict) -> None:
-        """Cập nhật section kinh nghiệm làm việc"""
-        experiences = form_data.get('experience', [])
-        
-        for i, exp in enumerate(experiences):
-            if not exp:
-                continue
-                
-            exp_num = i + 1
-            
-            # Cập nhật position
-            if exp.get('position'):
-                element = self.find_element_by_id(data, f'exp{exp_num}_position')
-                if element and 'attrs' in element:
-                    element['attrs']['text'] = exp['position']
-            
-            # Cập nhật company
-            if exp.get('company'):
-                element = self.find_element_by_id(data, f'exp{exp_num}_company')
-                if element and 'attrs' in element:
-                    element['attrs']['text'] = exp['company']
-            
-            # Cập nhật date range
-            start_date = exp.get('start_date', '')
-            end_date = exp.get('end_date', '')
-            if start_date or end_date:
-                element = self.find_element_by_id(data, f'exp{exp_num}_date')
-                if element and 'attrs' in element:
-                    element['attrs']['text'] = f"{start_date} - {end_date}".strip(' -')
-            
-            # Cập nhật description
-            if exp.get('description'):
-                element = self.find_element_by_id(data, f'exp{exp_num}_description')
-                if element and 'attrs' in element:
-                    element['attrs']['text'] = exp['description']
-    
-    def _update_education_section(self, data: Dict, form_data: Dict) -> None:
-        """Cập nhật section học vấn"""
-        educations = form_data.get('education', [])
-        
-        for i, edu in enumerate(educations):
-            if not edu:
-                continue
-                
-            edu_num = i + 1
-            
-            # Cập nhật degree
-            if edu.get('degree'):
-                element = self.find_element_by_id(data, f'edu{edu_num}_degree')
-                if element and 'attrs' in element:
-                    element['attrs']['text'] = edu['degree']
-            
-            # Cập nhật school
-            if edu.get('school'):
-                element = self.find_element_by_id(data, f'edu{edu_num}_school')
-                if element and 'attrs' in element:
-                    element['attrs']['text'] = edu['school']
-            
-            # Cập nhật date range
-            start_date = edu.get('start_date', '')
-            end_date = edu.get('end_date', '')
-            if start_date or end_date:
-                element = self.find_element_by_id(data, f'edu{edu_num}_date')
-                if element and 'attrs' in element:
-                    element['attrs']['text'] = f"{start_date} - {end_date}".strip(' -')
-            
-            # Cập nhật description
-            if edu.get('description'):
-                element = self.find_element_by_id(data, f'edu{edu_num}_description')
-                if element and 'attrs' in element:
-                    element['attrs']['text'] = edu['description']
-    
-    def _update_skills_section(self, data: Dict, form_data: Dict) -> None:
-        """Cập nhật section kỹ năng"""
-        # Technical skills
-        technical_skills = form_data.get('technical_skills', [])
-        if technical_skills:
-            # Cập nhật danh sách tổng hợp
-            element = (self.find_element_by_id(data, 'tech_skills_list') or 
-                      self.find_element_by_id(data, 'technical_skills'))
-            if element and 'attrs' in element:
-                element['attrs']['text'] = ', '.join(technical_skills)
-            
-            # Cập nhật từng skill riêng lẻ
-            for i, skill in enumerate(technical_skills[:5]):  # Giới hạn 5 skills
-                skill_num = i + 1
-                element = self.find_element_by_id(data, f'tech_skill_{skill_num}')
-                if element and 'attrs' in element:
-                    element['attrs']['text'] = skill
-        
-        # Soft skills
-        soft_skills = form_data.get('soft_skills', [])
-        if soft_skills:
-            # Cập nhật danh sách tổng hợp
-            element = (self.find_element_by_id(data, 'soft_skills_list') or 
-                      self.find_element_by_id(data, 'soft_skills'))
-            if element and 'attrs' in element:
-                element['attrs']['text'] = ', '.join(soft_skills)
-            
-            # Cập nhật từng skill riêng lẻ
-            for i, skill in enumerate(soft_skills[:5]):  # Giới hạn 5 skills
-                skill_num = i + 1
-                element = self.find_element_by_id(data, f'soft_skill_{skill_num}')
-                if element and 'attrs' in element:
-                    element['attrs']['text'] = skill
-    
-    def _update_languages_section(self, data: Dict, form_data: Dict) -> None:
-        """Cập nhật section ngôn ngữ"""
-        languages = form_data.get('languages', [])
-        if languages:
-            # Cập nhật danh sách tổng hợp
-            element = self.find_element_by_id(data, 'languages_list')
-            if element and 'attrs' in element:
-                element['attrs']['text'] = ', '.join(languages)
-            
-            # Cập nhật từng ngôn ngữ riêng lẻ
-            for i, lang in enumerate(languages[:5]):  # Giới hạn 5 ngôn ngữ
-                lang_num = i + 1
-                element = self.find_element_by_id(data, f'language_{lang_num}')
-                if element and 'attrs' in element:
-                    element['attrs']['text'] = lang
+        """Cập nhật template_data dựa trên form_data (ghi trực tiếp vào các element của từng field)"""
+        apply_bindings(data['template_data'], self.bindings, data['form_data'])
 
 
 # Data extraction and formatting functions
@@ -302,58 +138,54 @@ def format_time_ago(dt):
 
 
 def get_cv_statistics(cv_model, user_id):
-    """Lấy thống kê CV của user"""
-    cvs = cv_model.query.filter_by(user_id=user_id).all()
+    """Lấy thống kê CV của user (COUNT/SUM trong SQL, một query nhóm theo template)"""
+    rows = (
+        cv_model.query
+        .filter_by(user_id=user_id)
+        .with_entities(
+            cv_model.template_id,
+            func.count(cv_model.id),
+            func.coalesce(func.sum(cv_model.views), 0),
+            func.coalesce(func.sum(cv_model.downloads), 0)
+        )
+        .group_by(cv_model.template_id)
+        .all()
+    )
     
-    total_downloads = 0  # TODO: Implement download tracking
+    total_cvs = sum(row[1] for row in rows)
     
     stats = {
-        'total_cvs': len(cvs),
-        'total': len(cvs),  # Keep both for compatibility
-        'total_views': sum(cv.views for cv in cvs),
-        'total_downloads': total_downloads
+        'total_cvs': total_cvs,
+        'total': total_cvs,  # Keep both for compatibility
+        'total_views': sum(row[2] for row in rows),
+        'total_downloads': sum(row[3] for row in rows),
+        'template_ids': [row[0] for row in rows if row[0]]
     }
     
     return stats
 
 
 def search_cvs(cv_model, query, user_id):
-    """Tìm kiếm CV theo từ khóa"""
+    """Tìm kiếm CV theo từ khóa (index full-text, kết quả xếp theo độ liên quan)"""
     if not query:
         return cv_model.query.filter_by(user_id=user_id).order_by(cv_model.updated_at.desc()).all()
     
-    # Tìm kiếm theo title hoặc trong content
-    cvs = cv_model.query.filter_by(user_id=user_id).all()
-    results = []
-    
-    query_lower = query.lower()
-    
-    for cv in cvs:
-        # Tìm trong title
-        if query_lower in cv.title.lower():
-            results.append(cv)
-            continue
-            
-        # Tìm trong content
-        content = cv.get_content()
-        search_fields = [
-            content.get('full_name', ''),
-            content.get('position', ''),
-            content.get('summary', ''),
-        ]
-        
-        # Thêm education và experience vào tìm kiếm
-        for edu in content.get('education', []):
-            search_fields.extend([edu.get('school', ''), edu.get('degree', '')])
-            
-        for exp in content.get('experience', []):
-            search_fields.extend([exp.get('company', ''), exp.get('position', '')])
-        
-        # Kiểm tra từ khóa trong các trường
-        if any(query_lower in field.lower() for field in search_fields if field):
-            results.append(cv)
+    from models.cv_search import search_cv_ids
+    
+    ranked_ids = search_cv_ids(db.session.connection(), user_id, query)
+    if ranked_ids is None:
+        # Database chưa có index (hoặc chưa dựng xong): tìm trên title và các cột tóm tắt
+        pattern = f'%{query}%'
+        return cv_model.query.filter(
+            cv_model.user_id == user_id,
+            db.or_(cv_model.title.ilike(pattern), cv_model.full_name.ilike(pattern),
+                   cv_model.position.ilike(pattern))
+        ).order_by(cv_model.updated_at.desc()).all()
     
-    return results
+    if not ranked_ids:
+        return []
+    cvs = {cv.id: cv for cv in cv_model.query.filter(cv_model.id.in_(ranked_ids))}
+    return [cvs[cv_id] for cv_id in ranked_ids if cv_id in cvs]
 
 
 def sort_cvs(cvs, sort_by):
@@ -473,75 +305,11 @@ def build_education_data(form_data):
     return education
 
 
-def replace_template_placeholders(template_data, replacement_data):
-    """Thay thế placeholders trong template với dữ liệu thực tế"""
-    # Deep copy template để không modify original
-    processed_template = copy.deepcopy(template_data)
-    
-    def replace_text(text, data):
-        """Replace placeholders in text with actual data using regex"""
-        if not isinstance(text, str):
-            return text
-        
-        # Replace simple placeholders like {{full_name}}
-        def simple_replace(match):
-            key = match.group(1)
-            return str(data.get(key, '')) if key in data else match.group(0)
-        
-        text = re.sub(r'\{\{(\w+)\}\}', simple_replace, text)
-        
-        # Replace array element placeholders like {{experience[0].position}}
-        def array_replace(match):
-            array_name = match.group(1)
-            index = int(match.group(2))
-            field = match.group(3)
-            
-            if array_name in data and isinstance(data[array_name], list):
-                if index < len(data[array_name]) and isinstance(data[array_name][index], dict):
-                    return str(data[array_name][index].get(field, ''))
-            return ''
-        
-        text = re.sub(r'\{\{(\w+)\[(\d+)\]\.(\w+)\}\}', array_replace, text)
-        
-        # Replace array item placeholders like {{technical_skills[0]}}
-        def array_item_replace(match):
-            array_name = match.group(1)
-            index = int(match.group(2))
-            
-            if array_name in data and isinstance(data[array_name], list):
-                if index < len(data[array_name]):
-                    return str(data[array_name][index])
-            return ''
-        
-        text = re.sub(r'\{\{(\w+)\[(\d+)\]\}\}', array_item_replace, text)
-        
-        # Handle date ranges like {{experience[0].start_date}} - {{experience[0].end_date}}
-        def date_range_replace(match):
-            array_name = match.group(1)
-            index = int(match.group(2))
-            
-            if array_name in data and isinstance(data[array_name], list):
-                if index < len(data[array_name]) and isinstance(data[array_name][index], dict):
-                    item = data[array_name][index]
-                    start = item.get('start_date', '')
-                    end = item.get('end_date', '')
-                    if start or end:
-                        return f"{start} - {end}".strip(' -')
-            return ''
-        
-        text = re.sub(r'\{\{(\w+)\[(\d+)\]\.start_date\}\}\s*-\s*\{\{(\w+)\[(\d+)\]\.end_date\}\}', 
-                     date_range_replace, text)
-        
-        return text
-    
-    # Process all elements in template (new format with nested layers)
-    if 'children' in processed_template:
-        for layer in processed_template.get('children', []):
-            for child in layer.get('children', []):
-                if child.get('className') == 'Text' and 'attrs' in child and 'text' in child.get('attrs', {}):
-                    child['attrs']['text'] = replace_text(child['attrs']['text'], replacement_data)
-    
-    return processed_template
+def replace_template_placeholders(template_data, replacement_data, bindings=None):
+    """Thay thế placeholders trong template với dữ liệu thực tế (bindings: BindingMap đã compile của template)"""
+    if bindings is None:
+        bindings = compile_bindings(template_data)
+    return fill_template(template_data, bindings, replacement_data)
 
 
 def format_skills_for_display(skills_data):
@@ -563,18 +331,6 @@ def format_skills_for_display(skills_data):
     elif isinstance(skills_data, list) and skills_data and isinstance(skills_data[0], dict):
         formatted_skills = skills_data
     
-    # Nếu skills_data là dict với separate name và level arrays
-    elif isinstance(skills_data, dict):
-        names = skills_data.get('names', [])
-        levels = skills_data.get('levels', [])
-        
-        for i, name in enumerate(names):
-            level = levels[i] if i < len(levels) else 'Intermediate'
-            formatted_skills.append({
-                'name': name,
-                'level': level
-            })
-    
     return formatted_skills
 
 
@@ -664,282 +420,39 @@ def analyze_cv_completeness(cv_data):
     return analysis
 
 
-def extract_cv_data_from_template_data(cv, content):
-    """Trích xuất dữ liệu CV từ template_data"""
-    template_data = content.get('template_data', {})
-    
-    # Khởi tạo cv_data với thông tin cơ bản
-    cv_data = {
+def _cv_info(cv):
+    """Thông tin chung của CV (không phụ thuộc content)"""
+    return {
         'id': cv.id,
         'title': cv.title,
         'template_id': cv.template_id,
         'template_name': cv.get_template_name(),
         'updated_at': format_time_ago(cv.updated_at),
-        'views': cv.views,
-        'downloads': getattr(cv, 'downloads', 0),
-        
-        # Khởi tạo các trường dữ liệu
-        'full_name': '',
-        'position': '',
-        'email': '',
-        'phone': '',
-        'address': '',
-        'website': '',
-        'summary': '',
-        'experience': [],
-        'education': [],
-        'technical_skills': [],
-        'soft_skills': [],
-        'languages': []
+        'views': cv.view_count,
+        'downloads': cv.download_count,
     }
-    
-    # Trích xuất dữ liệu từ template có cấu trúc mới (Konva.js format)
-    if 'children' in template_data:
-        # Duyệt qua các layer
-        for layer in template_data.get('children', []):
-            # Duyệt qua các phần tử trong layer
-            for element in layer.get('children', []):
-                if element.get('className') == 'Text':
-                    attrs = element.get('attrs', {})
-                    element_id = attrs.get('id', '')
-                    text = attrs.get('text', '')
-                    
-                    # Trích xuất thông tin cá nhân
-                    if element_id == 'full_name':
-                        cv_data['full_name'] = text
-                    elif element_id == 'position':
-                        cv_data['position'] = text
-                    elif element_id == 'email':
-                        # Loại bỏ icon email nếu có
-                        cv_data['email'] = text.replace('✉ ', '').replace('✉', '').strip()
-                    elif element_id == 'phone':
-                        # Loại bỏ icon phone nếu có
-                        cv_data['phone'] = text.replace('📞 ', '').replace('📞', '').strip()
-                    elif element_id == 'address':
-                        # Loại bỏ icon address nếu có
-                        cv_data['address'] = text.replace('📍 ', '').replace('📍', '').strip()
-                    elif element_id == 'website':
-                        cv_data['website'] = text
-                    elif element_id == 'summary':
-                        cv_data['summary'] = text
-                    
-                    # Trích xuất kinh nghiệm làm việc
-                    elif 'exp' in element_id:
-                        extract_experience_from_template(cv_data, element_id, '', text)
-                    
-                    # Trích xuất học vấn
-                    elif 'edu' in element_id:
-                        extract_education_from_template(cv_data, element_id, '', text)
-    
-    # Trích xuất kỹ năng từ form_data nếu template_data không có
-    form_data = content.get('form_data', {})
-    if not cv_data['technical_skills']:
-        cv_data['technical_skills'] = format_skills_for_display(
-            form_data.get('technical_skills', [])
-        )
-    if not cv_data['soft_skills']:
-        cv_data['soft_skills'] = format_skills_for_display(
-            form_data.get('soft_skills', [])
-        )
-    if not cv_data['languages']:
-        cv_data['languages'] = format_languages_for_display(
-            form_data.get('languages', [])
-        )
-    
-    return cv_data
 
 
 def extract_cv_data_from_form_data(cv, content):
-    """Trích xuất dữ liệu CV từ form_data (phương thức cũ)"""
-    form_data = content.get('form_data', {})
-    
-    cv_data = {
-        'id': cv.id,
-        'title': cv.title,
-        'template_id': cv.template_id,
-        'template_name': cv.get_template_name(),
-        'updated_at': format_time_ago(cv.updated_at),
-        'views': cv.views,
-        'downloads': cv.downloads,
-        
-        # Thông tin cá nhân
-        'full_name': form_data.get('full_name', ''),
-        'position': form_data.get('position', ''),
-        'email': form_data.get('email', ''),
-        'phone': form_data.get('phone', ''),
-        'address': form_data.get('address', ''),
-        'website': form_data.get('website', ''),
-        'summary': form_data.get('summary', ''),
-        
-        # Kinh nghiệm
-        'experience': form_data.get('experience', []),
-        
-        # Học vấn
-        'education': form_data.get('education', []),
-        
-        # Kỹ năng
-        'technical_skills': format_skills_for_display(form_data.get('technical_skills', [])),
-        'soft_skills': format_skills_for_display(form_data.get('soft_skills', [])),
-        
-        # Ngôn ngữ
-        'languages': format_languages_for_display(form_data.get('languages', []))
+    """Trích xuất dữ liệu CV từ form_data (theo schema hiện tại: đủ field, kỹ năng dạng {'name', 'level'})"""
+    form_data = content['form_data']
+    return {
+        **_cv_info(cv),
+        **{name: form_data[name] for name in (*TEXT_FIELDS, *ENTRY_FIELDS, *ITEM_FIELDS)}
     }
-    
-    return cv_data
 
 
 def extract_cv_data_from_template_data(cv, content):
-    """Trích xuất dữ liệu CV từ template_data"""
-    template_data = content.get('template_data', {})
-    form_data = content.get('form_data', {})
-    
-    # Khởi tạo cv_data với thông tin cơ bản
-    cv_data = {
-        'id': cv.id,
-        'title': cv.title,
-        'template_id': cv.template_id,
-        'template_name': cv.get_template_name(),
-        'updated_at': format_time_ago(cv.updated_at),
-        'views': cv.views,
-        'downloads': getattr(cv, 'downloads', 0),
-        
-        # Khởi tạo các trường dữ liệu
-        'full_name': '',
-        'position': '',
-        'email': '',
-        'phone': '',
-        'address': '',
-        'website': '',
-        'summary': '',
-        'experience': [],
-        'education': [],
-        'technical_skills': [],
-        'soft_skills': [],
-        'languages': []
-    }
-    
-    # Ưu tiên sử dụng form_data nếu có
-    if form_data:
-        cv_data.update({
-            'full_name': form_data.get('full_name', ''),
-            'position': form_data.get('position', ''),
-            'email': form_data.get('email', ''),
-            'phone': form_data.get('phone', ''),
-            'address': form_data.get('address', ''),
-            'website': form_data.get('website', ''),
-            'summary': form_data.get('summary', ''),
-            'experience': form_data.get('experience', []),
-            'education': form_data.get('education', []),
-            'technical_skills': format_skills_for_display(form_data.get('technical_skills', [])),
-            'soft_skills': format_skills_for_display(form_data.get('soft_skills', [])),
-            'languages': format_languages_for_display(form_data.get('languages', []))
-        })
-        return cv_data
-    
-    # Nếu không có form_data, trích xuất từ template_data
-    if 'children' in template_data:
-        # Duyệt qua các layer
-        for layer in template_data.get('children', []):
-            # Duyệt qua các phần tử trong layer
-            for element in layer.get('children', []):
-                if element.get('className') == 'Text':
-                    attrs = element.get('attrs', {})
-                    element_id = attrs.get('id', '')
-                    text = attrs.get('text', '')
-                    
-                    # Trích xuất thông tin cá nhân
-                    if element_id == 'full_name':
-                        cv_data['full_name'] = text
-                    elif element_id == 'position':
-                        cv_data['position'] = text
-                    elif element_id == 'email':
-                        # Loại bỏ icon email nếu có
-                        cv_data['email'] = text.replace('✉ ', '').replace('✉', '').strip()
-                    elif element_id == 'phone':
-                        # Loại bỏ icon phone nếu có
-                        cv_data['phone'] = text.replace('📞 ', '').replace('📞', '').strip()
-                    elif element_id == 'address':
-                        # Loại bỏ icon address nếu có
-                        cv_data['address'] = text.replace('📍 ', '').replace('📍', '').strip()
-                    elif element_id == 'website':
-                        cv_data['website'] = text
-                    elif element_id == 'summary':
-                        cv_data['summary'] = text
-                    
-                    # Trích xuất kinh nghiệm làm việc
-                    elif 'exp' in element_id:
-                        extract_experience_from_template(cv_data, element_id, '', text)
-                    
-                    # Trích xuất học vấn
-                    elif 'edu' in element_id:
-                        extract_education_from_template(cv_data, element_id, '', text)
-    
+    """Trích xuất dữ liệu CV: ưu tiên form_data, nếu không có thì duyệt template_data một lần.
+    
+    Kết quả duyệt template_data được cache theo content_hash của CV.
+    """
+    if has_form_data(content['form_data']):
+        return extract_cv_data_from_form_data(cv, content)
+    
+    record = extract_template_record(content['template_data'], cv.content_hash)
+    cv_data = {**_cv_info(cv), **record.to_dict()}
+    cv_data['technical_skills'] = format_skills_for_display(cv_data['technical_skills'])
+    cv_data['soft_skills'] = format_skills_for_display(cv_data['soft_skills'])
+    cv_data['languages'] = format_languages_for_display(cv_data['languages'])
     return cv_data
-
-
-def extract_experience_from_template(cv_data, element_id, field, text):
-    """Trích xuất thông tin kinh nghiệm từ template elements"""
-    # Xác định index của experience từ element_id (exp1 -> index 0, exp2 -> index 1)
-    index_match = re.search(r'exp(\d+)', element_id)
-    if not index_match:
-        return
-    
-    index = int(index_match.group(1)) - 1  # Convert to 0-based index (exp1 -> 0, exp2 -> 1)
-    
-    # Đảm bảo experience list đủ lớn
-    while len(cv_data['experience']) <= index:
-        cv_data['experience'].append({
-            'company': '',
-            'position': '',
-            'start_date': '',
-            'end_date': '',
-            'description': ''
-        })
-    
-    # Xác định trường dữ liệu
-    if 'position' in element_id or 'experience[' in field and '.position' in field:
-        cv_data['experience'][index]['position'] = text
-    elif 'company' in element_id or 'experience[' in field and '.company' in field:
-        cv_data['experience'][index]['company'] = text
-    elif 'date' in element_id or 'experience[' in field and '.dates' in field:
-        # Tách start_date và end_date từ text như "2023-07 - "
-        dates = text.split(' - ')
-        cv_data['experience'][index]['start_date'] = dates[0].strip() if len(dates) > 0 else ''
-        cv_data['experience'][index]['end_date'] = dates[1].strip() if len(dates) > 1 else ''
-    elif 'description' in element_id or 'experience[' in field and '.description' in field:
-        cv_data['experience'][index]['description'] = text
-
-
-def extract_education_from_template(cv_data, element_id, field, text):
-    """Trích xuất thông tin học vấn từ template elements"""
-    # Xác định index của education từ element_id (edu1 -> index 0, edu2 -> index 1)
-    index_match = re.search(r'edu(\d+)', element_id)
-    if not index_match:
-        return
-    
-    index = int(index_match.group(1)) - 1  # Convert to 0-based index (edu1 -> 0, edu2 -> 1)
-    
-    # Đảm bảo education list đủ lớn
-    while len(cv_data['education']) <= index:
-        cv_data['education'].append({
-            'school': '',
-            'degree': '',
-            'start_date': '',
-            'end_date': '',
-            'description': ''
-        })
-    
-    # Xác định trường dữ liệu
-    if 'degree' in element_id or 'education[' in field and '.degree' in field:
-        cv_data['education'][index]['degree'] = text
-    elif 'school' in element_id or 'education[' in field and '.school' in field:
-        cv_data['education'][index]['school'] = text
-    elif 'date' in element_id or 'education[' in field and '.dates' in field:
-        # Tách start_date và end_date từ text như "2019-09 - 2023-06"
-        dates = text.split(' - ')
-        cv_data['education'][index]['start_date'] = dates[0].strip() if len(dates) > 0 else ''
-        cv_data['education'][index]['end_date'] = dates[1].strip() if len(dates) > 1 else ''
-    elif 'description' in element_id or 'education[' in field and '.description' in field:
-        cv_data['education'][index]['description'] = text
-
-
@@ -0,0 +1,136 @@
+import json
+
+# Giới hạn mặc định cho JSON của canvas (ghi đè bằng config, xem app.py)
+DEFAULT_LIMITS = {
+    'max_bytes': 2 * 1024 * 1024,  # Kích thước payload (bytes UTF-8)
+    'max_nodes': 50000,  # Tổng số giá trị (object, array, chuỗi, số...)
+    'max_depth': 64,  # Độ sâu lồng nhau của object/array
+    'max_text': 20000,  # Độ dài tối đa của một chuỗi giá trị (ký tự); tên thuộc tính chỉ tính vào max_bytes
+}
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class JSONPayloadError(ValueError):
+    """Payload JSON không hợp lệ (400)"""
+    status_code = 400
+
+
+class JSONPayloadTooLarge(JSONPayloadError):
+    """Payload JSON vượt giới hạn kích thước/số node/độ sâu/độ dài chuỗi (413)"""
+    status_code = 413
+
+
+def limits_from_config(config, prefix):
+    """Giới hạn từ config theo prefix, ví dụ CANVAS_JSON_MAX_BYTES, CANVAS_JSON_MAX_NODES..."""
+    return {
+        name: config.get(f'{prefix}_{name.upper()}', default)
+        for name, default in DEFAULT_LIMITS.items()
+    }
+
+
+def _read_text(source, max_bytes):
+    """Text của payload (chuỗi, bytes hoặc stream bytes), dừng đọc ngay khi vượt max_bytes"""
+    if isinstance(source, str):
+        # Mỗi ký tự 1-4 bytes UTF-8: chỉ encode để đếm khi độ dài ký tự chưa đủ kết luận
+        if len(source) > max_bytes or (len(source) * 4 > max_bytes and len(source.encode('utf-8')) > max_bytes):
+            raise JSONPayloadTooLarge(f'Dữ liệu vượt quá {max_bytes} bytes.')
+        return source
+    
+    if isinstance(source, bytes):
+        chunks = [source]
+    else:
+        chunks = []
+        size = 0
+        while size <= max_bytes:
+            chunk = source.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+    raw = b''.join(chunks)
+    if len(raw) > max_bytes:
+        raise JSONPayloadTooLarge(f'Dữ liệu vượt quá {max_bytes} bytes.')
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        raise JSONPayloadError('Dữ liệu không phải UTF-8 hợp lệ.')
+
+
+def _reject_constant(name):
+    raise JSONPayloadError(f'Dữ liệu JSON không hợp lệ: {name}.')
+
+
+def parse_json(source, max_bytes=DEFAULT_LIMITS['max_bytes'], max_nodes=DEFAULT_LIMITS['max_nodes'],
+               max_depth=DEFAULT_LIMITS['max_depth'], max_text=DEFAULT_LIMITS['max_text']):
+    """Parse JSON từ chuỗi/bytes hoặc stream với giới hạn bytes, số node, độ sâu và độ dài chuỗi.
+    
+    Kích thước được kiểm tra trước khi parse (bộ nhớ của cây parse tỉ lệ với số bytes); cây được dựng
+    bằng json.loads trong một lượt, object_hook đếm node và tính độ sâu từ dưới lên nên dừng
+    ở object đầu tiên vượt giới hạn. Lỗi: JSONPayloadTooLarge (413) hoặc JSONPayloadError (400).
+    """
+    text = _read_text(source, max_bytes)
+    nodes = 1  # Giá trị gốc
+    depths = {}  # id(dict) -> độ sâu của object (object chỉ chứa giá trị đơn: 1)
+    
+    def measure(values):
+        """Độ sâu lớn nhất trong các giá trị; đếm phần tử của mảng và kiểm tra độ dài chuỗi"""
+        nonlocal nodes
+        depth = 0
+        for value in values:
+            kind = type(value)
+            if kind is dict:
+                child = depths[id(value)]
+            elif kind is list:
+                nodes += len(value)
+                child = measure(value) + 1
+            elif kind is str:
+                if len(value) > max_text:
+                    raise JSONPayloadTooLarge(f'Chuỗi dài quá {max_text} ký tự.')
+                continue
+            else:
+                continue
+            if child > depth:
+                depth = child
+        return depth
+    
+    def check(depth):
+        if nodes > max_nodes:
+            raise JSONPayloadTooLarge(f'Dữ liệu có quá {max_nodes} phần tử.')
+        if depth > max_depth:
+            raise JSONPayloadTooLarge(f'Dữ liệu lồng quá {max_depth} cấp.')
+    
+    def object_hook(value):
+        # Gọi cho mỗi object ngay khi parse xong (con trước cha): hook này là phần tốn thêm so với json.loads
+        nonlocal nodes
+        nodes += len(value)
+        depth = measure(value.values()) + 1
+        if nodes > max_nodes or depth > max_depth:
+            check(depth)
+        depths[id(value)] = depth
+        return value
+    
+    try:
+        root = json.loads(text, object_hook=object_hook, parse_constant=_reject_constant)
+        check(measure([root]))
+    except RecursionError:
+        # Lồng sâu tới mức vượt giới hạn đệ quy của json.loads
+        raise JSONPayloadTooLarge(f'Dữ liệu lồng quá {max_depth} cấp.')
+    except JSONPayloadError:
+        raise
+    except ValueError as e:
+        # JSONDecodeError, hoặc số nguyên quá dài (giới hạn số chữ số khi chuyển chuỗi sang int)
+        raise JSONPayloadError(f'Dữ liệu JSON không hợp lệ: {e}')
+    return root
+
+
+def read_request_json(request, limits):
+    """Parse body JSON của request theo limits (dict như DEFAULT_LIMITS), đọc trực tiếp từ stream.
+    
+    Content-Length lớn hơn max_bytes bị từ chối trước khi đọc body.
+    """
+    if request.mimetype != 'application/json':
+        raise JSONPayloadError('Yêu cầu phải có Content-Type application/json.')
+    if request.content_length is not None and request.content_length > limits['max_bytes']:
+        raise JSONPayloadTooLarge(f"Dữ liệu vượt quá {limits['max_bytes']} bytes.")
+    return parse_json(request.stream, **limits)
@@ -0,0 +1,124 @@
+from datetime import datetime
+import base64
+import json
+
+from sqlalchemy import DateTime, and_, or_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(sort_value, row_id):
+    """Mã hoá vị trí (giá trị sắp xếp, id) của hàng cuối trang thành chuỗi an toàn cho URL"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps([sort_value, row_id], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort_column):
+    """Giải mã cursor thành (giá trị sắp xếp, id), ValueError nếu cursor không hợp lệ"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if sort_value is not None and isinstance(sort_column.type, DateTime):
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, row_id
+    except (ValueError, TypeError, UnicodeError, json.JSONDecodeError):
+        raise ValueError('Cursor không hợp lệ')
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE):
+    """Số phần tử mỗi trang từ query string, giới hạn trong [1, MAX_PAGE_SIZE].
+    
+    default=None: không truyền limit thì không phân trang (trả về None).
+    """
+    try:
+        size = int(value) if value not in (None, '') else default
+    except (TypeError, ValueError):
+        size = default
+    if size is None:
+        return None
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def parse_fields(value, allowed, default):
+    """Danh sách field từ tham số fields= (phân cách bởi dấu phẩy), chỉ giữ các field hợp lệ"""
+    if not value:
+        return list(default)
+    fields = [field.strip() for field in value.split(',') if field.strip() in allowed]
+    return fields or list(default)
+
+
+def keyset_page(query, sort_column, id_column, descending=False, cursor=None,
+                limit=DEFAULT_PAGE_SIZE, key=None):
+    """Phân trang theo keyset (sort_column, id), trả về (các hàng, cursor trang sau hoặc None).
+    
+    Thời gian lấy một trang không phụ thuộc vào vị trí trang hay tổng số hàng (cần index phù hợp).
+    NULL được coi là nhỏ nhất (đứng đầu khi tăng dần, cuối khi giảm dần) trên mọi database.
+    key: hàm lấy entity từ một hàng khi query trả về tuple; limit=None: lấy tất cả.
+    """
+    nullable = sort_column.nullable
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor, sort_column)
+        after_id = id_column < last_id if descending else id_column > last_id
+        if sort_value is None:
+            # Trang trước dừng giữa nhóm NULL: tiếp tục trong nhóm, rồi tới các giá trị khác khi tăng dần
+            condition = and_(sort_column.is_(None), after_id)
+            if not descending:
+                condition = or_(condition, sort_column.isnot(None))
+        else:
+            beyond = sort_column < sort_value if descending else sort_column > sort_value
+            condition = or_(beyond, and_(sort_column == sort_value, after_id))
+            if descending and nullable:
+                condition = or_(condition, sort_column.is_(None))
+        query = query.filter(condition)
+    
+    if descending:
+        order = sort_column.desc().nulls_last() if nullable else sort_column.desc()
+        query = query.order_by(order, id_column.desc())
+    else:
+        order = sort_column.asc().nulls_first() if nullable else sort_column.asc()
+        query = query.order_by(order, id_column.asc())
+    
+    if limit is None:
+        return query.all(), None
+    
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    
+    rows = rows[:limit]
+    last = key(rows[-1]) if key else rows[-1]
+    return rows, encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+
+
+def _null_first(value):
+    """Khoá sắp xếp trong bộ nhớ xếp None nhỏ hơn mọi giá trị (giống keyset_page)"""
+    return (value is not None, value)
+
+
+def keyset_slice(items, key, sort_column, descending=False, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Phân trang keyset trên danh sách đã có trong bộ nhớ, key(item) trả về (giá trị sắp xếp, id).
+    
+    Cursor cùng định dạng với keyset_page (giá trị sắp xếp None là nhỏ nhất); sort_column chỉ dùng
+    để giải mã giá trị của cursor. limit=None: lấy tất cả.
+    """
+    def position(item):
+        sort_value, item_id = key(item)
+        return _null_first(sort_value), item_id
+    
+    items = sorted(items, key=position, reverse=descending)
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor, sort_column)
+        last = (_null_first(sort_value), last_id)
+        if descending:
+            items = [item for item in items if position(item) < last]
+        else:
+            items = [item for item in items if position(item) > last]
+    
+    if limit is None or len(items) <= limit:
+        return items, None
+    
+    items = items[:limit]
+    return items, encode_cursor(*key(items[-1]))
@@ -1,9 +1,17 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash, jsonify, send_file
 from flask_login import login_required, current_user
 from datetime import datetime
 from models.cv import CV
+from models.cv_bulk import bulk_delete_cvs, bulk_duplicate_cvs, parse_cv_ids
+from models.cv_schema import has_form_data
+from models.analytics import EVENT_TEMPLATE_SELECT, record_event, template_usage
+from models.cv_revision import CVRevision, get_revision_content, record_revision
+from models.cv_search import search_cv_ids
 from models.user import User
 from models.cv_template import CVTemplate
+from models.konva import expand_defaults
+from models.template_catalog import get_catalog
+from models.template_version import stored_artifact
 from db import db
 import json
 import re
@@ -12,13 +20,119 @@ import os
 import copy
 import traceback
 from utils.pdf_generator import KonvaJSONToPDF
+from utils.cv_bindings import template_bindings
 from utils.cv_utils import *
 from utils.ai_cv import *
 from typing import Dict, List, Any, Optional
+from sqlalchemy.orm import load_only, undefer
+from utils.pagination import keyset_page, keyset_slice, parse_fields, parse_page_size
+from utils.json_guard import JSONPayloadError, limits_from_config, read_request_json
 
 cv_bp = Blueprint('cv', __name__, url_prefix='/cv')
 ai = GeminiAI()
 
+# Khoá sắp xếp của danh sách CV: sort -> (cột, giảm dần); id dùng để phân định khi trùng giá trị
+CV_SORT_KEYS = {
+    'newest': (CV.updated_at, True),
+    'oldest': (CV.created_at, False),
+    'name': (CV.title, False),
+    'views': (CV.views, True),
+    'downloads': (CV.downloads, True),
+}
+CV_LIST_PAGE_SIZE = 50
+
+# Các field API danh sách CV trả về được; template_data/form_data chỉ trả khi yêu cầu qua fields=
+CV_API_FIELDS = (
+    'id', 'title', 'template_id', 'template', 'views', 'downloads', 'full_name', 'position',
+    'is_canvas_editor', 'content_size', 'created_at', 'updated_at', 'template_data', 'form_data'
+)
+CV_API_DEFAULT_FIELDS = CV_API_FIELDS[:-2]
+TEMPLATE_API_FIELDS = (
+    'id', 'name', 'description', 'category', 'template', 'preview_image',
+    'usage_count', 'features', 'popularity_badge'
+)
+
+# Ảnh preview của template: dựng một lần cho mỗi version, lưu trong bảng cv_template_artifacts
+PREVIEW_ARTIFACT = 'preview.png'
+TEMPLATE_PREVIEW_DPI = 50
+
+
+def _cv_listing_query(search_query, template_filter):
+    """Query danh sách CV của user hiện tại (cột tóm tắt + tên template), đã áp dụng tìm kiếm và lọc"""
+    # Base query - chỉ nạp các cột tóm tắt, không đọc content; tên template lấy bằng outer join
+    query = (
+        CV.query.filter_by(user_id=current_user.id)
+        .options(load_only(*CV.listing_columns()))
+        .outerjoin(CVTemplate, CVTemplate.id == CV.template_id)
+        .add_columns(CVTemplate.name)
+    )
+    
+    # Apply search filter: dùng index full-text (xếp hạng sẵn), ilike khi database chưa có index hoặc index chưa dựng xong
+    ranked_ids = None
+    if search_query:
+        ranked_ids = search_cv_ids(db.session.connection(), current_user.id, search_query)
+        if ranked_ids is not None:
+            query = query.filter(CV.id.in_(ranked_ids))
+        else:
+            search_pattern = f'%{search_query}%'
+            query = query.filter(
+                db.or_(
+                    CV.title.ilike(search_pattern),
+                    CV.full_name.ilike(search_pattern),
+                    CV.position.ilike(search_pattern),
+                    CV.form_json.ilike(search_pattern)
+                )
+            )
+    
+    # Apply template filter
+    if template_filter:
+        query = query.filter(CV.template_id.ilike(f'%{template_filter}%'))
+    
+    return query, ranked_ids
+
+
+def _cv_listing_page(query, ranked_ids, sort_by, cursor, limit):
+    """Một trang danh sách CV: theo độ liên quan khi tìm kiếm (sort=relevance), ngược lại keyset theo sort"""
+    if sort_by == 'relevance' and ranked_ids is not None:
+        # Kết quả tìm kiếm đã giới hạn SEARCH_RESULT_LIMIT hàng, trả về một trang theo thứ hạng
+        rank = {cv_id: position for position, cv_id in enumerate(ranked_ids)}
+        rows = sorted(query.all(), key=lambda row: rank[row[0].id])
+        return rows[:limit], None
+    
+    sort_column, descending = CV_SORT_KEYS.get(sort_by, CV_SORT_KEYS['newest'])
+    return keyset_page(query, sort_column, CV.id, descending, cursor, limit, key=lambda row: row[0])
+
+
+def _guarded_json(prefix, required=True, **overrides):
+    """Body JSON (object) của request, parse có giới hạn theo config <prefix>_MAX_*; JSONPayloadError -> 400/413"""
+    if not required and not request.content_length and not request.is_json:
+        return {}
+    limits = limits_from_config(current_app.config, prefix)
+    limits.update(overrides)
+    data = read_request_json(request, limits)
+    if not isinstance(data, dict):
+        raise JSONPayloadError('Dữ liệu không hợp lệ.')
+    return data
+
+
+def _json_response(payload):
+    """Response JSON từ chuỗi đã serialise sẵn"""
+    return current_app.response_class(payload, mimetype='application/json')
+
+
+def _json_object(values, **fragments):
+    """Chuỗi JSON của một object: values được serialise, fragments là JSON đã serialise sẵn (ghép nguyên)"""
+    parts = [f'{json.dumps(name)}: {json.dumps(value, ensure_ascii=False)}' for name, value in values.items()]
+    parts.extend(f'{json.dumps(name)}: {fragment}' for name, fragment in fragments.items())
+    return '{' + ', '.join(parts) + '}'
+
+
+def _cv_template_name(cv, template_name):
+    """Tên template hiển thị cho CV (tên trong DB nếu có)"""
+    if template_name:
+        return template_name
+    return cv.template_id.replace('_', ' ').title() if cv.template_id else 'Template mặc định'
+
 @cv_bp.route('/list')
 @login_required
 def cv_list():
@@ -27,94 +141,50 @@ def cv_list():
         # Lấy tham số tìm kiếm và lọc
         search_query = request.args.get('search', '').strip()
         template_filter = request.args.get('template', '').strip()
-        sort_by = request.args.get('sort', 'newest')
+        sort_by = request.args.get('sort') or ('relevance' if search_query else 'newest')
+        cursor = request.args.get('cursor', '').strip()
         
-        # Base query
-        query = CV.query.filter_by(user_id=current_user.id)
-        
-        # Apply search filter
-        if search_query:
-            # Search in title and content
-            search_pattern = f'%{search_query}%'
-            query = query.filter(
-                db.or_(
-                    CV.title.ilike(search_pattern),
-                    CV.content.ilike(search_pattern)
-                )
-            )
+        query, ranked_ids = _cv_listing_query(search_query, template_filter)
         
-        # Apply template filter
-        if template_filter:
-            query = query.filter(CV.template_id.ilike(f'%{template_filter}%'))
-        
-        # Apply sorting
-        if sort_by == 'oldest':
-            query = query.order_by(CV.created_at.asc())
-        elif sort_by == 'name':
-            query = query.order_by(CV.title.asc())
-        elif sort_by == 'views':
-            query = query.order_by(CV.views.desc())
-        elif sort_by == 'downloads':
-            query = query.order_by(CV.downloads.desc())
-        else:  # newest (default)
-            query = query.order_by(CV.updated_at.desc())
-        
-        cvs = query.all()
+        # Phân trang theo keyset trên khoá sắp xếp (newest là mặc định, relevance khi tìm kiếm)
+        try:
+            rows, next_cursor = _cv_listing_page(query, ranked_ids, sort_by, cursor, CV_LIST_PAGE_SIZE)
+        except ValueError:
+            # Cursor hỏng hoặc hết hạn: quay lại trang đầu
+            return redirect(url_for('cv.cv_list', search=search_query, template=template_filter, sort=sort_by))
         
-        # Lấy danh sách templates có sẵn
-        available_templates = CVTemplate.query.filter(CVTemplate.is_active == True).all()
+        # Lấy danh sách templates có sẵn (từ catalogue trong bộ nhớ)
+        available_templates = get_catalog().active()
         
-        # Lấy danh sách template_ids đã được sử dụng bởi user
-        used_template_ids = db.session.query(CV.template_id).filter_by(user_id=current_user.id).distinct().all()
-        used_template_ids = [t[0] for t in used_template_ids if t[0]]
+        # Thống kê tổng quan và template_ids đã dùng (COUNT/SUM trong một query)
+        stats = get_cv_statistics(CV, current_user.id)
+        used_template_ids = stats.pop('template_ids')
         
         # Format dữ liệu để hiển thị
         cv_list = []
-        for cv in cvs:
-            content = cv.get_content()
-            form_data = content.get('form_data', {})
-            
-            # Lấy tên template từ database
-            template_name = 'Template mặc định'
-            if cv.template_id:
-                template = CVTemplate.query.get(cv.template_id)
-                if template:
-                    template_name = template.name
-                else:
-                    template_name = cv.template_id.replace('_', ' ').title()
-            
+        for cv, template_name in rows:
             cv_data = {
                 'id': cv.id,
                 'name': cv.title,
                 'title': cv.title,
-                'template': template_name,
+                'template': _cv_template_name(cv, template_name),
                 'template_id': cv.template_id,
-                'views': cv.views,
-                'downloads': cv.downloads,
+                'views': cv.view_count,
+                'downloads': cv.download_count,
                 'updated_at': format_time_ago(cv.updated_at),
                 'created_at': format_time_ago(cv.created_at),
-                'full_name': form_data.get('full_name', 'Chưa có tên'),
-                'position': form_data.get('position', 'Chưa có vị trí'),
+                'full_name': cv.full_name or 'Chưa có tên',
+                'position': cv.position or 'Chưa có vị trí',
                 'is_canvas_editor': cv.is_canvas_editor
             }
             cv_list.append(cv_data)
         
-        # Thống kê tổng quan
-        all_cvs = CV.query.filter_by(user_id=current_user.id).all()
-        total_views = sum(cv.views for cv in all_cvs)
-        total_downloads = sum(cv.downloads for cv in all_cvs)
-        
-        stats = {
-            'total_cvs': len(all_cvs),
-            'total_views': total_views,
-            'total_downloads': total_downloads
-        }
-        
         return render_template('cv/cv_list.html', 
                              cvs=cv_list, 
                              stats=stats,
                              available_templates=available_templates,
                              used_template_ids=used_template_ids,
+                             next_cursor=next_cursor,
                              current_search=search_query,
                              current_template=template_filter,
                              current_sort=sort_by)
@@ -123,6 +193,56 @@ def cv_list():
         flash('Có lỗi xảy ra khi tải danh sách CV. Vui lòng thử lại.', 'error')
         return render_template('cv/cv_list.html', cvs=[], stats={}, available_templates=[], used_template_ids=[])
 
+@cv_bp.route('/api/cvs')
+@login_required
+def api_cvs():
+    """API danh sách CV: phân trang bằng cursor, chọn field trả về bằng fields="""
+    try:
+        search_query = request.args.get('search', '').strip()
+        template_filter = request.args.get('template', '').strip()
+        sort_by = request.args.get('sort') or ('relevance' if search_query else 'newest')
+        fields = parse_fields(request.args.get('fields'), CV_API_FIELDS, CV_API_DEFAULT_FIELDS)
+        # Không có limit: trả về mọi CV (không phân trang)
+        limit = parse_page_size(request.args.get('limit'), default=None)
+        
+        query, ranked_ids = _cv_listing_query(search_query, template_filter)
+        if 'form_data' in fields:
+            query = query.options(undefer(CV.form_json), undefer(CV.content))
+        
+        rows, next_cursor = _cv_listing_page(query, ranked_ids, sort_by, request.args.get('cursor'), limit)
+        
+        items = []
+        for cv, template_name in rows:
+            values = {
+                'id': lambda: cv.id,
+                'title': lambda: cv.title,
+                'template_id': lambda: cv.template_id,
+                'template': lambda: _cv_template_name(cv, template_name),
+                'views': lambda: cv.view_count,
+                'downloads': lambda: cv.download_count,
+                'full_name': lambda: cv.full_name,
+                'position': lambda: cv.position,
+                'is_canvas_editor': lambda: cv.is_canvas_editor,
+                'content_size': lambda: cv.content_size,
+                'created_at': lambda: cv.created_at.isoformat() if cv.created_at else None,
+                'updated_at': lambda: cv.updated_at.isoformat() if cv.updated_at else None,
+                'template_data': lambda: cv.get_template_data(),
+                'form_data': lambda: cv.get_form_data(),
+            }
+            items.append({field: values[field]() for field in fields})
+        
+        return jsonify({
+            'success': True,
+            'cvs': items,
+            'count': len(items),
+            'next_cursor': next_cursor
+        })
+    
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': 'Có lỗi xảy ra khi tải danh sách CV.'}), 500
+
 @cv_bp.route('/create')
 @login_required
 def create_cv():
@@ -149,16 +269,12 @@ def edit_cv_form(cv_id):
             flash('Không tìm thấy CV hoặc bạn không có quyền truy cập.', 'error')
             return redirect(url_for('cv.cv_list'))
         
-        # Lấy form_data từ content hoặc tạo mới nếu chưa có
+        # Lấy form_data; CV soạn bằng canvas (form trống) thì trích xuất từ template_data
         form_data = cv.get_form_data()
-        if not form_data:
-            # Trích xuất dữ liệu từ template data nếu không có form_data
-            content = cv.get_content()
-            template_data = content.get('template_data', {})
-            if template_data:
-                form_data = extract_cv_data_from_template_data(cv, content)
-            else:
-                form_data = {}
+        if not has_form_data(form_data):
+            form_data = extract_cv_data_from_template_data(
+                cv, {'template_data': cv.get_template_data(), 'form_data': form_data}
+            )
         
         # Format dữ liệu để hiển thị trong form
         cv_data = {
@@ -231,7 +347,11 @@ def update_cv_form(cv_id):
         }
         
         # Sử dụng CVDataUpdater để cập nhật dữ liệu
-        updater = CVDataUpdater()
+        # Binding map của đúng version template mà CV được tạo từ (CV cũ: version hiện tại)
+        bindings = template_bindings(db.session.connection(), cv.template_id, cv.template_version)
+        if bindings is None and cv.template_version is not None:
+            bindings = template_bindings(db.session.connection(), cv.template_id)
+        updater = CVDataUpdater(bindings)
         updated_content = updater.update_cv_data(current_content, form_updates)
         
         # Cập nhật title của CV nếu có thay đổi
@@ -242,6 +362,7 @@ def update_cv_form(cv_id):
         # Lưu content đã cập nhật vào CV
         cv.set_content(updated_content)
         cv.updated_at = datetime.utcnow()
+        record_revision(cv, source='form')
         
         # Commit changes
         db.session.commit()
@@ -285,34 +406,19 @@ def cv_preview(cv_id):
         # Tăng lượt xem
         cv.increment_views()
         
-        # Lấy content và xử lý dữ liệu
-        content = cv.get_content()
-        
         # Lấy tham số source để chọn nguồn dữ liệu (mặc định là template_data)
         data_source = request.args.get('source', 'template_data')
         
-        # Chuẩn bị dữ liệu CV theo nguồn được chọn
+        # Chuẩn bị dữ liệu CV theo nguồn được chọn (nguồn form_data chỉ cần đọc cột form_data);
+        # content luôn theo schema hiện tại nên không cần kiểm tra từng dạng cũ
         if data_source == 'form_data':
-            cv_data = extract_cv_data_from_form_data(cv, content)
+            cv_data = extract_cv_data_from_form_data(cv, {'form_data': cv.get_form_data()})
+            template_data = {}
         else:  # Mặc định là template_data
+            content = cv.get_content()
             cv_data = extract_cv_data_from_template_data(cv, content)
+            template_data = content['template_data']
         
-        # Kiểm tra và chuẩn bị template_data cho JSON serialization
-        if data_source != 'form_data' and 'template_data' in content:
-            # Đảm bảo template_data có thể serialize thành JSON
-            try:
-                import json
-                # Test serialization trước
-                json.dumps(content.get('template_data', {}))
-                template_data = content.get('template_data', {})
-            except TypeError:
-                # Nếu có lỗi, sử dụng object rỗng thay thế
-                template_data = {}
-                print("Warning: template_data không thể serializable, sử dụng object rỗng.")
-        else:
-            template_data = {}
-            
-        # Gán template_data đã được kiểm tra vào cv_data
         cv_data['template_data'] = template_data
         cv_data['is_canvas_editor'] = cv.is_canvas_editor  # Thêm thông tin về editor
         
@@ -338,42 +444,33 @@ def template_selector():
         search_query = request.args.get('search', '').strip()
         sort_by = request.args.get('sort', 'popular')  # popular, newest, rating
         
-        # Query templates từ database
-        query = CVTemplate.query.filter(CVTemplate.is_active == True)
-        
-        # Lọc theo category
-        if category_filter != 'all':
-            query = query.filter(CVTemplate.category == category_filter)
+        # Templates lấy từ catalogue trong bộ nhớ (đã parse sẵn), lọc theo category
+        catalog = get_catalog()
+        templates = catalog.active(category_filter)
         
         # Tìm kiếm theo tên hoặc mô tả
         if search_query:
-            search_pattern = f'%{search_query}%'
-            query = query.filter(
-                db.or_(
-                    CVTemplate.name.ilike(search_pattern),
-                    CVTemplate.description.ilike(search_pattern)
-                )
-            )
-        
-        # Sắp xếp
+            keyword = search_query.lower()
+            templates = [
+                t for t in templates
+                if keyword in (t.name or '').lower() or keyword in (t.description or '').lower()
+            ]
+        
+        # Sắp xếp: newest theo ngày tạo, còn lại (popular) theo số CV tạo từ template gần đây (rollup)
+        usage = template_usage()
         if sort_by == 'newest':
-            query = query.order_by(CVTemplate.created_at.desc())
-        elif sort_by == 'rating':
-            query = query.order_by(CVTemplate.rating.desc(), CVTemplate.rating_count.desc())
-        else:  # popular (default)
-            query = query.order_by(CVTemplate.usage_count.desc())
-        
-        templates = query.all()
+            templates.sort(key=lambda t: t.created_at or datetime.min, reverse=True)
+        else:
+            templates.sort(key=lambda t: (usage.get(t.id, 0), t.usage_total), reverse=True)
         
         # Lấy danh sách categories có sẵn
-        categories = db.session.query(CVTemplate.category).distinct().all()
-        categories = [cat[0] for cat in categories if cat[0]]
+        categories = catalog.categories
         
         # Thống kê templates
         stats = {
             'total_templates': len(templates),
             'categories_count': len(categories),
-            'popular_templates': [t for t in templates if t.usage_count > 500]
+            'popular_templates': [t for t in templates if usage.get(t.id, 0) > 500]
         }
         
         return render_template('cv/template_selector.html', 
@@ -388,9 +485,8 @@ def template_selector():
         print(f"Error in template_selector: {str(e)}")
         flash('Có lỗi xảy ra khi tải danh sách template. Vui lòng thử lại.', 'error')
         
-        # Fallback to default templates
-        CVTemplate.seed_default_templates()
-        templates = CVTemplate.query.filter(CVTemplate.is_active == True).all()
+        # Fallback: trang trống (template được seed bằng 'flask cv seed-templates', không seed trong request)
+        templates = []
         return render_template('cv/template_selector.html', 
                              templates=templates,
                              categories=['modern', 'professional', 'creative', 'minimal'],
@@ -402,31 +498,87 @@ def api_templates():
     """API endpoint để lấy danh sách templates"""
     try:
         category = request.args.get('category', 'all')
+        fields = parse_fields(request.args.get('fields'), TEMPLATE_API_FIELDS, TEMPLATE_API_FIELDS)
+        limit = parse_page_size(request.args.get('limit'), default=None)
+        cursor = request.args.get('cursor')
+        active = get_catalog().active(category)
+        
+        if limit is None and not cursor:
+            # Không phân trang: toàn bộ template theo lượt dùng như trước
+            templates, next_cursor = sorted(active, key=lambda t: t.usage_total, reverse=True), None
+        else:
+            # Lượt dùng đổi liên tục nên keyset theo (name, id) để các trang không trùng/sót template
+            templates, next_cursor = keyset_slice(
+                active, lambda t: (t.name, t.id), CVTemplate.name, False, cursor, limit
+            )
         
-        query = CVTemplate.query.filter(CVTemplate.is_active == True)
-        if category != 'all':
-            query = query.filter(CVTemplate.category == category)
-        
-        templates = query.order_by(CVTemplate.usage_count.desc()).all()
-        
-        return jsonify({
-            'success': True,
-            'templates': [template.to_dict() for template in templates],
-            'total': len(templates)
-        })
+        # Ghép JSON từ các phần đã serialise sẵn trong catalogue; total là số template (mọi trang)
+        return _json_response(
+            '{"success": true, "templates": [' + ', '.join(t.to_json(fields) for t in templates) + '], '
+            f'"total": {len(active)}, "next_cursor": {json.dumps(next_cursor)}}}'
+        )
     
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({
             'success': False,
             'error': 'Có lỗi xảy ra khi tải templates.'
         })
 
+def _render_template_png(template_data):
+    """Dựng ảnh PNG của template (qua file PDF tạm)"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_png_file:
+        temp_png_path = tmp_png_file.name
+    try:
+        converter = KonvaJSONToPDF(dpi=72)
+        converter.convert_json_to_png(template_data, temp_png_path, pdf_path=None, delete_pdf=True,
+                                      png_dpi=TEMPLATE_PREVIEW_DPI)
+        with open(temp_png_path, 'rb') as png_file:
+            return png_file.read()
+    finally:
+        if os.path.exists(temp_png_path):
+            os.unlink(temp_png_path)
+
+
+@cv_bp.route('/api/templates/<template_id>/preview.png')
+@login_required
+def api_template_preview_image(template_id):
+    """Ảnh preview của template: dựng một lần cho mỗi version và lưu trong bảng artifact.
+    
+    ETag theo version nên trình duyệt chỉ tải lại khi template đổi.
+    """
+    try:
+        template = get_catalog().get(template_id)
+        if not template:
+            return jsonify({'success': False, 'error': 'Template không tồn tại.'}), 404
+        
+        etag = f'{template.id}-v{template.version}'
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+        else:
+            image = stored_artifact(db.session.connection(), template.id, template.version,
+                                    PREVIEW_ARTIFACT, _render_template_png)
+            if image is None:
+                return jsonify({'success': False, 'error': 'Không tìm thấy phiên bản template.'}), 404
+            db.session.commit()  # Lưu ảnh vừa dựng (nếu có) cho các worker khác
+            response = current_app.response_class(image, mimetype='image/png')
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error rendering template preview: {str(e)}")
+        return jsonify({'success': False, 'error': 'Có lỗi xảy ra khi tải preview.'}), 500
+
 @cv_bp.route('/api/templates/<template_id>/preview')
 @login_required
 def api_template_preview(template_id):
     """API để lấy thông tin preview của template"""
     try:
-        template = CVTemplate.query.get(template_id)
+        template = get_catalog().get(template_id)
         
         if not template:
             return jsonify({
@@ -434,10 +586,7 @@ def api_template_preview(template_id):
                 'error': 'Template không tồn tại.'
             })
         
-        return jsonify({
-            'success': True,
-            'template': template.to_dict()
-        })
+        return _json_response(_json_object({'success': True}, template=template.to_json()))
     
     except Exception as e:
         return jsonify({
@@ -450,7 +599,7 @@ def api_template_preview(template_id):
 def api_select_template(template_id):
     """API để chọn template và track usage"""
     try:
-        template = CVTemplate.query.get(template_id)
+        template = get_catalog().get(template_id)
         
         if not template:
             return jsonify({
@@ -460,13 +609,13 @@ def api_select_template(template_id):
         
         # Track template selection (không tăng usage_count ở đây, 
         # sẽ tăng khi CV thực sự được tạo)
+        record_event(EVENT_TEMPLATE_SELECT, user_id=current_user.id, template_id=template.id)
         
-        return jsonify({
+        return _json_response(_json_object({
             'success': True,
             'message': f'Đã chọn template {template.name}',
-            'redirect_url': url_for('cv.create_cv', template=template_id),
-            'template': template.to_dict()
-        })
+            'redirect_url': url_for('cv.create_cv', template=template_id)
+        }, template=template.to_json()))
     
     except Exception as e:
         return jsonify({
@@ -489,11 +638,11 @@ def duplicate_cv(cv_id):
         # Tạo bản sao
         new_cv = CV(
             title=f"Bản sao - {original_cv.title}",
-            content=original_cv.content,  # Copy content
             template_id=original_cv.template_id,
             user_id=current_user.id,
             is_canvas_editor=original_cv.is_canvas_editor  # Copy editor type
         )
+        new_cv.copy_content_from(original_cv)  # Copy content
         
         db.session.add(new_cv)
         db.session.commit()
@@ -549,6 +698,50 @@ def delete_cv(cv_id):
         flash('Có lỗi xảy ra khi xóa CV.', 'error')
         return redirect(url_for('cv.cv_list'))
 
+@cv_bp.route('/<int:cv_id>/revisions')
+@login_required
+def cv_revisions(cv_id):
+    """Danh sách phiên bản của CV (mới nhất trước)"""
+    cv = CV.query.filter_by(id=cv_id, user_id=current_user.id).first()
+    if not cv:
+        return jsonify({'success': False, 'error': 'Không tìm thấy CV hoặc bạn không có quyền truy cập.'}), 404
+    
+    limit = min(request.args.get('limit', 50, type=int), 200)
+    revisions = cv.revisions.order_by(CVRevision.number.desc()).limit(limit).all()
+    return jsonify({
+        'success': True,
+        'cv_id': cv.id,
+        'revisions': [revision.to_dict() for revision in revisions]
+    })
+
+@cv_bp.route('/<int:cv_id>/revisions/<int:number>/restore', methods=['POST'])
+@login_required
+def restore_cv_revision(cv_id, number):
+    """Khôi phục CV về một phiên bản cũ (tạo thêm phiên bản mới, không xoá lịch sử)"""
+    try:
+        cv = CV.query.filter_by(id=cv_id, user_id=current_user.id).first()
+        if not cv:
+            return jsonify({'success': False, 'error': 'Không tìm thấy CV hoặc bạn không có quyền truy cập.'}), 404
+        
+        content = get_revision_content(cv.id, number)
+        if content is None:
+            return jsonify({'success': False, 'error': 'Không tìm thấy phiên bản này.'}), 404
+        
+        cv.set_content(content)
+        cv.updated_at = datetime.utcnow()
+        record_revision(cv, source='restore')
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': f'Đã khôi phục CV về phiên bản {number}.',
+            'redirect_url': url_for('cv.cv_preview', cv_id=cv.id)
+        })
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': f'Có lỗi xảy ra khi khôi phục CV: {str(e)}'}), 500
+
 @cv_bp.route('/<int:cv_id>/download')
 @login_required
 def download_cv(cv_id):
@@ -563,9 +756,8 @@ def download_cv(cv_id):
             flash('Không tìm thấy CV.', 'error')
             return redirect(url_for('cv.cv_list'))
         
-        # Lấy content của CV
-        content = cv.get_content()
-        template_data = content.get('template_data', {})
+        # Lấy template_data của CV
+        template_data = cv.get_template_data()
         
         if not template_data:
             flash('CV không có dữ liệu template để xuất.', 'error')
@@ -585,7 +777,7 @@ def download_cv(cv_id):
                 converter.convert_json_to_png(template_data, temp_png_path, pdf_path=None, delete_pdf=True, png_dpi=dpi)
                 
                 # Tăng số lượt tải xuống
-                cv.increment_downloads()
+                cv.increment_downloads('png')
                 
                 # Tạo tên file PNG
                 png_filename = f"{safe_title}_{cv_id}.png"
@@ -628,9 +820,8 @@ def export_cv_pdf(cv_id):
             flash('Không tìm thấy CV hoặc bạn không có quyền truy cập.', 'error')
             return redirect(url_for('cv.cv_list'))
         
-        # Lấy content của CV
-        content = cv.get_content()
-        template_data = content.get('template_data', {})
+        # Lấy template_data của CV
+        template_data = cv.get_template_data()
         
         if not template_data:
             flash('CV không có dữ liệu template để xuất PDF.', 'error')
@@ -646,7 +837,7 @@ def export_cv_pdf(cv_id):
             converter.convert_json_to_pdf(template_data, temp_pdf_path)
             
             # Tăng số lượt tải xuống
-            cv.increment_downloads()
+            cv.increment_downloads('pdf')
             
             # Tạo tên file PDF
             safe_title = "".join(c for c in cv.title if c.isalnum() or c in (' ', '-', '_')).rstrip()
@@ -698,8 +889,7 @@ def api_export_cv_pdf(cv_id):
             })
         
         # Kiểm tra template_data
-        content = cv.get_content()
-        template_data = content.get('template_data', {})
+        template_data = cv.get_template_data()
         
         if not template_data:
             return jsonify({
@@ -717,7 +907,7 @@ def api_export_cv_pdf(cv_id):
             converter.convert_json_to_pdf(template_data, temp_pdf_path)
             
             # Tăng download count
-            cv.increment_downloads()
+            cv.increment_downloads('pdf')
             
             # Tạo download URL
             download_url = url_for('cv.export_cv_pdf', cv_id=cv_id)
@@ -813,43 +1003,35 @@ def auto_suggest():
 def bulk_action():
     """Thực hiện hành động hàng loạt trên CV"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         action = data.get('action')
-        cv_ids = data.get('cv_ids', [])
+        cv_ids = parse_cv_ids(data.get('cv_ids', []))
         
         if not cv_ids:
             return jsonify({'success': False, 'error': 'Không có CV nào được chọn.'})
         
-        # Lấy các CV thuộc về user hiện tại
-        cvs = CV.query.filter(CV.id.in_(cv_ids), CV.user_id == current_user.id).all()
-        
-        if not cvs:
-            return jsonify({'success': False, 'error': 'Không tìm thấy CV nào hợp lệ.'})
-        
-        success_count = 0
-        
+        connection = db.session.connection()
         if action == 'delete':
-            for cv in cvs:
-                db.session.delete(cv)
-                success_count += 1
-                
+            deleted = bulk_delete_cvs(connection, current_user.id, cv_ids)
+            results = [{'id': cv_id, 'success': ok} for cv_id, ok in deleted.items()]
         elif action == 'duplicate':
-            for cv in cvs:
-                new_cv = CV(
-                    title=f"Bản sao - {cv.title}",
-                    content=cv.content,
-                    template_id=cv.template_id,
-                    user_id=current_user.id
-                )
-                db.session.add(new_cv)
-                success_count += 1
+            copies = bulk_duplicate_cvs(connection, current_user.id, cv_ids)
+            results = [{'id': cv_id, 'success': new_id is not None, 'new_id': new_id} for cv_id, new_id in copies.items()]
+        else:
+            return jsonify({'success': False, 'error': 'Hành động không hợp lệ.'})
+        
+        success_count = sum(1 for result in results if result['success'])
+        if not success_count:
+            db.session.rollback()
+            return jsonify({'success': False, 'error': 'Không tìm thấy CV nào hợp lệ.', 'results': results})
         
         db.session.commit()
         
         return jsonify({
             'success': True,
             'message': f'Đã thực hiện thành công trên {success_count} CV.',
-            'affected_count': success_count
+            'affected_count': success_count,
+            'results': results
         })
         
     except Exception as e:
@@ -875,9 +1057,8 @@ def canvas_editor(cv_id=None):
                 flash('Không tìm thấy CV hoặc bạn không có quyền truy cập.', 'error')
                 return redirect(url_for('cv.cv_list'))
             
-            # Lấy dữ liệu từ CV
-            content = cv.get_content()
-            template_data = content.get('template_data', {})
+            # Lấy dữ liệu từ CV (chỉ cần template_data); thuộc tính mặc định bị bỏ khi lưu được thêm lại cho editor
+            template_data = expand_defaults(cv.get_template_data())
             
             # Chuẩn bị dữ liệu CV cho canvas
             cv_data = {
@@ -914,7 +1095,7 @@ def canvas_editor(cv_id=None):
                 cv_data['template_data'] = {}
         
         # Lấy danh sách templates có sẵn cho selector
-        available_templates = CVTemplate.query.filter(CVTemplate.is_active == True).all()
+        available_templates = get_catalog().active()
         
         return render_template('cv/canvas_editor.html', 
                              cv=cv_data,
@@ -957,12 +1138,11 @@ def save_cv_form():
         # Lấy template_id
         template_id = form_data.get('template_id', 'modern_complete')
         
-        # Lấy template mặc định từ cv_template
-        template = CVTemplate.query.get(template_id)
+        # Lấy template mặc định từ catalogue
+        template = get_catalog().get(template_id)
         if not template:
             # Fallback to default template
-            CVTemplate.seed_default_templates()
-            template = CVTemplate.query.get('modern_complete')
+            template = get_catalog().get('modern_complete')
             if not template:
                 return jsonify({'success': False, 'errors': ['Template không tồn tại']}), 400
         
@@ -993,7 +1173,9 @@ def save_cv_form():
         }
         
         # Replace template placeholders với dữ liệu thực tế
-        processed_template = replace_template_placeholders(template_data, replacement_data)
+        processed_template = replace_template_placeholders(
+            template_data, replacement_data, template_bindings(db.session.connection(), template.id, template.version)
+        )
         
         # set content cho cv (lưu cả template data và form data)
         cv_content = {
@@ -1004,10 +1186,11 @@ def save_cv_form():
         
         # lưu cv vào database
         db.session.add(new_cv)
+        record_revision(new_cv, source='form')
         db.session.commit()
         
         # Track template usage
-        template.increment_usage()
+        template.increment_usage(user_id=current_user.id)
         
         success_msg = 'CV đã được tạo thành công!'
         redirect_url = url_for('cv.cv_preview', cv_id=new_cv.id)
@@ -1043,21 +1226,19 @@ def save_cv_form():
 def save_cv_canvas():
     """Lưu CV từ Canvas Editor"""
     try:
-        data = request.get_json()
+        # Cây canvas nằm trực tiếp trong body (template_data là object): parse một lần với giới hạn của canvas
+        data = _guarded_json('CANVAS_JSON')
         if not data:
             return jsonify({'success': False, 'error': 'Dữ liệu không hợp lệ.'}), 400
 
         cv_id = data.get('cv_id')
         title = data.get('title', 'CV Mới từ Canvas')
         template_id_from_request = data.get('template_id')
-        template_data_json = data.get('template_data_json')
+        template_data = data.get('template_data')
 
-        if not template_data_json:
+        if not template_data:
             return jsonify({'success': False, 'error': 'Không có dữ liệu canvas để lưu.'}), 400
-
-        try:
-            template_data = json.loads(template_data_json)
-        except json.JSONDecodeError:
+        if not isinstance(template_data, dict):
             return jsonify({'success': False, 'error': 'Dữ liệu canvas không hợp lệ (JSON format).'}), 400
 
         saved_cv = None
@@ -1070,14 +1251,11 @@ def save_cv_canvas():
             
             cv.title = title
             # Giữ lại form_data nếu có, chỉ cập nhật template_data
-            current_content = cv.get_content()
-            if not isinstance(current_content, dict): # Khởi tạo nếu content không phải dict
-                current_content = {}
-            current_content['template_data'] = template_data
-            cv.set_content(current_content)
+            cv.set_template_data(template_data)
             
             cv.is_canvas_editor = True
             cv.updated_at = datetime.utcnow()
+            record_revision(cv, source='canvas')
             saved_cv = cv
         else:
             # Tạo CV mới
@@ -1091,6 +1269,7 @@ def save_cv_canvas():
             new_cv.is_canvas_editor = True
             
             db.session.add(new_cv)
+            record_revision(new_cv, source='canvas')
             db.session.flush() # Flush để lấy new_cv.id trước khi commit
             saved_cv = new_cv
 
@@ -1105,6 +1284,9 @@ def save_cv_canvas():
             'redirect_url': url_for('cv.canvas_editor', cv_id=saved_cv.id)
         }), 200
 
+    except JSONPayloadError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': f'Dữ liệu canvas không hợp lệ: {e}'}), e.status_code
     except Exception as e:
         db.session.rollback()
         print(f"Error saving canvas CV: {str(e)}")
@@ -1127,11 +1309,11 @@ def analyze_cv(cv_id):
                 'error': 'Không tìm thấy CV hoặc bạn không có quyền truy cập.'
             }), 404
         
-        # Lấy content để phân tích
-        content = cv.get_content()
+        # Lấy content để phân tích (AI chỉ dùng template_data)
+        content = {'template_data': cv.get_template_data()}
         
         # Sử dụng GeminiAI để đánh giá CV
-        ai_evaluation = ai.evaluate_cv(content)
+        ai_evaluation = ai.evaluate_cv(content, content_hash=cv.content_hash)
         
         # Lấy kết quả từ AI evaluation
         overall_score = ai_evaluation.get('overall_score', 0)
@@ -1294,12 +1476,12 @@ def extract_weaknesses_from_scores(section_scores):
 def ai_hint():
     """Gợi ý nội dung CV bằng AI (Gemini)"""
     try:
-        data = request.get_json()
+        data = _guarded_json('AI_JSON')
         if not data:
             return jsonify({'success': False, 'error': 'Dữ liệu không hợp lệ.'}), 400
 
         user_message = data.get('user_message')
-        context = data.get('context', {})
+        context = data.get('context') if isinstance(data.get('context'), dict) else {}
         element_type = context.get('type', 'không rõ') # e.g., 'summary', 'experience_description'
         current_content = context.get('content', '')
 
@@ -1327,6 +1509,8 @@ Chỉ trả về phần gợi ý/nội dung được tạo ra, không thêm lờ
         else:
             return jsonify({'success': False, 'error': 'Không thể tạo gợi ý từ AI. Vui lòng thử lại.'}), 500
 
+    except JSONPayloadError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status_code
     except Exception as e:
         print(f"Error in AI hint: {str(e)}")
         traceback.print_exc()
@@ -1337,8 +1521,10 @@ Chỉ trả về phần gợi ý/nội dung được tạo ra, không thêm lờ
 def translate_cv(cv_id):
     """Dịch nội dung CV sang ngôn ngữ khác bằng AI (Gemini)"""
     try:
-        data = request.get_json()
-        target_language = data.get('target_language', 'vi') if data else 'vi'
+        data = _guarded_json('AI_JSON', required=False)
+        target_language = data.get('target_language') or 'vi'
+        if not isinstance(target_language, str):
+            return jsonify({'success': False, 'error': 'Ngôn ngữ không hợp lệ.'}), 400
         
         # Lấy CV từ database
         cv = CV.query.filter_by(id=cv_id, user_id=current_user.id).first()
@@ -1349,17 +1535,17 @@ def translate_cv(cv_id):
                 'error': 'Không tìm thấy CV hoặc bạn không có quyền truy cập.'
             }), 404
         
-        # Lấy content của CV
-        content = cv.get_content()
+        # Lấy content của CV (chỉ template_data được dịch)
+        content = {'template_data': cv.get_template_data()}
         
-        if not content:
+        if not content['template_data']:
             return jsonify({
                 'success': False,
                 'error': 'CV không có nội dung để dịch.'
             }), 400
         
         # Sử dụng GeminiAI để dịch nội dung CV
-        translated_content = ai.translate_text(content, target_language)
+        translated_content = ai.translate_text(content, target_language, content_hash=cv.content_hash)
         
         # Mapping ngôn ngữ để tạo title
         language_names = {
@@ -1378,14 +1564,14 @@ def translate_cv(cv_id):
         # Tạo CV mới với nội dung đã dịch
         new_cv = CV(
             title=f"CV - {target_lang_name} - {cv.title}",
-            content=cv.content,  # Sẽ được cập nhật bên dưới
             template_id=cv.template_id,
             user_id=current_user.id,
             is_canvas_editor=cv.is_canvas_editor
         )
         
-        # Cập nhật content với nội dung đã dịch
-        new_cv.set_content(translated_content)
+        # Cập nhật content với nội dung đã dịch, form_data giữ nguyên từ CV gốc
+        new_cv.copy_content_from(cv)
+        new_cv.set_template_data(translated_content.get('template_data', {}))
         
         # Lưu CV mới vào database
         db.session.add(new_cv)
@@ -1404,6 +1590,8 @@ def translate_cv(cv_id):
             'redirect_url': url_for('cv.cv_preview', cv_id=new_cv.id)
         })
         
+    except JSONPayloadError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status_code
     except Exception as e:
         db.session.rollback()
         print(f"Error translating CV: {str(e)}")
@@ -1,7 +1,9 @@
 from flask import Blueprint, render_template, redirect, url_for
 from flask_login import login_required, current_user
+from models.analytics import EVENT_DOWNLOAD, EVENT_VIEW, user_activity
 from models.cv import CV
 from models.user import User
+from utils.cv_utils import get_cv_statistics
 
 main_bp = Blueprint('main', __name__)
 
@@ -14,32 +16,33 @@ def index():
 @login_required
 def dashboard():
     """Bảng điều khiển chính - Quản lý CV"""
-    # Lấy thống kê thực từ database
-    user_cvs = CV.query.filter_by(user_id=current_user.id).all()
-    total_cvs = len(user_cvs)
-    total_views = sum(getattr(cv, 'views', 0) for cv in user_cvs)
-    total_downloads = sum(getattr(cv, 'downloads', 0) for cv in user_cvs)
+    # Lấy thống kê thực từ database (COUNT/SUM trong SQL)
+    stats = get_cv_statistics(CV, current_user.id)
+    
+    # Lượt xem/tải theo ngày trong 30 ngày gần nhất (đọc từ rollup, không quét nhật ký sự kiện)
+    activity = user_activity(current_user.id, days=30)
     
     # Thống kê cơ bản cho dashboard
     user_stats = {
-        'total_cvs': total_cvs,
+        'total_cvs': stats['total_cvs'],
         'total_templates': 8,  # Số template có sẵn
         'completed_profile': 85,  # Tính toán dựa trên thông tin user
-        'cv_views': total_views,
-        'total_downloads': total_downloads
+        'cv_views': stats['total_views'],
+        'total_downloads': stats['total_downloads'],
+        'views_30_days': sum(day[EVENT_VIEW] for day in activity.values()),
+        'downloads_30_days': sum(day[EVENT_DOWNLOAD] for day in activity.values())
     }
     
-    # Danh sách CV gần đây từ database
+    # Danh sách CV gần đây từ database (3 CV gần nhất)
     recent_cvs = []
-    sorted_cvs = sorted(user_cvs, key=lambda x: x.updated_at, reverse=True)
-    for cv in sorted_cvs[:3]:  # Lấy 3 CV gần nhất
+    for cv in current_user.get_recent_cvs(limit=3):
         recent_cvs.append({
             'id': cv.id,
             'name': cv.title,
             'template': cv.template_id.title() if cv.template_id else 'Modern',
             'created_at': cv.created_at.strftime('%d/%m/%Y'),
-            'status': 'Hoàn thiện' if cv.content else 'Đang chỉnh sửa',
-            'views': getattr(cv, 'views', 0),
+            'status': 'Hoàn thiện' if cv.content_size else 'Đang chỉnh sửa',
+            'views': cv.view_count,
             'is_canvas_editor': cv.is_canvas_editor
         })
     
@@ -4,6 +4,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 import re
 from datetime import datetime
 from models.user import User
+from models.user_cache import stamp_session
 from db import db
 
 user_bp = Blueprint('user', __name__)
@@ -33,6 +34,7 @@ def login():
             db.session.commit()
             
             login_user(user, remember=remember_me)
+            stamp_session(user)
             flash(f'Chào mừng {user.username}!', 'success')
             
             # Redirect to dashboard hoặc trang được yêu cầu
@@ -111,6 +113,7 @@ def register():
             
             # Tự động đăng nhập sau khi đăng ký
             login_user(new_user)
+            stamp_session(new_user)
             return redirect(url_for('main.dashboard'))
             
         except Exception as e:
@@ -172,11 +175,13 @@ def update_profile():
     
     # Cập nhật thông tin
     try:
-        current_user.username = username
-        current_user.email = email
-        current_user.phone = phone if phone else None
+        user = current_user.record()
+        user.username = username
+        user.email = email
+        user.phone = phone if phone else None
         
         db.session.commit()
+        stamp_session(user)
         flash('Thông tin cá nhân đã được cập nhật thành công!', 'success')
         
     except Exception as e:
@@ -198,7 +203,7 @@ def change_password():
     
     if not current_password:
         errors.append('Vui lòng nhập mật khẩu hiện tại.')
-    elif not current_user.check_password(current_password):
+    elif not current_user.record().check_password(current_password):
         errors.append('Mật khẩu hiện tại không chính xác.')
     
     if not new_password or len(new_password) < 8:
@@ -214,8 +219,10 @@ def change_password():
     
     # Cập nhật mật khẩu
     try:
-        current_user.set_password(new_password)
+        user = current_user.record()
+        user.set_password(new_password)
         db.session.commit()
+        stamp_session(user)
         flash('Mật khẩu đã được thay đổi thành công!', 'success')
         
     except Exception as e: